@@ -0,0 +1,41 @@
+"""add answers table
+
+Revision ID: 5a1f3c9d2b7e
+Revises: 36dbe87f8e7e
+Create Date: 2026-10-19 10:12:44.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a1f3c9d2b7e'
+down_revision: Union[str, None] = '36dbe87f8e7e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('answers',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('question_hash', sa.String(length=64), nullable=False),
+    sa.Column('deck_hash', sa.String(length=64), nullable=False),
+    sa.Column('model', sa.String(), nullable=False),
+    sa.Column('prompt_version', sa.String(), nullable=False),
+    sa.Column('question', sa.Text(), nullable=False),
+    sa.Column('answer', sa.Text(), nullable=False),
+    sa.Column('hit_count', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('last_hit_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('question_hash', 'deck_hash', 'model', 'prompt_version', name='uq_answers_lookup')
+    )
+    op.create_index(op.f('ix_answers_id'), 'answers', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_answers_id'), table_name='answers')
+    op.drop_table('answers')
@@ -0,0 +1,41 @@
+"""add slides table
+
+Revision ID: 8c2e4b6f1a3d
+Revises: 5a1f3c9d2b7e
+Create Date: 2026-10-19 14:03:27.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c2e4b6f1a3d'
+down_revision: Union[str, None] = '5a1f3c9d2b7e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('slides',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('file_id', sa.Integer(), nullable=False),
+    sa.Column('slide_number', sa.Integer(), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('image_path', sa.String(), nullable=True),
+    sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed("to_tsvector('english', content)", persisted=True), nullable=True),
+    sa.ForeignKeyConstraint(['file_id'], ['files.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('file_id', 'slide_number', name='uq_slides_file_slide')
+    )
+    op.create_index(op.f('ix_slides_id'), 'slides', ['id'], unique=False)
+    op.create_index('ix_slides_search_vector', 'slides', ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_slides_search_vector', table_name='slides', postgresql_using='gin')
+    op.drop_index(op.f('ix_slides_id'), table_name='slides')
+    op.drop_table('slides')
@@ -0,0 +1,36 @@
+"""dedupe slides of uploads sharing a converted deck
+
+Revision ID: a9c3e7f1b5d4
+Revises: f2a8c5d1e3b7
+Create Date: 2026-10-19 21:04:37.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9c3e7f1b5d4'
+down_revision: Union[str, None] = 'f2a8c5d1e3b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Slides of uploads sharing a converted PPTX are kept only under the lowest file id
+    op.execute("""
+        DELETE FROM slides s
+        USING files f
+        WHERE f.id = s.file_id
+          AND f.id > (
+              SELECT min(o.id) FROM files o
+              WHERE o.converted_pptx_path = f.converted_pptx_path AND o.user_id = f.user_id
+          )
+    """)
+
+
+def downgrade() -> None:
+    # The removed copies are rebuilt on first read of each deck
+    pass
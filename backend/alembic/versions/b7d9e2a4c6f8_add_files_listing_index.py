@@ -0,0 +1,33 @@
+"""add files listing index
+
+Revision ID: b7d9e2a4c6f8
+Revises: 8c2e4b6f1a3d
+Create Date: 2026-10-19 15:21:09.473620
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d9e2a4c6f8'
+down_revision: Union[str, None] = '8c2e4b6f1a3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Keyset pagination needs a total order on (upload_time, id)
+    op.execute("UPDATE files SET upload_time = timezone('utc', now()) WHERE upload_time IS NULL")
+    op.alter_column('files', 'upload_time', existing_type=sa.DateTime(), nullable=False)
+    op.create_index(
+        'ix_files_user_upload_time_id', 'files', ['user_id', 'upload_time', 'id'], unique=False,
+        postgresql_include=['filename', 'content_type', 'path', 'converted_pptx_path', 'conversion_status'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_files_user_upload_time_id', table_name='files')
+    op.alter_column('files', 'upload_time', existing_type=sa.DateTime(), nullable=True)
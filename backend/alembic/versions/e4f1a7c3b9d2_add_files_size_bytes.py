@@ -0,0 +1,27 @@
+"""add files size_bytes
+
+Revision ID: e4f1a7c3b9d2
+Revises: b7d9e2a4c6f8
+Create Date: 2026-10-19 16:48:12.305417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4f1a7c3b9d2'
+down_revision: Union[str, None] = 'b7d9e2a4c6f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing rows are measured by the storage janitor
+    op.add_column('files', sa.Column('size_bytes', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('files', 'size_bytes')
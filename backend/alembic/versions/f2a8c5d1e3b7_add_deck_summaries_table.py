@@ -0,0 +1,39 @@
+"""add deck_summaries table
+
+Revision ID: f2a8c5d1e3b7
+Revises: e4f1a7c3b9d2
+Create Date: 2026-10-19 18:21:05.644930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a8c5d1e3b7'
+down_revision: Union[str, None] = 'e4f1a7c3b9d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('deck_summaries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('deck_hash', sa.String(length=64), nullable=False),
+    sa.Column('prompt_version', sa.String(), nullable=False),
+    sa.Column('level', sa.String(), nullable=False),
+    sa.Column('first_slide', sa.Integer(), nullable=False),
+    sa.Column('last_slide', sa.Integer(), nullable=False),
+    sa.Column('summary', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('deck_hash', 'prompt_version', 'level', 'first_slide', name='uq_deck_summaries_lookup')
+    )
+    op.create_index(op.f('ix_deck_summaries_id'), 'deck_summaries', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_deck_summaries_id'), table_name='deck_summaries')
+    op.drop_table('deck_summaries')
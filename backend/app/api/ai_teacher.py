@@ -1,20 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from pydantic import BaseModel
-from backend.app.services.ai_cache import get_cached_answer, set_cached_answer
+from backend.app.services.ai_cache import AnswerKey, get_cached_answers, get_cache_stats, cache_namespace
+from backend.app.services import answer_store, deck_summary, slide_index
+from backend.app.services.storage import get_storage
+from backend.app.services.semantic_cache import get_semantic_cache
 from backend.app.core.config import get_settings
 from fastapi.security import OAuth2PasswordBearer
 from backend.app.api.auth import get_current_user
 from backend.app.models import User, File as FileModel
 from backend.app.services.pptx_service import PPTXService
-from sqlalchemy.orm import Session
-from backend.app.core.database import get_db
-from openai import OpenAI
-import google.generativeai as genai
+from backend.app.services.llm_service import LLMService, LLMProviderError, get_model_name
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.app.core.database import get_async_db
+from backend.app.core import rate_limit
+from backend.app.core.tracing import span
 import logging
-import base64
-from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Literal
+import json
 import mimetypes
-import os
 
 router = APIRouter()
 settings = get_settings()
@@ -22,445 +29,555 @@ logger = logging.getLogger("ai_teacher")
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
+# Bump when the /ask prompt template changes so stale cached answers are not reused
+ASK_PROMPT_VERSION = "2"
+# Same for slide explanations, which share the answer caches under their own prompt version
+EXPLAIN_PROMPT_VERSION = "explain-1"
+
 class AskRequest(BaseModel):
     question: str
     slide_deck_id: int | None = None  # Optional slide deck ID
 
+class AskBatchRequest(BaseModel):
+    questions: List[str]
+    slide_deck_id: int | None = None  # Optional slide deck ID shared by all questions
+
 class ExplainSlideRequest(BaseModel):
     slide_deck_id: int
     slide_number: int
 
-@router.post("/ask")
-def ask_ai(
+class ExplainDeckRequest(BaseModel):
+    slide_deck_id: int
+    slide_numbers: List[int] | None = None  # all slides when omitted
+    order: Literal["slide", "completion"] = "slide"  # order of the streamed results
+
+async def get_user_slide_deck(db: AsyncSession, user_id: int, slide_deck_id: int) -> FileModel | None:
+    """Return the converted slide deck if it belongs to the user."""
+    result = await db.execute(select(FileModel).where(
+        FileModel.id == slide_deck_id,
+        FileModel.user_id == user_id,
+        FileModel.converted_pptx_path.isnot(None)
+    ))
+    return result.scalars().first()
+
+def ask_answer_key(question: str, user_id: int, slide_deck: FileModel | None) -> AnswerKey:
+    """
+    Answers grounded on a deck are scoped to its owner and versioned by the deck's
+    content hash; general questions are shared. The key is tied to the primary model.
+    """
+    primary_provider = settings.PRIMARY_MODEL_PROVIDER.lower()
+    model = f"{primary_provider}:{get_model_name(primary_provider)}"
+    if slide_deck is None:
+        return AnswerKey(question, "global", None, ASK_PROMPT_VERSION, model)
+    return AnswerKey(question, f"user:{user_id}:deck:{slide_deck.id}", deck_content_hash(slide_deck), ASK_PROMPT_VERSION, model)
+
+def explain_answer_key(user_id: int, slide_deck: FileModel, deck_hash: str, slide_number: int) -> AnswerKey:
+    """Cache key of one slide's explanation, versioned like /ask answers by deck content hash and model."""
+    primary_provider = settings.PRIMARY_MODEL_PROVIDER.lower()
+    model = f"{primary_provider}:{get_model_name(primary_provider)}"
+    return AnswerKey(f"slide {slide_number}", f"user:{user_id}:deck:{slide_deck.id}", deck_hash, EXPLAIN_PROMPT_VERSION, model)
+
+def deck_content_hash(slide_deck: FileModel) -> str:
+    return PPTXService.get_content_hash(get_storage().local_path(slide_deck.converted_pptx_path))
+
+def load_slide_content(pptx_key: str) -> str:
+    slides_content = PPTXService.extract_text_from_pptx(get_storage().local_path(pptx_key))
+    return PPTXService.format_slides_for_prompt(slides_content)
+
+async def summarized_deck_contexts(
+    db: AsyncSession, slide_deck: FileModel, deck_hash: str, questions: list[str]
+) -> tuple[str, list[str]] | None:
+    """
+    Context for a large deck: its section summaries, plus the slides most relevant to
+    each question. None when the whole deck should be sent instead.
+    """
+    overview = await deck_summary.get_deck_overview(db, slide_deck, deck_hash)
+    if overview is None:
+        return None
+    return overview, [
+        deck_summary.format_relevant_slides(await deck_summary.find_relevant_slides(db, slide_deck, question))
+        for question in questions
+    ]
+
+ASK_DECK_INSTRUCTIONS = """You are an AI tutor helping a student understand their course material.
+Use the slide deck content below as your primary reference to answer the student's question.
+If the answer cannot be fully derived from the slides, you may supplement with your knowledge,
+but clearly indicate which parts come from the slides vs. your general knowledge.
+
+Please provide a clear, educational response that:
+1. Primarily uses information from the slides
+2. Clearly indicates which parts come from the slides
+3. Only supplements with your knowledge if necessary
+4. Maintains a helpful, tutoring tone"""
+
+ASK_GENERAL_INSTRUCTIONS = "You are an AI tutor helping a student. Please answer their question in a clear, educational manner."
+
+def build_ask_prompt(question: str, slide_content: str | None, relevant_slides: str = "") -> tuple[str, str]:
+    """
+    Returns (prefix, prompt). The prefix holds the instructions and the deck content and
+    is byte-identical for every question on the same deck version, so providers can
+    serve it from their prompt caches; everything question-specific follows it.
+    """
+    if slide_content:
+        prefix = f"{ASK_DECK_INSTRUCTIONS}\n\n{slide_content}"
+    else:
+        prefix = ASK_GENERAL_INSTRUCTIONS
+    prompt = f"Student's question: {question}"
+    return prefix, f"{relevant_slides}\n\n{prompt}" if relevant_slides else prompt
+
+@router.post("/ask", dependencies=[Depends(rate_limit.rate_limited("ai"))])
+async def ask_ai(
     data: AskRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     question = data.question.strip()
     slide_deck_id = data.slide_deck_id
     
-    logger.info(f"Received question from user {current_user.email}: {question}")
+    logger.info(f"Received question from user {current_user.email}: {question[:200]}")
     if slide_deck_id:
         logger.info(f"Using slide deck ID: {slide_deck_id}")
     
     if not question:
         raise HTTPException(status_code=400, detail="Question cannot be empty.")
     
-    # Check cache (include slide_deck_id in cache key if provided)
-    cache_key = f"{question}_{slide_deck_id}" if slide_deck_id else question
-    cached = get_cached_answer(cache_key)
+    # Resolve the slide deck first: its content hash is part of the cache key
+    slide_deck = None
+    if slide_deck_id:
+        # Verify the slide deck belongs to the user
+        with span("deck_lookup"):
+            slide_deck = await get_user_slide_deck(db, current_user.id, slide_deck_id)
+        if not slide_deck:
+            raise HTTPException(
+                status_code=404,
+                detail="Slide deck not found or not accessible"
+            )
+    
+    # Check cache (Redis, then the durable answer store)
+    with span("cache_key"):
+        try:
+            answer_key = await run_in_threadpool(ask_answer_key, question, current_user.id, slide_deck)
+        except OSError as e:
+            logger.error(f"Error reading slide deck {slide_deck_id}: {str(e)}", exc_info=True)
+            # Continue without slide content if the deck file is unreadable
+            slide_deck = None
+            answer_key = ask_answer_key(question, current_user.id, None)
+    with span("answer_cache"):
+        cached = await answer_store.get_answer(db, answer_key)
     if cached:
         logger.info(f"Cache hit for question: {question}")
         return {"answer": cached, "cached": True, "provider": "cache"}
     
-    # Get slide deck content if slide_deck_id is provided
-    slide_content = None
-    if slide_deck_id:
+    deck_overview, relevant_slides = None, ""
+    if slide_deck:
+        with span("deck_context"):
+            try:
+                contexts = await summarized_deck_contexts(db, slide_deck, answer_key.deck_version, [question])
+                if contexts:
+                    deck_overview, relevant_slides = contexts[0], contexts[1][0]
+            except Exception as e:
+                logger.error(f"Error reading summaries of slide deck {slide_deck.id}: {str(e)}", exc_info=True)
+    
+    # Past the exact-match caches everything blocks (deck parsing, provider calls), so run it off the event loop
+    return await run_in_threadpool(
+        answer_uncached_question, question, current_user.id, slide_deck, answer_key, deck_overview, relevant_slides
+    )
+
+def answer_uncached_question(
+    question: str, user_id: int, slide_deck: FileModel | None, answer_key: AnswerKey,
+    deck_overview: str | None = None, relevant_slides: str = ""
+) -> dict:
+    """Answer with the summarized deck (`deck_overview` and `relevant_slides`) when given, else with the full text of the deck."""
+    slide_content = deck_overview
+    semantic_cache = get_semantic_cache()
+    if semantic_cache:
+        with span("semantic_cache"):
+            match = semantic_cache.lookup(question, cache_namespace(answer_key.redis_key))
+        if match:
+            answer, similarity, _ = match
+            return {"answer": answer, "cached": True, "provider": "semantic-cache", "similarity": round(similarity, 4)}
+    
+    if slide_deck and slide_content is None:
         try:
-            # Verify the slide deck belongs to the user
-            slide_deck = db.query(FileModel).filter(
-                FileModel.id == slide_deck_id,
-                FileModel.user_id == current_user.id,
-                FileModel.converted_pptx_path.isnot(None)
-            ).first()
-            
-            if not slide_deck:
-                raise HTTPException(
-                    status_code=404,
-                    detail="Slide deck not found or not accessible"
-                )
-            
             # Extract and format slide content
-            slides_content = PPTXService.extract_text_from_pptx(slide_deck.converted_pptx_path)
-            slide_content = PPTXService.format_slides_for_prompt(slides_content)
-            logger.info(f"Successfully extracted content from slide deck {slide_deck_id}")
-            
+            with span("slides_parse"):
+                slide_content = load_slide_content(slide_deck.converted_pptx_path)
+            logger.info(f"Successfully extracted content from slide deck {slide_deck.id}")
         except Exception as e:
-            logger.error(f"Error processing slide deck {slide_deck_id}: {str(e)}", exc_info=True)
-            # Continue without slide content if there's an error
+            logger.error(f"Error processing slide deck {slide_deck.id}: {str(e)}", exc_info=True)
+            # Continue without slide content if there's an error; don't cache that answer under the deck key
             slide_content = None
+            answer_key = ask_answer_key(question, user_id, None)
     
     # Prepare the prompt with slide content if available
-    if slide_content:
-        prompt = f"""You are an AI tutor helping a student understand their course material. 
-Use the following slide deck content as your primary reference to answer the question.
-If the answer cannot be fully derived from the slides, you may supplement with your knowledge,
-but clearly indicate which parts come from the slides vs. your general knowledge.
-
-{slide_content}
-
-Student's question: {question}
-
-Please provide a clear, educational response that:
-1. Primarily uses information from the slides
-2. Clearly indicates which parts come from the slides
-3. Only supplements with your knowledge if necessary
-4. Maintains a helpful, tutoring tone"""
-    else:
-        prompt = f"""You are an AI tutor helping a student. Please answer their question in a clear, educational manner.
-
-Student's question: {question}"""
+    prefix, prompt = build_ask_prompt(question, slide_content, relevant_slides if slide_content else "")
     
-    # Get model providers from settings
-    primary_provider = settings.PRIMARY_MODEL_PROVIDER.lower()
-    fallback_provider = settings.FALLBACK_MODEL_PROVIDER.lower()
-    logger.info(f"Settings - PRIMARY_MODEL_PROVIDER: {settings.PRIMARY_MODEL_PROVIDER}, FALLBACK_MODEL_PROVIDER: {settings.FALLBACK_MODEL_PROVIDER}")
-
-    def call_openai(text):
-        try:
-            api_key = settings.OPENAI_API_KEY.get_secret_value()
-            client = OpenAI(api_key=api_key)
-            request_data = {
-                "model": "gpt-4o-mini",  # Using GPT-4o Mini for text
-                "messages": [{"role": "user", "content": text}],
-                "temperature": 0.7,
-                "max_tokens": 1024
-            }
-            response = client.chat.completions.create(**request_data)
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            logger.error(f"OpenAI request failed: {str(e)}", exc_info=True)
-            raise
-
-    def call_gemini(text):
-        try:
-            api_key = settings.GEMINI_API_KEY.get_secret_value()
-            genai.configure(api_key=api_key)
-            model = genai.GenerativeModel("gemini-2.0-flash")
-            response = model.generate_content(
-                text,
-                generation_config={
-                    "temperature": 0.7,
-                    "max_output_tokens": 1024,
-                }
-            )
-            return response.text.strip()
-        except Exception as e:
-            logger.error(f"Gemini request failed: {str(e)}", exc_info=True)
-            raise
+    logger.debug(f"Settings - PRIMARY_MODEL_PROVIDER: {settings.PRIMARY_MODEL_PROVIDER}, FALLBACK_MODEL_PROVIDER: {settings.FALLBACK_MODEL_PROVIDER}")
+    try:
+        with span("llm"):
+            answer, provider, used_fallback = LLMService.generate(prompt, prefix=prefix)
+    except LLMProviderError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    with span("cache_store"):
+        answer_store.store_answer(answer_key, answer)
+        if semantic_cache:
+            semantic_cache.store(question, cache_namespace(answer_key.redis_key), answer)
+    return {
+        "answer": answer,
+        "cached": False,
+        "provider": f"{provider}-fallback" if used_fallback else provider
+    }
+
+@router.post("/ask/batch")
+async def ask_ai_batch(
+    data: AskBatchRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Answer several questions against the same (optional) slide deck.
+    The deck is resolved and parsed once, cached answers are fetched in a single
+    Redis round trip and misses are sent to the providers concurrently.
+    Results are streamed back as NDJSON lines in completion order; each line
+    carries the index of the question it answers.
+    """
+    questions = [q.strip() for q in data.questions]
+    slide_deck_id = data.slide_deck_id
 
-    def call_model(provider, text):
-        logger.info(f"About to call model provider: {provider}")
-        if provider not in ["openai", "gemini"]:
-            logger.error(f"Invalid provider specified: {provider}")
-            raise ValueError(f"Provider must be 'openai' or 'gemini', got: {provider}")
+    if not questions:
+        raise HTTPException(status_code=400, detail="At least one question is required.")
+    if len(questions) > settings.ASK_BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch can contain at most {settings.ASK_BATCH_MAX_QUESTIONS} questions."
+        )
+    if any(not q for q in questions):
+        raise HTTPException(status_code=400, detail="Questions cannot be empty.")
 
-        if provider == "openai":
-            return call_openai(text)
-        elif provider == "gemini":
-            return call_gemini(text)
+    logger.info(f"Received batch of {len(questions)} questions from user {current_user.email}")
 
+    # Each question counts against the user's AI rate limit; the concurrency
+    # lease is held until the stream finishes rather than until the handler returns
+    lease_id = await run_in_threadpool(rate_limit.admit, "ai", current_user.id, cost=len(questions))
     try:
-        logger.info(f"Starting ask-ai - Using primary provider: {primary_provider}")
-        if primary_provider not in ["openai", "gemini"]:
-            logger.error(f"Invalid primary provider in settings: {primary_provider}")
-            raise ValueError(f"PRIMARY_MODEL_PROVIDER must be 'openai' or 'gemini', got: {primary_provider}")
-
-        answer = call_model(primary_provider, prompt)
-        logger.info(f"Successfully got response from primary provider: {primary_provider}")
-        set_cached_answer(cache_key, answer)
+        slide_deck = None
+        slide_content = None
+        deck_contexts = None
+        if slide_deck_id:
+            slide_deck = await get_user_slide_deck(db, current_user.id, slide_deck_id)
+            if not slide_deck:
+                raise HTTPException(status_code=404, detail="Slide deck not found or not accessible")
+            try:
+                # Large decks with summaries get a compact context per question, others the full text once
+                deck_hash = await run_in_threadpool(deck_content_hash, slide_deck)
+                deck_contexts = await summarized_deck_contexts(db, slide_deck, deck_hash, questions)
+                if deck_contexts is None:
+                    slide_content = await run_in_threadpool(load_slide_content, slide_deck.converted_pptx_path)
+            except Exception as e:
+                logger.error(f"Error processing slide deck {slide_deck_id}: {str(e)}", exc_info=True)
+                await db.rollback()
+                # Continue without slide content if there's an error
+                slide_deck = None
+                slide_content = None
+                deck_contexts = None
+
+        answer_keys = await run_in_threadpool(lambda: [ask_answer_key(q, current_user.id, slide_deck) for q in questions])
+        cached_answers = await run_in_threadpool(get_cached_answers, [key.redis_key for key in answer_keys])
+        # Redis misses are read through from the durable store in one query
+        missing = [i for i, cached in enumerate(cached_answers) if cached is None]
+        if missing:
+            stored = await answer_store.get_stored_answers(db, [answer_keys[i] for i in missing])
+            for i, answer in zip(missing, stored):
+                cached_answers[i] = answer
+    except Exception:
+        await run_in_threadpool(rate_limit.release, "ai", current_user.id, lease_id)
+        raise
+
+    semantic_cache = get_semantic_cache()
+
+    def answer_question(index: int) -> dict:
+        question = questions[index]
+        if semantic_cache:
+            match = semantic_cache.lookup(question, cache_namespace(answer_keys[index].redis_key))
+            if match:
+                answer, similarity, _ = match
+                return {"index": index, "question": question, "answer": answer, "cached": True,
+                        "provider": "semantic-cache", "similarity": round(similarity, 4)}
+        try:
+            if deck_contexts:
+                prefix, prompt = build_ask_prompt(question, deck_contexts[0], deck_contexts[1][index])
+            else:
+                prefix, prompt = build_ask_prompt(question, slide_content)
+            answer, provider, used_fallback = LLMService.generate(prompt, prefix=prefix)
+        except LLMProviderError as e:
+            return {"index": index, "question": question, "error": str(e)}
+        answer_store.store_answer(answer_keys[index], answer)
+        if semantic_cache:
+            semantic_cache.store(question, cache_namespace(answer_keys[index].redis_key), answer)
         return {
+            "index": index,
+            "question": question,
             "answer": answer,
             "cached": False,
-            "provider": f"{primary_provider}"
+            "provider": f"{provider}-fallback" if used_fallback else provider
         }
-    except Exception as e:
-        logger.error(f"Primary provider ({primary_provider}) failed with error: {str(e)}")
+
+    def stream_results():
+        executor = None
         try:
-            logger.info(f"Primary provider failed, attempting fallback provider: {fallback_provider}")
-            if fallback_provider not in ["openai", "gemini"]:
-                logger.error(f"Invalid fallback provider in settings: {fallback_provider}")
-                raise ValueError(f"FALLBACK_MODEL_PROVIDER must be 'openai' or 'gemini', got: {fallback_provider}")
-
-            answer = call_model(fallback_provider, prompt)
-            logger.info(f"Successfully got response from fallback provider: {fallback_provider}")
-            set_cached_answer(cache_key, answer)
-            return {
-                "answer": answer,
-                "cached": False,
-                "provider": f"{fallback_provider}-fallback"
-            }
-        except Exception as e2:
-            logger.error(f"Both providers failed. Primary ({primary_provider}) error: {str(e)}. Fallback ({fallback_provider}) error: {str(e2)}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"Both AI providers failed. Primary ({primary_provider}) error: {str(e)}. Fallback ({fallback_provider}) error: {str(e2)}"
-            )
+            misses = []
+            for index, cached in enumerate(cached_answers):
+                if cached:
+                    yield json.dumps({"index": index, "question": questions[index], "answer": cached, "cached": True, "provider": "cache"}) + "\n"
+                else:
+                    misses.append(index)
+            if not misses:
+                return
+            logger.info(f"Batch cache hits: {len(questions) - len(misses)}, sending {len(misses)} questions to providers")
+            executor = ThreadPoolExecutor(max_workers=min(settings.ASK_BATCH_CONCURRENCY, len(misses)))
+            futures = [executor.submit(answer_question, index) for index in misses]
+            for future in as_completed(futures):
+                yield json.dumps(future.result()) + "\n"
+        finally:
+            if executor:
+                # Stop pending provider calls if the client went away mid-stream
+                executor.shutdown(wait=False, cancel_futures=True)
+            rate_limit.release("ai", current_user.id, lease_id)
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+@router.get("/cache/stats")
+def cache_stats(current_user: User = Depends(get_current_user)):
+    """
+    Answer cache hit/miss counts and rates per tier (in-process and Redis) for the serving worker.
+    """
+    stats = get_cache_stats()
+    semantic_cache = get_semantic_cache()
+    stats["semantic"] = semantic_cache.stats() if semantic_cache else None
+    return stats
+
+@router.get("/slides/search")
+async def search_slides(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Full-text search across all of the user's slide decks.
+    Returns matching slides (deck id, filename, slide number, highlighted snippet), best matches first.
+    """
+    return {"results": await slide_index.search_slides(db, current_user.id, q, limit)}
 
 @router.get("/slides/{slide_deck_id}")
-def get_slide_deck_content(
+async def get_slide_deck_content(
     slide_deck_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Return a list of slides (number, content, and/or image availability) for a given slide deck, if the user owns it.
     """
-    slide_deck = db.query(FileModel).filter(
-        FileModel.id == slide_deck_id,
-        FileModel.user_id == current_user.id,
-        FileModel.converted_pptx_path.isnot(None)
-    ).first()
-    if not slide_deck:
-        raise HTTPException(status_code=404, detail="Slide deck not found or not accessible")
-    try:
-        slides_content = PPTXService.extract_text_from_pptx(slide_deck.converted_pptx_path)
-        slides_images = PPTXService.extract_images_from_pptx(slide_deck.converted_pptx_path)
-        slides = []
-        max_slide = max(
-            [s["slide_number"] for s in slides_content] + [s["slide_number"] for s in slides_images],
-            default=0
-        )
-        for idx in range(1, max_slide + 1):
-            text_slide = next((s for s in slides_content if s["slide_number"] == idx), None)
-            image_slide = next((s for s in slides_images if s["slide_number"] == idx), None)
-            slide_obj = {"slide_number": idx}
-            if text_slide:
-                slide_obj["content"] = text_slide["content"]
-            if image_slide:
-                slide_obj["image_available"] = True
-            slides.append(slide_obj)
-        return {"slides": slides}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to extract slides: {str(e)}")
+    # One indexed query once the deck is in the slides table
+    rows = await slide_index.find_user_deck_slides(db, current_user.id, slide_deck_id)
+    if not rows:
+        slide_deck = await get_user_slide_deck(db, current_user.id, slide_deck_id)
+        if not slide_deck:
+            raise HTTPException(status_code=404, detail="Slide deck not found or not accessible")
+        rows = await slide_index.get_deck_slides(db, slide_deck)
+    slides = []
+    for row in rows:
+        slide_obj = {"slide_number": row.slide_number}
+        if row.content:
+            slide_obj["content"] = row.content
+        if row.image_path:
+            slide_obj["image_available"] = True
+        slides.append(slide_obj)
+    # Trailing slides with neither text nor an image are not listed
+    while slides and len(slides[-1]) == 1:
+        slides.pop()
+    return {"slides": slides}
 
 @router.get("/slide-image/{slide_deck_id}/{slide_number}")
-def get_slide_image(
+async def get_slide_image(
     slide_deck_id: int,
     slide_number: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Return the raw image for a given slide (if available).
     """
-    slide_deck = db.query(FileModel).filter(
-        FileModel.id == slide_deck_id,
-        FileModel.user_id == current_user.id,
-        FileModel.converted_pptx_path.isnot(None)
-    ).first()
-    if not slide_deck:
-        raise HTTPException(status_code=404, detail="Slide deck not found or not accessible")
-    slides_images = PPTXService.extract_images_from_pptx(slide_deck.converted_pptx_path)
-    image_info = next((img for img in slides_images if img["slide_number"] == slide_number), None)
-    if not image_info:
+    slide = await slide_index.find_user_slide(db, current_user.id, slide_deck_id, slide_number)
+    if slide is None:
+        slide_deck = await get_user_slide_deck(db, current_user.id, slide_deck_id)
+        if not slide_deck:
+            raise HTTPException(status_code=404, detail="Slide deck not found or not accessible")
+        slide = await slide_index.get_slide(db, slide_deck, slide_number)
+    if not slide or not slide.image_path:
         logger.error(f"Image not found for slide {slide_number} in deck {slide_deck_id}")
         raise HTTPException(status_code=404, detail="Image not found for this slide")
-    image_path = image_info["image_path"]
-    mime_type, _ = mimetypes.guess_type(image_path)
+    mime_type, _ = mimetypes.guess_type(slide.image_path)
     if not mime_type:
         mime_type = "application/octet-stream"
-    if not os.path.exists(image_path):
-        logger.error(f"Image file does not exist: {image_path}")
+    try:
+        return get_storage().file_response(slide.image_path, mime_type)
+    except FileNotFoundError:
+        logger.error(f"Image file does not exist: {slide.image_path}")
         raise HTTPException(status_code=404, detail="Image file not found on server")
-    return FileResponse(image_path, media_type=mime_type)
 
-@router.post("/explain-slide")
-def explain_slide(
+EXPLAIN_INSTRUCTIONS = """You are an expert teacher. Explain the slide you are given to a student in a clear, engaging, and educational way.
+Use analogies, examples, and break down complex ideas.
+When the slide comes with an image, analyze both the image and the text (if present).
+Provide a comprehensive explanation that helps the student understand the material thoroughly."""
+
+def build_explain_prompt(slide_text: str, is_multimodal: bool) -> tuple[str, str]:
+    """Returns (prefix, prompt); the instructions prefix is the same for every slide."""
+    if is_multimodal and not slide_text.strip():
+        slide_text = "This slide contains only an image."
+    return EXPLAIN_INSTRUCTIONS, f"Slide Content:\n{slide_text}"
+
+@router.post("/explain-slide", dependencies=[Depends(rate_limit.rate_limited("ai"))])
+async def explain_slide(
     data: ExplainSlideRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    slide_deck_id = data.slide_deck_id
-    slide_number = data.slide_number
-    slide_deck = db.query(FileModel).filter(
-        FileModel.id == slide_deck_id,
-        FileModel.user_id == current_user.id,
-        FileModel.converted_pptx_path.isnot(None)
-    ).first()
+    with span("deck_lookup"):
+        slide_deck = await get_user_slide_deck(db, current_user.id, data.slide_deck_id)
     if not slide_deck:
         raise HTTPException(status_code=404, detail="Slide deck not found")
 
-    # Get model providers from settings
-    primary_provider = settings.PRIMARY_MODEL_PROVIDER.lower()
-    fallback_provider = settings.FALLBACK_MODEL_PROVIDER.lower()
-    logger.info(f"Settings - PRIMARY_MODEL_PROVIDER: {settings.PRIMARY_MODEL_PROVIDER}, FALLBACK_MODEL_PROVIDER: {settings.FALLBACK_MODEL_PROVIDER}")
-    logger.info(f"Resolved providers - primary: {primary_provider}, fallback: {fallback_provider}")
-
-    slides_content = PPTXService.extract_text_from_pptx(slide_deck.converted_pptx_path)
-    slide = next((s for s in slides_content if s["slide_number"] == slide_number), None)
-    slide_text = slide["content"] if slide else ""
-    slide_image_path = next((s["image_path"] for s in PPTXService.extract_images_from_pptx(slide_deck.converted_pptx_path) if s["slide_number"] == slide_number), None)
-    is_multimodal = slide_image_path is not None
-
-    def call_openai(text, image_path=None):
-        api_key = settings.OPENAI_API_KEY.get_secret_value()
-        client = OpenAI(api_key=api_key)
-        
-        if image_path:
-            # Multimodal call with GPT-4 Vision
-            try:
-                with open(image_path, "rb") as image_file:
-                    base64_image = base64.b64encode(image_file.read()).decode("utf-8")
-                
-                mime_type, _ = mimetypes.guess_type(image_path)
-                if not mime_type or mime_type not in ["image/jpeg", "image/png"]:
-                    mime_type = "image/jpeg"  # Default to JPEG if unknown
-                
-                # Construct multimodal prompt
-                prompt = f"""You are an expert teacher. Explain this slide to a student in a clear, engaging, and educational way.
-Use analogies, examples, and break down complex ideas.
-
-Slide Content:
-{text if text.strip() else "This slide contains only an image."}
-
-Please analyze both the image and text (if present) to provide a comprehensive explanation."""
-                
-                messages = [
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:{mime_type};base64,{base64_image}"
-                                }
-                            }
-                        ]
-                    }
-                ]
-                
-                response = client.chat.completions.create(
-                    model="gpt-4o-mini",  # Using GPT-4o Mini for multimodal
-                    messages=messages,
-                    max_tokens=1024,
-                    temperature=0.7
-                )
-                return response.choices[0].message.content.strip()
-                
-            except Exception as e:
-                logger.error(f"OpenAI multimodal call failed: {str(e)}", exc_info=True)
-                raise
-        else:
-            # Text-only call with GPT-4
-            try:
-                prompt = f"""You are an expert teacher. Explain the following slide to a student in a clear, engaging, and educational way.
-Use analogies, examples, and break down complex ideas.
-
-Slide Content:
-{text}
-
-Please provide a comprehensive explanation that helps the student understand the material thoroughly."""
-                
-                response = client.chat.completions.create(
-                    model="gpt-4o-mini",  # Using GPT-4o Mini for text
-                    messages=[{"role": "user", "content": prompt}],
-                    max_tokens=1024,
-                    temperature=0.7
-                )
-                return response.choices[0].message.content.strip()
-                
-            except Exception as e:
-                logger.error(f"OpenAI text-only call failed: {str(e)}", exc_info=True)
-                raise
-
-    def call_gemini(text, image_path=None):
-        api_key = settings.GEMINI_API_KEY.get_secret_value()
-        genai.configure(api_key=api_key)
-        
-        if image_path:
-            # Multimodal call with Gemini Pro Vision
-            try:
-                model = genai.GenerativeModel("gemini-2.0-flash")
-                
-                # Construct multimodal prompt
-                prompt = f"""You are an expert teacher. Explain this slide to a student in a clear, engaging, and educational way.
-Use analogies, examples, and break down complex ideas.
-
-Slide Content:
-{text if text.strip() else "This slide contains only an image."}
-
-Please analyze both the image and text (if present) to provide a comprehensive explanation."""
-                
-                with open(image_path, "rb") as image_file:
-                    image_data = image_file.read()
-                
-                mime_type, _ = mimetypes.guess_type(image_path)
-                if not mime_type or mime_type not in ["image/jpeg", "image/png"]:
-                    mime_type = "image/jpeg"  # Default to JPEG if unknown
-                
-                response = model.generate_content(
-                    [
-                        prompt,
-                        {"mime_type": mime_type, "data": image_data}
-                    ],
-                    generation_config={
-                        "temperature": 0.7,
-                        "max_output_tokens": 1024,
-                    }
-                )
-                return response.text.strip()
-                
-            except Exception as e:
-                logger.error(f"Gemini multimodal call failed: {str(e)}", exc_info=True)
-                raise
-        else:
-            # Text-only call with Gemini Pro
+    with span("cache_key"):
+        deck_hash = await run_in_threadpool(deck_content_hash, slide_deck)
+        explain_key = explain_answer_key(current_user.id, slide_deck, deck_hash, data.slide_number)
+    with span("answer_cache"):
+        cached = await answer_store.get_answer(db, explain_key)
+    if cached:
+        return {"explanation": cached, "provider": "cache"}
+
+    with span("slide_lookup"):
+        slide = await slide_index.get_slide(db, slide_deck, data.slide_number)
+    if slide is None:
+        raise HTTPException(status_code=404, detail="Slide not found")
+
+    logger.debug(f"Settings - PRIMARY_MODEL_PROVIDER: {settings.PRIMARY_MODEL_PROVIDER}, FALLBACK_MODEL_PROVIDER: {settings.FALLBACK_MODEL_PROVIDER}")
+    result = await run_in_threadpool(explain_slide_content, slide.content, slide.image_path, data.slide_number)
+    with span("cache_store"):
+        await run_in_threadpool(answer_store.store_answer, explain_key, result["explanation"])
+    return result
+
+def explain_slide_content(slide_text: str, image_key: str | None, slide_number: int) -> dict:
+    """Explain one slide from its indexed text and stored image; the deck itself is not reopened."""
+    slide_image_path = None
+    if image_key:
+        with span("slide_image"):
             try:
-                model = genai.GenerativeModel("gemini-2.0-flash")
-                
-                prompt = f"""You are an expert teacher. Explain the following slide to a student in a clear, engaging, and educational way.
-Use analogies, examples, and break down complex ideas.
-
-Slide Content:
-{text}
-
-Please provide a comprehensive explanation that helps the student understand the material thoroughly."""
-                
-                response = model.generate_content(
-                    prompt,
-                    generation_config={
-                        "temperature": 0.7,
-                        "max_output_tokens": 1024,
-                    }
-                )
-                return response.text.strip()
-                
-            except Exception as e:
-                logger.error(f"Gemini text-only call failed: {str(e)}", exc_info=True)
-                raise
-
-    def call_model(provider, text, image_path=None):
-        logger.info(f"About to call model provider: {provider} (type: {'multimodal' if image_path else 'text-only'})")
-        if provider not in ["openai", "gemini"]:
-            logger.error(f"Invalid provider specified: {provider}")
-            raise ValueError(f"Provider must be 'openai' or 'gemini', got: {provider}")
-
-        if provider == "openai":
-            return call_openai(text, image_path)
-        elif provider == "gemini":
-            return call_gemini(text, image_path)
+                slide_image_path = get_storage().local_path(image_key)
+            except FileNotFoundError:
+                logger.warning(f"Image of slide {slide_number} is missing from storage: {image_key}")
+    is_multimodal = slide_image_path is not None
 
+    logger.info(f"Starting explain-slide for slide {slide_number}")
     try:
-        logger.info(f"Starting explain-slide for slide {slide_number} - Using primary provider: {primary_provider}")
-        if primary_provider not in ["openai", "gemini"]:
-            logger.error(f"Invalid primary provider in environment: {primary_provider}")
-            raise ValueError(f"PRIMARY_MODEL_PROVIDER must be 'openai' or 'gemini', got: {primary_provider}")
-
-        result = call_model(primary_provider, slide_text, slide_image_path if is_multimodal else None)
-        logger.info(f"Successfully got response from primary provider: {primary_provider}")
+        with span("llm"):
+            prefix, prompt = build_explain_prompt(slide_text, is_multimodal)
+            result, provider, used_fallback = LLMService.generate(
+                prompt,
+                slide_image_path if is_multimodal else None,
+                prefix=prefix
+            )
+    except LLMProviderError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {
+        "explanation": result,
+        "provider": f"{provider}-{'multimodal' if is_multimodal else 'text'}{'-fallback' if used_fallback else ''}"
+    }
+
+@router.post("/explain-deck")
+async def explain_deck(
+    data: ExplainDeckRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Explain every slide of a deck (or the given `slide_numbers`) in one request.
+    The deck is resolved once from the slides table, cached explanations (shared with
+    /explain-slide) are fetched in a single lookup and the rest are generated with up to
+    EXPLAIN_DECK_CONCURRENCY provider calls at a time. Results stream back as NDJSON
+    lines, in slide order or, with "order": "completion", as soon as each is ready.
+    """
+    slide_deck = await get_user_slide_deck(db, current_user.id, data.slide_deck_id)
+    if not slide_deck:
+        raise HTTPException(status_code=404, detail="Slide deck not found")
+    slides = await slide_index.get_deck_slides(db, slide_deck)
+    if data.slide_numbers is not None:
+        wanted = set(data.slide_numbers)
+        slides = [slide for slide in slides if slide.slide_number in wanted]
+    # Slides with neither text nor an image have nothing to explain
+    slides = [slide for slide in slides if slide.content.strip() or slide.image_path]
+    if not slides:
+        raise HTTPException(status_code=404, detail="No slides to explain")
+
+    # Each slide counts against the user's AI rate limit; the lease is held until the stream finishes
+    lease_id = await run_in_threadpool(rate_limit.admit, "ai", current_user.id, cost=len(slides))
+    try:
+        deck_hash = await run_in_threadpool(deck_content_hash, slide_deck)
+        keys = [explain_answer_key(current_user.id, slide_deck, deck_hash, slide.slide_number) for slide in slides]
+        cached_answers = await run_in_threadpool(get_cached_answers, [key.redis_key for key in keys])
+        missing = [i for i, cached in enumerate(cached_answers) if cached is None]
+        if missing:
+            stored = await answer_store.get_stored_answers(db, [keys[i] for i in missing])
+            for i, answer in zip(missing, stored):
+                cached_answers[i] = answer
+    except Exception:
+        await run_in_threadpool(rate_limit.release, "ai", current_user.id, lease_id)
+        raise
+
+    logger.info(f"Explaining {len(slides)} slides of deck {slide_deck.id} for user {current_user.email}")
+    storage = get_storage()
+
+    def explain(index: int) -> dict:
+        slide = slides[index]
+        try:
+            image_path = storage.local_path(slide.image_path) if slide.image_path else None
+            prefix, prompt = build_explain_prompt(slide.content, image_path is not None)
+            explanation, provider, used_fallback = LLMService.generate(prompt, image_path, prefix=prefix)
+        except (LLMProviderError, OSError) as e:
+            return {"slide_number": slide.slide_number, "error": str(e)}
+        answer_store.store_answer(keys[index], explanation)
         return {
-            "explanation": result,
-            "provider": f"{primary_provider}-{'multimodal' if is_multimodal else 'text'}"
+            "slide_number": slide.slide_number,
+            "explanation": explanation,
+            "cached": False,
+            "provider": f"{provider}-{'multimodal' if image_path else 'text'}{'-fallback' if used_fallback else ''}"
         }
-    except Exception as e:
-        logger.error(f"Primary provider ({primary_provider}) failed with error: {str(e)}")
+
+    def stream_results():
+        executor = None
         try:
-            logger.info(f"Primary provider failed, attempting fallback provider: {fallback_provider}")
-            if fallback_provider not in ["openai", "gemini"]:
-                logger.error(f"Invalid fallback provider in environment: {fallback_provider}")
-                raise ValueError(f"FALLBACK_MODEL_PROVIDER must be 'openai' or 'gemini', got: {fallback_provider}")
-
-            result = call_model(fallback_provider, slide_text, slide_image_path if is_multimodal else None)
-            logger.info(f"Successfully got response from fallback provider: {fallback_provider}")
-            return {
-                "explanation": result,
-                "provider": f"{fallback_provider}-{'multimodal' if is_multimodal else 'text'}-fallback"
-            }
-        except Exception as e2:
-            logger.error(f"Both providers failed. Primary ({primary_provider}) error: {str(e)}. Fallback ({fallback_provider}) error: {str(e2)}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"Both AI providers failed. Primary ({primary_provider}) error: {str(e)}. Fallback ({fallback_provider}) error: {str(e2)}"
-            ) 
\ No newline at end of file
+            misses = [i for i, cached in enumerate(cached_answers) if cached is None]
+            futures = {}
+            if misses:
+                executor = ThreadPoolExecutor(max_workers=min(settings.EXPLAIN_DECK_CONCURRENCY, len(misses)))
+                futures = {index: executor.submit(explain, index) for index in misses}
+            if data.order == "completion":
+                for index, cached in enumerate(cached_answers):
+                    if cached is not None:
+                        yield json.dumps({"slide_number": slides[index].slide_number, "explanation": cached, "cached": True, "provider": "cache"}) + "\n"
+                for future in as_completed(futures.values()):
+                    yield json.dumps(future.result()) + "\n"
+                return
+            for index, cached in enumerate(cached_answers):
+                if cached is not None:
+                    result = {"slide_number": slides[index].slide_number, "explanation": cached, "cached": True, "provider": "cache"}
+                else:
+                    result = futures[index].result()
+                yield json.dumps(result) + "\n"
+        finally:
+            if executor:
+                # Stop pending provider calls if the client went away mid-stream
+                executor.shutdown(wait=False, cancel_futures=True)
+            rate_limit.release("ai", current_user.id, lease_id)
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from backend.app.core.database import get_db
-from backend.app.services.user_service import get_user_by_email, create_user, authenticate_user
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.app.core.database import get_async_db
+from backend.app.services.user_service import get_user_by_email, get_user_principal, create_user, authenticate_user
+from backend.app.services.password_hasher import PasswordHasherBusyError
 from backend.app.core.security import create_access_token, decode_access_token
+from backend.app.core.tracing import span
 from pydantic import BaseModel, EmailStr
 import logging
 from fastapi.security import OAuth2PasswordBearer
@@ -22,23 +24,31 @@ class LoginRequest(BaseModel):
     password: str
 
 @router.post("/register")
-def register(data: RegisterRequest, db: Session = Depends(get_db)):
+async def register(data: RegisterRequest, db: AsyncSession = Depends(get_async_db)):
     logger.info(f"Registration attempt: {data.email}")
-    if get_user_by_email(db, data.email):
+    if await get_user_by_email(db, data.email):
         logger.warning(f"Registration failed: Email already registered: {data.email}")
         raise HTTPException(status_code=400, detail="Email already registered")
     try:
-        user = create_user(db, data.email, data.password)
+        user = await create_user(db, data.email, data.password)
         logger.info(f"Registration successful: {data.email}")
         return {"id": user.id, "email": user.email}
+    except PasswordHasherBusyError as e:
+        logger.warning(f"Registration rejected, password hasher busy: {e}")
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
     except Exception as e:
         logger.error(f"Registration error for {data.email}: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Registration failed")
 
 @router.post("/login")
-def login(data: LoginRequest, db: Session = Depends(get_db)):
+async def login(data: LoginRequest, db: AsyncSession = Depends(get_async_db)):
     logger.info(f"Login attempt: {data.email}")
-    user = authenticate_user(db, data.email, data.password)
+    try:
+        with span("authenticate"):
+            user = await authenticate_user(db, data.email, data.password)
+    except PasswordHasherBusyError as e:
+        logger.warning(f"Login rejected, password hasher busy: {e}")
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
     if not user:
         logger.warning(f"Login failed: Invalid credentials for {data.email}")
         raise HTTPException(status_code=401, detail="Invalid credentials")
@@ -46,17 +56,22 @@ def login(data: LoginRequest, db: Session = Depends(get_db)):
     logger.info(f"Login successful: {data.email}")
     return {"access_token": access_token, "token_type": "bearer"}
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    payload = decode_access_token(token)
-    if payload is None or "sub" not in payload:
-        raise credentials_exception
-    email = payload["sub"]
-    user = get_user_by_email(db, email)
+    with span("auth"):
+        payload = decode_access_token(token)
+        if payload is None or "sub" not in payload:
+            raise credentials_exception
+        email = payload["sub"]
+        # Cached per worker, so a warm request does not touch the database
+        user = await get_user_principal(db, email)
     if user is None:
         raise credentials_exception
+    if not user.is_active:
+        logger.warning(f"Rejected token for inactive user: {email}")
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Inactive user")
     return user 
\ No newline at end of file
@@ -1,74 +1,98 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from backend.app.models import File as FileModel, User
 from backend.app.api.auth import get_current_user
-from backend.app.core.database import get_db
-from backend.app.utils.file_utils import generate_unique_filename
+from backend.app.core.config import get_settings
+from backend.app.core.database import get_async_db
+from backend.app.core import rate_limit
+from backend.app.utils.pagination import encode_cursor, decode_cursor
 import os
-from typing import List
+from typing import List, Optional
 from backend.app.services.conversion_service import FileConversionService
-from fastapi.responses import FileResponse
+from backend.app.core.tracing import span
+from backend.app.services import deck_summary, slide_index
+from backend.app.services.storage import get_storage, make_key
 
+settings = get_settings()
 router = APIRouter()
 
-UPLOAD_DIR = 'uploaded_files'
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
 IMAGE_EXTS = ['.jpg', '.jpeg', '.png', '.gif', '.bmp']
 
-@router.post('/upload', status_code=201)
-def upload_file(
+def save_upload(upload: UploadFile, user_id: int) -> tuple[FileModel, bool]:
+    """
+    Stream the upload into storage and convert it to PPTX where applicable.
+    Returns the new (unsaved) file row and whether it is an image left for batch conversion.
+    """
+    ext = os.path.splitext(upload.filename)[1].lower()
+    file_key = make_key(upload.filename)
+    size = get_storage().save(file_key, upload.file)
+    
+    # Check if it's a direct PPTX upload
+    is_pptx = (upload.content_type == 'application/vnd.openxmlformats-officedocument.presentationml.presentation' or 
+              upload.filename.lower().endswith('.pptx'))
+    
+    db_file = FileModel(
+        filename=upload.filename,  # Store original filename
+        content_type=upload.content_type,
+        user_id=user_id,
+        path=file_key,
+        size_bytes=size,
+        conversion_status="pending"
+    )
+    
+    # For direct PPTX uploads, set converted_pptx_path to the original file
+    if is_pptx:
+        db_file.converted_pptx_path = file_key
+        db_file.conversion_status = "success"
+    # For images, collect for batch conversion
+    elif ext in IMAGE_EXTS:
+        return db_file, True
+    # For other file types, convert immediately
+    else:
+        if ext in ['.pdf', '.txt', '.doc', '.docx']:
+            try:
+                db_file.converted_pptx_path = FileConversionService.convert_to_pptx(file_key, ext)
+                db_file.conversion_status = "success"
+            except Exception as e:
+                db_file.conversion_status = f"failed: {e}"
+        else:
+            db_file.conversion_status = "not_applicable"
+    return db_file, False
+
+@router.post('/upload', status_code=201, dependencies=[Depends(rate_limit.rate_limited("upload"))])
+async def upload_file(
     uploads: List[UploadFile] = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     uploaded_files = []
-    image_paths = []
+    db_files = []
+    image_keys = []
     image_db_objs = []
 
+    if settings.STORAGE_QUOTA_BYTES_PER_USER:
+        used = await db.scalar(
+            select(func.coalesce(func.sum(FileModel.size_bytes), 0)).where(FileModel.user_id == current_user.id)
+        )
+        incoming = sum(upload.size or 0 for upload in uploads)
+        if used + incoming > settings.STORAGE_QUOTA_BYTES_PER_USER:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Storage quota exceeded")
+
     # First, save all files and collect image paths if batch
     for upload in uploads:
-        ext = os.path.splitext(upload.filename)[1].lower()
-        unique_filename = generate_unique_filename(upload.filename)
-        file_path = os.path.join(UPLOAD_DIR, unique_filename)
-        with open(file_path, 'wb') as f:
-            f.write(upload.file.read())
-        
-        # Check if it's a direct PPTX upload
-        is_pptx = (upload.content_type == 'application/vnd.openxmlformats-officedocument.presentationml.presentation' or 
-                  upload.filename.lower().endswith('.pptx'))
-        
-        db_file = FileModel(
-            filename=upload.filename,  # Store original filename
-            content_type=upload.content_type,
-            user_id=current_user.id,
-            path=file_path,
-            conversion_status="pending"
-        )
-        
-        # For direct PPTX uploads, set converted_pptx_path to the original file
-        if is_pptx:
-            db_file.converted_pptx_path = file_path
-            db_file.conversion_status = "success"
-        # For images, collect for batch conversion
-        elif ext in IMAGE_EXTS:
-            image_paths.append(file_path)
+        # File writes and conversions block, so they run in the threadpool
+        with span("save_convert"):
+            db_file, is_image = await run_in_threadpool(save_upload, upload, current_user.id)
+        if is_image:
+            image_keys.append(db_file.path)
             image_db_objs.append(db_file)
-        # For other file types, convert immediately
-        else:
-            if ext in ['.pdf', '.txt', '.doc', '.docx']:
-                try:
-                    pptx_path = FileConversionService.convert_to_pptx(file_path, ext, UPLOAD_DIR)
-                    db_file.converted_pptx_path = pptx_path
-                    db_file.conversion_status = "success"
-                except Exception as e:
-                    db_file.conversion_status = f"failed: {e}"
-            else:
-                db_file.conversion_status = "not_applicable"
-        
-        db.add(db_file)
-        db.commit()
-        db.refresh(db_file)
+        with span("db_write"):
+            db.add(db_file)
+            await db.commit()
+            await db.refresh(db_file)
+        db_files.append(db_file)
         
         uploaded_files.append({
             "id": db_file.id,
@@ -77,72 +101,117 @@ def upload_file(
             "conversion_status": db_file.conversion_status
         })
     # If there are images, convert all to one PPTX
-    if image_paths:
+    if image_keys:
         try:
-            pptx_name = generate_unique_filename("images.pptx")
-            pptx_path = os.path.join(UPLOAD_DIR, pptx_name)
-            FileConversionService.images_to_pptx(image_paths, pptx_path)
+            with span("image_convert"):
+                pptx_key = await run_in_threadpool(
+                    FileConversionService.convert_to_pptx, image_keys[0], os.path.splitext(image_keys[0])[1], image_keys
+                )
             # Update all image db objects with the same pptx path
             for db_file in image_db_objs:
-                db_file.converted_pptx_path = pptx_path
+                db_file.converted_pptx_path = pptx_key
                 db_file.conversion_status = "success"
-                db.commit()
         except Exception as e:
             for db_file in image_db_objs:
                 db_file.conversion_status = f"failed: {e}"
-                db.commit()
+        await db.commit()
+    # Store slide text and images once so decks are searchable and served without reopening the PPTX
+    converted = [f for f in db_files if f.conversion_status == "success"]
+    with span("slide_index"):
+        await slide_index.index_decks(db, converted)
+    # Large decks are summarized in the background for compact /ask prompts
+    await run_in_threadpool(deck_summary.enqueue, [f.id for f in converted])
     return {"uploaded": uploaded_files}
 
+async def get_user_file(db: AsyncSession, user_id: int, file_id: int) -> FileModel | None:
+    result = await db.execute(select(FileModel).where(FileModel.id == file_id, FileModel.user_id == user_id))
+    return result.scalars().first()
+
+LIST_COLUMNS = (
+    FileModel.id,
+    FileModel.filename,
+    FileModel.content_type,
+    FileModel.upload_time,
+    FileModel.path,
+    FileModel.converted_pptx_path,
+    FileModel.conversion_status,
+)
+
 @router.get('/list', status_code=200)
-def list_files(
-    db: Session = Depends(get_db),
+async def list_files(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    conversion_status: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    files = db.query(FileModel).filter(FileModel.user_id == current_user.id).order_by(FileModel.upload_time.desc()).all()
-    return [
-        {
-            "id": f.id,
-            "filename": f.filename,
-            "content_type": f.content_type,
-            "upload_time": f.upload_time,
-            "path": f.path,
-            "converted_pptx_path": f.converted_pptx_path,
-            "conversion_status": f.conversion_status
-        }
-        for f in files
-    ]
+    """
+    The user's files, newest first, one page at a time.
+    Pass `next_cursor` from the previous page as `cursor` to continue; it is null on the last page.
+    `conversion_status` filters by status ("failed" matches every failure).
+    """
+    query = select(*LIST_COLUMNS).where(FileModel.user_id == current_user.id)
+    if cursor:
+        try:
+            upload_time, file_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(tuple_(FileModel.upload_time, FileModel.id) < tuple_(upload_time, file_id))
+    if conversion_status == "failed":
+        query = query.where(FileModel.conversion_status.startswith("failed"))
+    elif conversion_status:
+        query = query.where(FileModel.conversion_status == conversion_status)
+    # Fetch one extra row to know whether another page follows
+    query = query.order_by(FileModel.upload_time.desc(), FileModel.id.desc()).limit(limit + 1)
+    rows = (await db.execute(query)).all()
+    next_cursor = encode_cursor(rows[limit - 1].upload_time, rows[limit - 1].id) if len(rows) > limit else None
+    return {
+        "items": [
+            {
+                "id": row.id,
+                "filename": row.filename,
+                "content_type": row.content_type,
+                "upload_time": row.upload_time,
+                "path": row.path,
+                "converted_pptx_path": row.converted_pptx_path,
+                "conversion_status": row.conversion_status
+            }
+            for row in rows[:limit]
+        ],
+        "next_cursor": next_cursor,
+    }
 
 @router.get('/download/{file_id}', status_code=200)
-def download_file(
+async def download_file(
     file_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    db_file = db.query(FileModel).filter(FileModel.id == file_id, FileModel.user_id == current_user.id).first()
+    db_file = await get_user_file(db, current_user.id, file_id)
     if not db_file:
         raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(
-        path=db_file.path,
-        filename=db_file.filename,
-        media_type=db_file.content_type,
-        headers={"Content-Disposition": f"attachment; filename=\"{db_file.filename}\""}
-    )
+    try:
+        return get_storage().file_response(db_file.path, db_file.content_type, db_file.filename)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found in storage")
 
 @router.get('/download-pptx/{file_id}', status_code=200)
-def download_converted_pptx(
+async def download_converted_pptx(
     file_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    db_file = db.query(FileModel).filter(FileModel.id == file_id, FileModel.user_id == current_user.id).first()
+    db_file = await get_user_file(db, current_user.id, file_id)
     if not db_file or not db_file.converted_pptx_path:
         raise HTTPException(status_code=404, detail="Converted PPTX not found")
     pptx_filename = db_file.filename
     if not pptx_filename.lower().endswith('.pptx'):
         pptx_filename = pptx_filename.rsplit('.', 1)[0] + '.pptx'
-    return FileResponse(
-        path=db_file.converted_pptx_path,
-        filename=pptx_filename,
-        media_type='application/vnd.openxmlformats-officedocument.presentationml.presentation',
-        headers={"Content-Disposition": f"attachment; filename=\"{pptx_filename}\""}
-    ) 
\ No newline at end of file
+    try:
+        return get_storage().file_response(
+            db_file.converted_pptx_path,
+            'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+            pptx_filename,
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Converted PPTX not found in storage") 
\ No newline at end of file
@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import FileResponse
+from backend.app.core import profiling
+
+router = APIRouter(prefix="/profiles", tags=["profiling"])
+
+
+def require_profiling_token(x_profile: str | None = Header(None)):
+    if not profiling.token_matches(x_profile):
+        raise HTTPException(status_code=403, detail="Profiling token required")
+
+
+@router.get("", dependencies=[Depends(require_profiling_token)])
+def list_profiles():
+    """Stored request profiles, newest first."""
+    return {"profiles": profiling.list_profiles()}
+
+
+@router.get("/{profile_id}", dependencies=[Depends(require_profiling_token)])
+def download_profile(profile_id: str):
+    path = profiling.profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=profile_id + profiling.PROFILE_SUFFIX)
@@ -22,17 +22,156 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: SecretStr
     POSTGRES_DB: str = "ai_tutor"
     SQLALCHEMY_DATABASE_URI: Optional[str] = None
+    DB_POOL_SIZE: int = 10  # per engine, per worker
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 5.0
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = False
     
     # Redis
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_PASSWORD: Optional[SecretStr] = None
+    REDIS_MAX_CONNECTIONS: int = 50  # per pool, per worker
+    REDIS_POOL_TIMEOUT: float = 2.0  # wait for a free connection when the pool is exhausted
+    REDIS_SOCKET_TIMEOUT: float = 5.0
+    REDIS_SOCKET_CONNECT_TIMEOUT: float = 2.0
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
+    
+    # File storage for uploads, converted decks and slide images
+    STORAGE_BACKEND: str = "local"  # "local" or "s3" (any S3-compatible service, e.g. MinIO)
+    STORAGE_LOCAL_ROOT: str = "uploaded_files"
+    STORAGE_CACHE_DIR: str = "storage_cache"  # local copies of remote objects for parsing and conversion
+    STORAGE_CACHE_MAX_BYTES: int = 2 * 1024 * 1024 * 1024  # per host; least recently used copies are evicted beyond it
+    S3_BUCKET: Optional[str] = None
+    S3_ENDPOINT_URL: Optional[str] = None  # e.g. http://localhost:9000 for MinIO
+    S3_REGION: Optional[str] = None
+    S3_ACCESS_KEY_ID: Optional[str] = None
+    S3_SECRET_ACCESS_KEY: Optional[SecretStr] = None
+    
+    STORAGE_QUOTA_BYTES_PER_USER: int = 1024 * 1024 * 1024  # uploads over this get 413; 0 disables
+    
+    # Storage janitor: one worker at a time (Redis lock) reclaims orphaned and expired files in small batches
+    JANITOR_ENABLED: bool = True
+    JANITOR_INTERVAL_SECONDS: float = 30.0
+    JANITOR_BATCH_SIZE: int = 200  # objects inspected (and rows updated) per batch
+    JANITOR_ORPHAN_GRACE_SECONDS: int = 3600  # unreferenced objects younger than this may belong to an upload in progress
+    JANITOR_TEMP_MAX_AGE_SECONDS: int = 3600
+    # Deleting failed conversions removes the user's upload (row and source file), so it is opt-in
+    JANITOR_DELETE_FAILED_CONVERSIONS: bool = False
+    JANITOR_FAILED_RETENTION_DAYS: int = 7
+    
+    # PDF conversion: optionally render each page to an image (in a process pool) next to its text
+    PDF_RASTERIZE: bool = False
+    PDF_RASTER_DPI: int = 110
+    PDF_RASTER_MAX_PIXELS: int = 6_000_000  # larger pages are rendered at a lower DPI
+    PDF_RASTER_WORKERS: int = 2
+    PDF_RASTER_WORKER_MEMORY_MB: int = 1024  # address-space cap per render process; pages over it stay text-only
+    PDF_RASTER_TIMEOUT_SECONDS: float = 120.0  # per document; pages not rendered in time stay text-only
+    PDF_PAGE_CACHE_TTL_DAYS: int = 30  # the janitor deletes cached page renders older than this
+    
+    # In-process cache tier in front of Redis (per worker)
+    LOCAL_CACHE_MAX_ENTRIES: int = 2048
+    LOCAL_CACHE_MAX_BYTES: int = 32 * 1024 * 1024  # 32MB
+    LOCAL_CACHE_TTL_SECONDS: int = 300
+    
+    # Authenticated-user principals cached per worker; bounds how long a deactivation can take to apply
+    AUTH_USER_CACHE_TTL_SECONDS: int = 30
+    AUTH_USER_CACHE_MAX_ENTRIES: int = 10000
+    
+    # Password hashing runs in a separate process pool
+    PASSWORD_BCRYPT_ROUNDS: int = 12  # changing this rehashes passwords on next login
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    PASSWORD_HASH_TIMEOUT_SECONDS: float = 10.0
+    
+    # Logging: records are queued and written by a background thread
+    LOG_QUEUE_MAX_SIZE: int = 10000  # records beyond this are dropped (and counted) rather than blocking requests
+    LOG_FILE_MAX_BYTES: int = 50 * 1024 * 1024
+    LOG_FILE_BACKUP_COUNT: int = 5
+    # Below WARNING only, per logger (children included): fraction kept, and max records per second
+    LOG_SAMPLE_RATES: dict[str, float] = {}  # e.g. {"ai_teacher": 0.1}
+    LOG_RATE_LIMITS: dict[str, int] = {}  # e.g. {"request": 200}
+    
+    # Optional OpenTelemetry trace export (needs opentelemetry-sdk and opentelemetry-exporter-otlp)
+    OTEL_ENABLED: bool = False
+    OTEL_EXPORTER_OTLP_ENDPOINT: str = "http://localhost:4317"
+    OTEL_SERVICE_NAME: str = "ai-tutor-backend"
+    
+    # Health probes: dependency checks run in the background, probes read the last result
+    HEALTH_CHECK_INTERVAL_SECONDS: float = 5.0
+    HEALTH_CHECK_TIMEOUT_SECONDS: float = 1.0
+    HEALTH_CHECK_MAX_AGE_SECONDS: float = 30.0  # readiness fails if no check finished within this
+    
+    # On-demand request profiling; when disabled the middleware is not installed at all
+    PROFILING_ENABLED: bool = False
+    PROFILING_TOKEN: Optional[SecretStr] = None  # sent as X-Profile to profile one request and to download profiles
+    PROFILING_SAMPLE_RATE: float = 0.0  # fraction of requests profiled without the header
+    PROFILING_INTERVAL_MS: float = 5.0
+    PROFILING_DIR: str = "profiles"
+    PROFILING_MAX_FILES: int = 50
     
     # AI Models
     OPENAI_API_KEY: SecretStr
     GEMINI_API_KEY: SecretStr
     PRIMARY_MODEL_PROVIDER: str = "openai"
     FALLBACK_MODEL_PROVIDER: str = "gemini"
+    OPENAI_MODEL: str = "gpt-4o-mini"
+    GEMINI_MODEL: str = "gemini-2.0-flash"
+    # Explicit Gemini context caching of long prompt prefixes (google-generativeai>=0.7); OpenAI caches prefixes automatically
+    GEMINI_CONTEXT_CACHE_ENABLED: bool = True
+    GEMINI_CONTEXT_CACHE_MIN_TOKENS: int = 32768  # the provider's minimum cacheable size
+    GEMINI_CONTEXT_CACHE_TTL_SECONDS: int = 3600
+    
+    # Provider bulkheads (per provider/model, shared across workers through Redis)
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_TOKENS_PER_MINUTE: int = 200000  # 0 disables the token budget
+    LLM_QUEUE_MAX_SIZE: int = 32  # waiting calls per worker before rejecting
+    LLM_QUEUE_TIMEOUT_SECONDS: float = 10.0
+    LLM_SLOT_LEASE_SECONDS: int = 120
+    LLM_PROVIDER_LIMITS: dict[str, dict] = {}  # e.g. {"openai:gpt-4o-mini": {"max_concurrency": 16}}
+    
+    # Durable answer store in Postgres behind the Redis cache
+    ANSWER_STORE_ENABLED: bool = True
+    ANSWER_STORE_QUEUE_MAX_SIZE: int = 1000  # pending background writes; more are dropped and counted
+    
+    # Semantic answer cache (near-duplicate questions), opt-in
+    SEMANTIC_CACHE_ENABLED: bool = False
+    SEMANTIC_CACHE_THRESHOLD: float = 0.8  # minimum cosine similarity for a hit
+    # A chroma server shared by all workers (e.g. the chromadb/chroma image); without one each worker keeps its own in memory
+    SEMANTIC_CACHE_CHROMA_HOST: Optional[str] = None
+    SEMANTIC_CACHE_CHROMA_PORT: int = 8000
+    SEMANTIC_CACHE_TTL_SECONDS: int = 3600  # same as the exact-match Redis tier
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 1000  # per deck version and model; the oldest are evicted beyond it
+    SEMANTIC_CACHE_EMBEDDING_MODEL: Optional[str] = None  # local sentence-transformers model; hashing vectorizer if unset
+    
+    # Per-user admission control (token bucket + concurrent request cap, in Redis)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_AI_REQUESTS_PER_MINUTE: int = 30
+    RATE_LIMIT_AI_BURST: int = 30
+    RATE_LIMIT_AI_MAX_CONCURRENT: int = 3
+    RATE_LIMIT_UPLOAD_REQUESTS_PER_MINUTE: int = 10
+    RATE_LIMIT_UPLOAD_BURST: int = 5
+    RATE_LIMIT_UPLOAD_MAX_CONCURRENT: int = 2
+    RATE_LIMIT_LEASE_SECONDS: int = 300
+    
+    # Batch questions
+    ASK_BATCH_MAX_QUESTIONS: int = 30
+    ASK_BATCH_CONCURRENCY: int = 4
+    
+    # Whole-deck explanations (/explain-deck)
+    EXPLAIN_DECK_CONCURRENCY: int = 4  # slides explained at once per request
+    
+    # Deck summaries: built in the background so /ask on a large deck sends an overview plus the relevant slides
+    DECK_SUMMARY_ENABLED: bool = True
+    DECK_SUMMARY_MIN_DECK_CHARS: int = 12000  # smaller decks are always sent in full
+    DECK_SUMMARY_SECTION_SLIDES: int = 8
+    DECK_SUMMARY_SLIDE_MIN_CHARS: int = 400  # shorter slides serve as their own summary
+    DECK_SUMMARY_CALLS_PER_MINUTE: int = 30  # provider calls for summaries, across all workers
+    DECK_SUMMARY_POLL_SECONDS: float = 10.0
+    DECK_SUMMARY_MAX_ATTEMPTS: int = 5  # a deck that keeps failing is dropped from the queue after this
+    DECK_SUMMARY_RETRY_BASE_SECONDS: int = 300  # doubled after every failed attempt
+    DECK_CONTEXT_SLIDES: int = 4  # slides sent in full next to the overview
     
     @validator("SQLALCHEMY_DATABASE_URI", pre=True)
     def assemble_db_connection(cls, v: Optional[str], values: dict) -> str:
@@ -1,16 +1,126 @@
+import threading
+import time
 from sqlalchemy import create_engine
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from backend.app.models import Base
 from backend.app.core.config import get_settings
+from backend.app.core.metrics import DB_POOL_CHECKOUT_WAIT, DB_POOL_TIMEOUTS
 
 settings = get_settings()
 
-engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, pool_pre_ping=True)
+
+class PoolMetrics:
+    """Checkout wait times and timeouts for one connection pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, waited: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 3),
+                "wait_seconds_max": round(self.wait_seconds_max, 3),
+            }
+
+
+class _TimedCheckout:
+    """Pool mixin timing how long each checkout waits for a free connection."""
+    metrics: PoolMetrics
+    pool_name: str
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except sa_exc.TimeoutError:
+            self.metrics.record(time.perf_counter() - start, timed_out=True)
+            DB_POOL_TIMEOUTS.labels(self.pool_name).inc()
+            raise
+        waited = time.perf_counter() - start
+        self.metrics.record(waited)
+        DB_POOL_CHECKOUT_WAIT.labels(self.pool_name).observe(waited)
+        return connection
+
+
+class _SyncPool(_TimedCheckout, QueuePool):
+    metrics = PoolMetrics()
+    pool_name = "sync"
+
+
+class _AsyncPool(_TimedCheckout, AsyncAdaptedQueuePool):
+    metrics = PoolMetrics()
+    pool_name = "async"
+
+
+def _pool_kwargs() -> dict:
+    # pre-ping costs a round trip per checkout; recycling stale connections is usually enough
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def _async_url(uri: str):
+    url = make_url(uri)
+    if url.drivername in ("postgresql", "postgresql+psycopg2"):
+        url = url.set(drivername="postgresql+asyncpg")
+    return url
+
+
+# Sync engine for background jobs and scripts
+engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, poolclass=_SyncPool, **_pool_kwargs())
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine used by the API routes
+async_engine = create_async_engine(_async_url(settings.SQLALCHEMY_DATABASE_URI), poolclass=_AsyncPool, **_pool_kwargs())
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def _pool_stats(pool, metrics: PoolMetrics) -> dict:
+    return {
+        "pool_size": pool.size(),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "in_use": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(0, pool.overflow()),
+        **metrics.snapshot(),
+    }
+
+def get_db_pool_stats() -> dict:
+    """Connection usage and checkout waits for the sync and async pools in this worker."""
+    return {
+        "sync": _pool_stats(engine.pool, _SyncPool.metrics),
+        "async": _pool_stats(async_engine.sync_engine.pool, _AsyncPool.metrics),
+    }
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import time
+from sqlalchemy import text
+from backend.app.core.config import get_settings
+from backend.app.core.database import AsyncSessionLocal
+from backend.app.services.provider_limiter import get_limiter_stats
+from backend.app.utils.redis_client import get_async_redis_client
+
+settings = get_settings()
+logger = logging.getLogger("health")
+
+# Without these the worker cannot serve requests; the others only degrade it
+CRITICAL_CHECKS = ("database",)
+
+_snapshot: dict | None = None
+_refresh_task: asyncio.Task | None = None
+
+
+async def _check_database() -> str:
+    async with AsyncSessionLocal() as db:
+        await db.execute(text("SELECT 1"))
+    return "up"
+
+
+async def _check_redis() -> str:
+    if not settings.REDIS_HOST:
+        return "not_configured"
+    return "up" if await get_async_redis_client().ping() else "down"
+
+
+async def _check_ai_models() -> str:
+    # In-process bulkhead state, no I/O; saturated means calls are queueing for a slot
+    saturated = any(stats["queue_depth"] > 0 for stats in get_limiter_stats())
+    return "saturated" if saturated else "up"
+
+
+CHECKS = {
+    "database": _check_database,
+    "redis": _check_redis,
+    "ai_models": _check_ai_models,
+}
+
+
+async def _timed(name: str, check) -> dict:
+    start = time.perf_counter()
+    try:
+        result = {"status": await asyncio.wait_for(check(), settings.HEALTH_CHECK_TIMEOUT_SECONDS)}
+    except asyncio.TimeoutError:
+        result = {"status": "timeout"}
+    except Exception as e:
+        result = {"status": "down", "error": f"{type(e).__name__}: {e}"}
+    result["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    if result["status"] in ("timeout", "down"):
+        logger.warning(f"Health check {name} {result['status']} after {result['latency_ms']}ms: {result.get('error', '')}")
+    return result
+
+
+async def refresh():
+    """Run all dependency checks concurrently, each bounded by HEALTH_CHECK_TIMEOUT_SECONDS."""
+    global _snapshot
+    results = await asyncio.gather(*(_timed(name, check) for name, check in CHECKS.items()))
+    _snapshot = {"checked_at": time.time(), "checks": dict(zip(CHECKS, results))}
+
+
+async def _refresh_loop():
+    while True:
+        await asyncio.sleep(settings.HEALTH_CHECK_INTERVAL_SECONDS)
+        try:
+            await refresh()
+        except Exception as e:
+            logger.error(f"Health refresh failed: {str(e)}", exc_info=True)
+
+
+async def start():
+    """Run the first check, then keep refreshing in the background of this worker."""
+    global _refresh_task
+    await refresh()
+    _refresh_task = asyncio.create_task(_refresh_loop())
+
+
+async def stop():
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        try:
+            await _refresh_task
+        except asyncio.CancelledError:
+            pass
+
+
+def get_readiness() -> tuple[bool, dict]:
+    """Readiness from the last background check; no I/O. Stale or missing results count as not ready."""
+    if _snapshot is None:
+        return False, {"status": "starting", "checks": {}}
+    age = time.time() - _snapshot["checked_at"]
+    checks = _snapshot["checks"]
+    if age > settings.HEALTH_CHECK_MAX_AGE_SECONDS:
+        ready, status = False, "stale"
+    elif any(checks[name]["status"] != "up" for name in CRITICAL_CHECKS):
+        ready, status = False, "unavailable"
+    elif any(result["status"] not in ("up", "not_configured") for result in checks.values()):
+        ready, status = True, "degraded"
+    else:
+        ready, status = True, "ready"
+    return ready, {"status": status, "checked_seconds_ago": round(age, 1), "checks": checks}
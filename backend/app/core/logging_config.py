@@ -1,8 +1,19 @@
+import atexit
+import copy
 import logging
+import queue
+import random
 import sys
 import json
-import os
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
+from backend.app.core import tracing
+from backend.app.core.config import get_settings
+from backend.app.core.metrics import LOG_RECORDS_DROPPED
+
+settings = get_settings()
 
 class JsonFormatter(logging.Formatter):
     def format(self, record):
@@ -12,37 +23,131 @@ class JsonFormatter(logging.Formatter):
             'name': record.name,
             'message': record.getMessage(),
         }
+        # Request context (captured by RequestContextQueueHandler) so log lines of one request can be joined
+        request_id = getattr(record, 'request_id', None)
+        if request_id:
+            log_record['request_id'] = request_id
+            if record.trace_id:
+                log_record['trace_id'] = record.trace_id
+            if record.timings_ms:
+                log_record['timings_ms'] = record.timings_ms
         if record.exc_info:
             log_record['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            log_record['exc_info'] = record.exc_text
         return json.dumps(log_record)
 
 
+class RequestContextQueueHandler(QueueHandler):
+    """
+    Hands records to the background listener without blocking. Request context lives in
+    contextvars of the calling thread, so it is copied onto the record here; formatting
+    and I/O happen on the listener thread. When the queue is full the record is dropped.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # Tracebacks reference frames that may be gone by the time the listener runs
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.request_id = tracing.get_request_id()
+        record.trace_id = tracing.get_trace_id() if record.request_id else None
+        record.timings_ms = tracing.get_timings() if record.request_id else None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.labels('queue_full').inc()
+
+
+class HotPathFilter(logging.Filter):
+    """
+    Samples and rate-limits records below WARNING for the configured loggers (and their
+    children); warnings and errors always pass.
+    """
+
+    def __init__(self, sample_rates: dict[str, float], rate_limits: dict[str, int]):
+        super().__init__()
+        self.sample_rates = sample_rates
+        self.rate_limits = rate_limits
+        self._lock = threading.Lock()
+        self._windows: dict[str, list] = {}  # logger -> [window start second, records in window]
+
+    @staticmethod
+    def _lookup(config: dict, name: str):
+        while True:
+            if name in config:
+                return name, config[name]
+            if '.' not in name:
+                return None, None
+            name = name.rsplit('.', 1)[0]
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        _, rate = self._lookup(self.sample_rates, record.name)
+        if rate is not None and random.random() >= rate:
+            LOG_RECORDS_DROPPED.labels('sampled').inc()
+            return False
+        key, limit = self._lookup(self.rate_limits, record.name)
+        if limit is not None:
+            second = int(time.monotonic())
+            with self._lock:
+                window = self._windows.setdefault(key, [second, 0])
+                if window[0] != second:
+                    window[0], window[1] = second, 0
+                window[1] += 1
+                allowed = window[1] <= limit
+            if not allowed:
+                LOG_RECORDS_DROPPED.labels('rate_limited').inc()
+                return False
+        return True
+
+
 def setup_logging():
     # Create logs directory if it doesn't exist
     log_dir = Path("logs")
     log_dir.mkdir(exist_ok=True)
-    
+
     # Console handler
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(JsonFormatter())
-    
-    # File handler
-    file_handler = logging.FileHandler("logs/ai_tutor.log")
+
+    # File handler, rotated by size
+    file_handler = RotatingFileHandler(
+        "logs/ai_tutor.log",
+        maxBytes=settings.LOG_FILE_MAX_BYTES,
+        backupCount=settings.LOG_FILE_BACKUP_COUNT,
+    )
     file_handler.setFormatter(JsonFormatter())
-    
+
+    # Request threads only enqueue; a single listener thread formats and writes
+    queue_handler = RequestContextQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_MAX_SIZE))
+    if settings.LOG_SAMPLE_RATES or settings.LOG_RATE_LIMITS:
+        queue_handler.addFilter(HotPathFilter(settings.LOG_SAMPLE_RATES, settings.LOG_RATE_LIMITS))
+    listener = QueueListener(queue_handler.queue, console_handler, file_handler, respect_handler_level=True)
+    listener.start()
+    # Flush what is still queued when the worker exits
+    atexit.register(listener.stop)
+
     # Configure root logger
     root = logging.getLogger()
     root.setLevel(logging.INFO)
-    root.handlers = [console_handler, file_handler]
+    root.handlers = [queue_handler]
 
     # Silence overly verbose loggers
     logging.getLogger('uvicorn').setLevel(logging.WARNING)
     logging.getLogger('sqlalchemy').setLevel(logging.WARNING)
-    
+
     # Ensure our AI teacher logger is at INFO level
     ai_logger = logging.getLogger("ai_teacher")
     ai_logger.setLevel(logging.INFO)
-    
+
     logging.info("Logging configured - writing to console and logs/ai_tutor.log")
 
-setup_logging() 
\ No newline at end of file
+setup_logging()
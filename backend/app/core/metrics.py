@@ -0,0 +1,245 @@
+"""
+Prometheus metrics.
+
+With several uvicorn workers, set PROMETHEUS_MULTIPROC_DIR to an empty directory
+shared by the workers before the app starts (docker-entrypoint.sh does this); each
+worker then writes its samples there and /metrics aggregates all of them.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+LLM_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency until the last response byte, by route template and status",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_REQUEST_DURATION = Histogram(
+    "llm_request_duration_seconds",
+    "Provider call latency, excluding time queued for a slot",
+    ["provider", "model", "outcome"],
+    buckets=LLM_BUCKETS,
+)
+LLM_REQUESTS = Counter(
+    "llm_requests_total",
+    "Provider calls by outcome (success, error, rejected by the bulkhead)",
+    ["provider", "model", "outcome"],
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Tokens reported by the provider (kind: prompt, cached_prompt, completion)",
+    ["provider", "model", "kind"],
+)
+LLM_PROMPT_CACHED_RATIO = Histogram(
+    "llm_prompt_cached_ratio",
+    "Fraction of each call's prompt tokens served from the provider's prompt cache",
+    ["provider", "model"],
+    buckets=(0, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 1),
+)
+AI_CACHE_LOOKUPS = Counter(
+    "ai_cache_lookups_total",
+    "Answer cache lookups by result (local_hit, redis_hit, miss)",
+    ["result"],
+)
+FILE_CONVERSION_DURATION = Histogram(
+    "file_conversion_duration_seconds",
+    "Time to convert an upload to PPTX",
+    ["file_type", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a database connection",
+    ["pool"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5),
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts_total",
+    "Checkouts that gave up waiting for a database connection",
+    ["pool"],
+)
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total",
+    "Log records not written, by reason (queue_full, sampled, rate_limited)",
+    ["reason"],
+)
+ANSWER_STORE_WRITES_DROPPED = Counter(
+    "answer_store_writes_dropped_total",
+    "Answer store writes dropped because the write queue was full, by kind (persist, hits)",
+    ["kind"],
+)
+STORAGE_RECLAIMED_BYTES = Counter(
+    "storage_janitor_reclaimed_bytes_total",
+    "Bytes deleted by the storage janitor, by reason",
+    ["reason"],
+)
+STORAGE_RECLAIMED_FILES = Counter(
+    "storage_janitor_deleted_files_total",
+    "Files deleted by the storage janitor, by reason",
+    ["reason"],
+)
+PDF_PAGES_RASTERIZED = Counter(
+    "pdf_pages_rasterized_total",
+    "PDF pages converted to images, by result (rendered, cached, failed)",
+    ["result"],
+)
+LLM_LIMITER_QUEUE_DEPTH = Gauge(
+    "llm_limiter_queue_depth",
+    "Provider calls waiting for a limiter slot, summed over live workers",
+    ["provider", "model"],
+    multiprocess_mode="livesum",
+)
+LLM_LIMITER_IN_FLIGHT = Gauge(
+    "llm_limiter_in_flight",
+    "Provider calls holding a limiter slot, summed over live workers",
+    ["provider", "model"],
+    multiprocess_mode="livesum",
+)
+LLM_LIMITER_WAIT = Histogram(
+    "llm_limiter_wait_seconds",
+    "Time spent waiting for a limiter slot, by outcome (acquired, timeout)",
+    ["provider", "model", "outcome"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+LLM_LIMITER_REJECTIONS = Counter(
+    "llm_limiter_rejections_total",
+    "Provider calls refused by the limiter, by reason (queue_full, timeout)",
+    ["provider", "model", "reason"],
+)
+POOL_CONNECTIONS = Gauge(
+    "pool_connections",
+    "Connections per pool and state (in_use, idle, max), summed over live workers",
+    ["pool", "state"],
+    multiprocess_mode="livesum",
+)
+
+# Pool gauges are refreshed by each worker as it serves requests, at most this often
+POOL_GAUGE_INTERVAL_SECONDS = 1.0
+_last_pool_refresh = 0.0
+_pool_refresh_lock = threading.Lock()
+
+
+@contextmanager
+def track_llm_call(provider: str, model: str):
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "success"
+    finally:
+        LLM_REQUEST_DURATION.labels(provider, model, outcome).observe(time.perf_counter() - start)
+        LLM_REQUESTS.labels(provider, model, outcome).inc()
+
+
+def record_llm_rejected(provider: str, model: str):
+    LLM_REQUESTS.labels(provider, model, "rejected").inc()
+
+
+def record_llm_tokens(
+    provider: str, model: str, prompt_tokens: int | None, completion_tokens: int | None, cached_tokens: int | None = None
+):
+    if prompt_tokens:
+        LLM_TOKENS.labels(provider, model, "prompt").inc(prompt_tokens)
+        LLM_PROMPT_CACHED_RATIO.labels(provider, model).observe((cached_tokens or 0) / prompt_tokens)
+    if cached_tokens:
+        LLM_TOKENS.labels(provider, model, "cached_prompt").inc(cached_tokens)
+    if completion_tokens:
+        LLM_TOKENS.labels(provider, model, "completion").inc(completion_tokens)
+
+
+@contextmanager
+def track_conversion(file_type: str):
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "success"
+    finally:
+        FILE_CONVERSION_DURATION.labels(file_type, outcome).observe(time.perf_counter() - start)
+
+
+def refresh_pool_gauges(force: bool = False):
+    """Copy this worker's DB and Redis pool usage into the pool_connections gauge."""
+    global _last_pool_refresh
+    now = time.monotonic()
+    if not force and now - _last_pool_refresh < POOL_GAUGE_INTERVAL_SECONDS:
+        return
+    if not _pool_refresh_lock.acquire(blocking=False):
+        return
+    try:
+        _last_pool_refresh = now
+        # Imported here: both modules import this one for their own instrumentation
+        from backend.app.core.database import get_db_pool_stats
+        from backend.app.utils.redis_client import get_redis_pool_stats
+        for name, stats in get_db_pool_stats().items():
+            POOL_CONNECTIONS.labels(f"db_{name}", "in_use").set(stats["in_use"])
+            POOL_CONNECTIONS.labels(f"db_{name}", "idle").set(stats["idle"])
+            POOL_CONNECTIONS.labels(f"db_{name}", "max").set(stats["pool_size"] + stats["max_overflow"])
+        for name, stats in get_redis_pool_stats().items():
+            POOL_CONNECTIONS.labels(f"redis_{name}", "in_use").set(stats["in_use"])
+            POOL_CONNECTIONS.labels(f"redis_{name}", "idle").set(stats["idle"])
+            POOL_CONNECTIONS.labels(f"redis_{name}", "max").set(stats["max_connections"])
+    finally:
+        _pool_refresh_lock.release()
+
+
+class PrometheusMiddleware:
+    """ASGI middleware timing every HTTP request, including streamed response bodies."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Label by route template (e.g. /api/v1/ai/slides/{slide_deck_id}) to keep cardinality bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_DURATION.labels(scope["method"], route, str(status_code)).observe(time.perf_counter() - start)
+            refresh_pool_gauges()
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Exposition-format payload and content type for /metrics."""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    refresh_pool_gauges(force=True)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_worker_exited():
+    """Drop this worker's live gauges from the multiprocess directory on shutdown."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,202 @@
+"""
+On-demand request profiling.
+
+A wall-clock sampler records the stack of every busy thread in the worker while a
+profiled request runs. Unlike cProfile (which only sees the calling thread) it also
+captures the threadpool work behind the async routes, such as PPTXService parsing
+and FileConversionService conversions. Other requests served by the same worker at
+the same time show up in the samples too; the artifact records how many were running.
+"""
+import hmac
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from fastapi.concurrency import run_in_threadpool
+from backend.app.core import tracing
+from backend.app.core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger("profiling")
+
+PROFILE_HEADER = "x-profile"
+PROFILE_ID_HEADER = "x-profile-id"
+PROFILE_SUFFIX = ".prof.txt"
+TOP_FUNCTIONS = 40
+
+# Leaf frames of threads that are parked rather than working
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("selectors.py", "poll"),
+    ("thread.py", "_worker"),
+}
+
+_in_flight = 0  # requests currently inside the middleware in this worker
+
+
+def token_matches(value: str | None) -> bool:
+    if not value or settings.PROFILING_TOKEN is None:
+        return False
+    return hmac.compare_digest(value.encode(), settings.PROFILING_TOKEN.get_secret_value().encode())
+
+
+class StackSampler(threading.Thread):
+    """Samples the stacks of all other threads every `interval` seconds until stopped."""
+
+    def __init__(self, interval: float):
+        super().__init__(name="request-profiler", daemon=True)
+        self.interval = interval
+        self.samples = 0
+        self.stacks: Counter[tuple[str, ...]] = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        own_ident = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                leaf = (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name)
+                if leaf in _IDLE_LEAVES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.stacks[tuple(reversed(stack))] += 1
+
+    def stop(self):
+        self._stopped.set()
+
+
+def _render(sampler: StackSampler, header: dict) -> str:
+    inclusive: Counter[str] = Counter()
+    own: Counter[str] = Counter()
+    for stack, count in sampler.stacks.items():
+        own[stack[-1]] += count
+        for function in set(stack):
+            inclusive[function] += count
+    total = sum(sampler.stacks.values()) or 1
+    lines = [f"# {key}: {value}" for key, value in header.items()]
+    lines.append(f"# interval_ms: {sampler.interval * 1000:g}, ticks: {sampler.samples}, busy thread samples: {total}")
+    for title, counts in (("inclusive", inclusive), ("self", own)):
+        lines += ["", f"## top functions ({title})", "samples      %  function"]
+        lines += [f"{count:7d} {100 * count / total:6.1f}  {function}" for function, count in counts.most_common(TOP_FUNCTIONS)]
+    # Folded stacks, loadable in speedscope or flamegraph.pl
+    lines += ["", "## folded stacks"]
+    lines += [f"{';'.join(stack)} {count}" for stack, count in sampler.stacks.most_common()]
+    return "\n".join(lines) + "\n"
+
+
+def _prune():
+    """Keep only the newest PROFILING_MAX_FILES profiles."""
+    try:
+        profiles = sorted(
+            (entry for entry in os.scandir(settings.PROFILING_DIR) if entry.name.endswith(PROFILE_SUFFIX)),
+            key=lambda entry: entry.stat().st_mtime,
+            reverse=True,
+        )
+        for entry in profiles[settings.PROFILING_MAX_FILES:]:
+            os.remove(entry.path)
+    except FileNotFoundError:
+        pass
+
+
+def _write_profile(profile_id: str, sampler: StackSampler, header: dict):
+    sampler.join()
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    path = os.path.join(settings.PROFILING_DIR, profile_id + PROFILE_SUFFIX)
+    with open(path, "w") as f:
+        f.write(_render(sampler, header))
+    _prune()
+    logger.info(f"Wrote profile {profile_id} ({header['method']} {header['path']}, {sampler.samples} ticks)")
+
+
+def profile_path(profile_id: str) -> str | None:
+    """Path of a stored profile, or None for unknown or malformed ids."""
+    if not profile_id or os.path.basename(profile_id) != profile_id or profile_id.startswith("."):
+        return None
+    path = os.path.join(settings.PROFILING_DIR, profile_id + PROFILE_SUFFIX)
+    return path if os.path.isfile(path) else None
+
+
+def list_profiles() -> list[dict]:
+    try:
+        entries = [entry for entry in os.scandir(settings.PROFILING_DIR) if entry.name.endswith(PROFILE_SUFFIX)]
+    except FileNotFoundError:
+        return []
+    entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    return [
+        {
+            "id": entry.name[:-len(PROFILE_SUFFIX)],
+            "size_bytes": entry.stat().st_size,
+            "created": datetime.fromtimestamp(entry.stat().st_mtime, timezone.utc).isoformat(),
+        }
+        for entry in entries
+    ]
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling requests that carry X-Profile: <PROFILING_TOKEN>, plus a
+    PROFILING_SAMPLE_RATE fraction of all requests. Only installed when PROFILING_ENABLED.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _in_flight
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        requested = token_matches(dict(scope["headers"]).get(PROFILE_HEADER.encode(), b"").decode("latin-1"))
+        if not requested and random.random() >= settings.PROFILING_SAMPLE_RATE:
+            _in_flight += 1
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                _in_flight -= 1
+            return
+
+        profile_id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{tracing.get_request_id() or os.urandom(8).hex()}"
+        status_code = 500
+        concurrent = _in_flight
+
+        async def send_with_profile_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (PROFILE_ID_HEADER.encode(), profile_id.encode())]}
+            await send(message)
+
+        sampler = StackSampler(settings.PROFILING_INTERVAL_MS / 1000)
+        start = time.perf_counter()
+        _in_flight += 1
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            sampler.stop()
+            _in_flight -= 1
+            header = {
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status_code,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+                "trigger": "header" if requested else "sampled",
+                "other_requests_at_start": concurrent,
+            }
+            try:
+                await run_in_threadpool(_write_profile, profile_id, sampler, header)
+            except OSError as e:
+                logger.error(f"Failed to write profile {profile_id}: {str(e)}")
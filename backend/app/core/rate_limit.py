@@ -0,0 +1,134 @@
+import logging
+import math
+import uuid
+from fastapi import Depends, HTTPException, status
+from backend.app.api.auth import get_current_user
+from backend.app.core.config import get_settings
+from backend.app.models.user import User
+from backend.app.utils.redis_client import get_redis_client
+
+settings = get_settings()
+logger = logging.getLogger("rate_limit")
+
+# Token bucket refill plus concurrent-request lease in one atomic call.
+# KEYS[1]: bucket hash, KEYS[2]: sorted set of in-flight request leases
+# ARGV: capacity, refill tokens/sec, max concurrent, lease ms, lease id, cost
+# Returns {1, 0} when admitted, otherwise {0, retry_after_ms}.
+ADMIT_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local max_concurrent = tonumber(ARGV[3])
+local lease_ms = tonumber(ARGV[4])
+local cost = tonumber(ARGV[6])
+
+if max_concurrent > 0 then
+    redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+    if redis.call('ZCARD', KEYS[2]) >= max_concurrent then
+        return {0, 1000}
+    end
+end
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate / 1000)
+if tokens < cost then
+    return {0, math.ceil((cost - tokens) * 1000 / rate)}
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens - cost), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity * 1000 / rate) + 1000)
+
+if max_concurrent > 0 then
+    redis.call('ZADD', KEYS[2], now + lease_ms, ARGV[5])
+    redis.call('PEXPIRE', KEYS[2], lease_ms)
+end
+return {1, 0}
+"""
+
+_admit_script = None
+
+
+def _get_admit_script():
+    global _admit_script
+    if _admit_script is None:
+        _admit_script = get_redis_client().register_script(ADMIT_SCRIPT)
+    return _admit_script
+
+
+# Per route-group policies: sustained rate, burst size and concurrent requests per user
+POLICIES = {
+    "ai": {
+        "per_minute": settings.RATE_LIMIT_AI_REQUESTS_PER_MINUTE,
+        "burst": settings.RATE_LIMIT_AI_BURST,
+        "max_concurrent": settings.RATE_LIMIT_AI_MAX_CONCURRENT,
+    },
+    "upload": {
+        "per_minute": settings.RATE_LIMIT_UPLOAD_REQUESTS_PER_MINUTE,
+        "burst": settings.RATE_LIMIT_UPLOAD_BURST,
+        "max_concurrent": settings.RATE_LIMIT_UPLOAD_MAX_CONCURRENT,
+    },
+}
+
+
+def admit(scope: str, user_id: int, cost: int = 1) -> str | None:
+    """
+    Admit one request for `user_id` in `scope`, costing a single Redis round trip.
+    Returns a lease id to pass to `release`, or None when no lease was taken.
+    Raises HTTP 429 with Retry-After when the user is over their rate or concurrency limit.
+    Fails open if Redis is unavailable.
+    """
+    if not settings.RATE_LIMIT_ENABLED:
+        return None
+    policy = POLICIES[scope]
+    lease_id = uuid.uuid4().hex
+    # Let a single oversized request (e.g. a large batch) through once the bucket is full
+    cost = min(cost, policy["burst"])
+    try:
+        allowed, retry_after_ms = _get_admit_script()(
+            keys=[f"rate_limit:{scope}:{user_id}:bucket", f"rate_limit:{scope}:{user_id}:active"],
+            args=[
+                policy["burst"],
+                policy["per_minute"] / 60,
+                policy["max_concurrent"],
+                settings.RATE_LIMIT_LEASE_SECONDS * 1000,
+                lease_id,
+                cost,
+            ],
+            client=get_redis_client(),
+        )
+    except Exception as e:
+        logger.warning(f"Rate limiter unavailable, admitting request: {e}")
+        return None
+    if not int(allowed):
+        retry_after = max(1, math.ceil(int(retry_after_ms) / 1000))
+        logger.warning(f"Rate limit exceeded for user {user_id} on {scope}, retry after {retry_after}s")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, please slow down.",
+            headers={"Retry-After": str(retry_after)},
+        )
+    return lease_id if policy["max_concurrent"] > 0 else None
+
+
+def release(scope: str, user_id: int, lease_id: str | None):
+    """Free the concurrent-request slot taken by `admit`; runs after the response is sent."""
+    if not lease_id:
+        return
+    try:
+        get_redis_client().zrem(f"rate_limit:{scope}:{user_id}:active", lease_id)
+    except Exception as e:
+        # The lease expires on its own after RATE_LIMIT_LEASE_SECONDS
+        logger.warning(f"Failed to release rate limit lease for user {user_id}: {e}")
+
+
+def rate_limited(scope: str):
+    """Route dependency enforcing the per-user policy for `scope` ("ai" or "upload")."""
+    def dependency(current_user: User = Depends(get_current_user)):
+        lease_id = admit(scope, current_user.id)
+        try:
+            yield
+        finally:
+            release(scope, current_user.id, lease_id)
+    return dependency
@@ -0,0 +1,137 @@
+import logging
+import re
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from backend.app.core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger("request")
+
+# Per-request state. The spans list is shared by reference, so spans recorded in
+# threadpool workers (which run in a copy of the request context) land in it too.
+request_id_var: ContextVar[str | None] = ContextVar("request_id", default=None)
+_spans_var: ContextVar[list | None] = ContextVar("spans", default=None)
+
+REQUEST_ID_HEADER = "x-request-id"
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+_tracer = None  # OpenTelemetry tracer, when enabled and installed
+
+
+def init_tracing():
+    """Set up OpenTelemetry export to an OTLP collector if OTEL_ENABLED; a no-op otherwise."""
+    global _tracer
+    if not settings.OTEL_ENABLED or _tracer is not None:
+        return
+    try:
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError:
+        logger.warning("OTEL_ENABLED is set but opentelemetry-sdk / opentelemetry-exporter-otlp are not installed")
+        return
+    provider = TracerProvider(resource=Resource.create({"service.name": settings.OTEL_SERVICE_NAME}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=settings.OTEL_EXPORTER_OTLP_ENDPOINT)))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer("ai_tutor")
+    logger.info(f"Exporting traces to {settings.OTEL_EXPORTER_OTLP_ENDPOINT}")
+
+
+@contextmanager
+def span(name: str):
+    """
+    Time one phase of the current request. Durations show up in the Server-Timing
+    header and in every later log line of the request; also exported to OpenTelemetry when enabled.
+    """
+    start = time.perf_counter()
+    try:
+        if _tracer is not None:
+            with _tracer.start_as_current_span(name):
+                yield
+        else:
+            yield
+    finally:
+        spans = _spans_var.get()
+        if spans is not None:
+            spans.append((name, (time.perf_counter() - start) * 1000))
+
+
+def get_request_id() -> str | None:
+    return request_id_var.get()
+
+
+def get_trace_id() -> str | None:
+    if _tracer is None:
+        return None
+    from opentelemetry import trace
+    context = trace.get_current_span().get_span_context()
+    return format(context.trace_id, "032x") if context.is_valid else None
+
+
+def get_timings() -> dict[str, float] | None:
+    """Milliseconds per phase so far in the current request; repeated phases are summed."""
+    spans = _spans_var.get()
+    if not spans:
+        return None
+    timings: dict[str, float] = {}
+    for name, duration in list(spans):
+        timings[name] = round(timings.get(name, 0.0) + duration, 2)
+    return timings
+
+
+def _server_timing(timings: dict[str, float], total_ms: float) -> str:
+    entries = [f"{name};dur={duration}" for name, duration in timings.items()]
+    entries.append(f"total;dur={total_ms:.2f}")
+    return ", ".join(entries)
+
+
+def _root_span(name: str):
+    return _tracer.start_as_current_span(name) if _tracer is not None else nullcontext()
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware giving each HTTP request an id (X-Request-ID, taken from the client
+    when valid) and returning its phase timings in a Server-Timing header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        incoming = dict(scope["headers"]).get(REQUEST_ID_HEADER.encode(), b"").decode("latin-1")
+        request_id = incoming if _VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex
+        request_id_token = request_id_var.set(request_id)
+        spans_token = _spans_var.set([])
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # Phases still running (e.g. a streamed body) are not in the header, only in the log line
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", _server_timing(get_timings() or {}, (time.perf_counter() - start) * 1000).encode()))
+                headers.append((REQUEST_ID_HEADER.encode(), request_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            with _root_span(f"{scope['method']} {scope['path']}"):
+                try:
+                    await self.app(scope, receive, send_with_timing)
+                finally:
+                    # One summary line per request, carrying the id and all phase timings
+                    total_ms = (time.perf_counter() - start) * 1000
+                    logger.info(f"{scope['method']} {scope['path']} {status_code} {total_ms:.1f}ms")
+        finally:
+            _spans_var.reset(spans_token)
+            request_id_var.reset(request_id_token)
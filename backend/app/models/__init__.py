@@ -3,4 +3,7 @@ from sqlalchemy.orm import declarative_base
 Base = declarative_base()
 
 from .user import User
-from .file import File 
\ No newline at end of file
+from .file import File
+from .answer import Answer
+from .slide import Slide
+from .deck_summary import DeckSummary
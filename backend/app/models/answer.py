@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, UniqueConstraint, func
+from backend.app.models import Base
+
+class Answer(Base):
+    """Durable copy of generated answers, read through when Redis misses."""
+    __tablename__ = "answers"
+    __table_args__ = (
+        UniqueConstraint("question_hash", "deck_hash", "model", "prompt_version", name="uq_answers_lookup"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    question_hash = Column(String(64), nullable=False)  # SHA-256 of the normalized question
+    deck_hash = Column(String(64), nullable=False)  # deck content hash, "none" without a deck
+    model = Column(String, nullable=False)
+    prompt_version = Column(String, nullable=False)
+    question = Column(Text, nullable=False)
+    answer = Column(Text, nullable=False)
+    hit_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_hit_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, UniqueConstraint, func
+from backend.app.models import Base
+
+class DeckSummary(Base):
+    """Summary of one slide or one section of a deck, shared by every deck with the same content."""
+    __tablename__ = "deck_summaries"
+    __table_args__ = (
+        UniqueConstraint("deck_hash", "prompt_version", "level", "first_slide", name="uq_deck_summaries_lookup"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    deck_hash = Column(String(64), nullable=False)  # deck content hash, as in the answer cache keys
+    prompt_version = Column(String, nullable=False)
+    level = Column(String, nullable=False)  # "slide" or "section"
+    first_slide = Column(Integer, nullable=False)
+    last_slide = Column(Integer, nullable=False)
+    summary = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,18 +1,27 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import BigInteger, Column, Integer, String, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from backend.app.models import Base
 
 class File(Base):
     __tablename__ = 'files'
+    __table_args__ = (
+        # Keyset pagination of a user's files, newest first; the listed columns are
+        # included so the listing is answered from the index alone
+        Index(
+            'ix_files_user_upload_time_id', 'user_id', 'upload_time', 'id',
+            postgresql_include=['filename', 'content_type', 'path', 'converted_pptx_path', 'conversion_status'],
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, nullable=False)
     content_type = Column(String, nullable=False)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
-    upload_time = Column(DateTime, default=datetime.utcnow)
+    upload_time = Column(DateTime, default=datetime.utcnow, nullable=False)
     path = Column(String, nullable=False)
     converted_pptx_path = Column(String, nullable=True)
     conversion_status = Column(String, default="pending")
+    size_bytes = Column(BigInteger, nullable=True)  # stored upload size; counts towards the user's quota
 
     user = relationship('User', back_populates='files') 
\ No newline at end of file
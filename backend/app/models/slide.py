@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Computed, Index, UniqueConstraint
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from backend.app.models import Base
+
+class Slide(Base):
+    """Text and image of one slide, extracted once after a deck is converted."""
+    __tablename__ = "slides"
+    __table_args__ = (
+        UniqueConstraint("file_id", "slide_number", name="uq_slides_file_slide"),
+        Index("ix_slides_search_vector", "search_vector", postgresql_using="gin"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    file_id = Column(Integer, ForeignKey("files.id", ondelete="CASCADE"), nullable=False)
+    slide_number = Column(Integer, nullable=False)
+    content = Column(Text, nullable=False, default="")
+    image_path = Column(String, nullable=True)
+    search_vector = Column(TSVECTOR, Computed("to_tsvector('english', content)", persisted=True))
@@ -1,11 +1,168 @@
-from backend.app.utils.redis_client import get_redis_client
+import hashlib
+import threading
+import zlib
+from typing import NamedTuple
+from backend.app.core.config import get_settings
+from backend.app.core.metrics import AI_CACHE_LOOKUPS
+from backend.app.utils.redis_client import get_redis_client, get_redis_binary_client
+from backend.app.utils.local_cache import LocalTTLCache
+from backend.app.utils import cache_invalidation
+from backend.app.utils.question_text import normalize_question
+
+settings = get_settings()
 
 CACHE_EXPIRE_SECONDS = 3600  # 1 hour
+CACHE_KEY_PREFIX = "ai_answer:v2"
+INVALIDATION_NAMESPACE = "ai_answer"
+
+# Values are stored with a one-byte format marker; short answers are not worth compressing
+RAW_MARKER = b"r"
+ZLIB_MARKER = b"z"
+COMPRESS_MIN_BYTES = 256
+
+# Per-worker tier in front of Redis; entries never outlive the Redis key they came from
+local_cache = LocalTTLCache(
+    max_entries=settings.LOCAL_CACHE_MAX_ENTRIES,
+    max_bytes=settings.LOCAL_CACHE_MAX_BYTES,
+    default_ttl=settings.LOCAL_CACHE_TTL_SECONDS,
+)
+
+_stats_lock = threading.Lock()
+_stats = {"local_hits": 0, "redis_hits": 0, "misses": 0, "writes": 0, "bytes_raw": 0, "bytes_stored": 0}
+
+def question_hash(question: str) -> str:
+    return hashlib.sha256(normalize_question(question).encode("utf-8")).hexdigest()
+
+def make_cache_key(question: str, scope: str, deck_version: str | None, prompt_version: str, model: str) -> str:
+    """
+    Build a fixed-size cache key.
+    scope: who may share the answer, e.g. "global" or "user:3:deck:12"
+    deck_version: content hash of the slide deck the answer was grounded on (None without a deck)
+    prompt_version: version of the prompt template, bump it when the template changes
+    model: "provider:model" the answer was requested from
+    """
+    return f"{CACHE_KEY_PREFIX}:{scope}:{deck_version or 'none'}:{prompt_version}:{model}:{question_hash(question)}"
+
+class AnswerKey(NamedTuple):
+    """Everything that identifies a cached answer; see make_cache_key for the fields."""
+    question: str
+    scope: str
+    deck_version: str | None
+    prompt_version: str
+    model: str
+
+    @property
+    def redis_key(self) -> str:
+        return make_cache_key(self.question, self.scope, self.deck_version, self.prompt_version, self.model)
+
+def cache_namespace(cache_key: str) -> str:
+    """The key without its question hash: answers in one namespace share scope, deck, prompt and model."""
+    return cache_key.rsplit(":", 1)[0]
+
+def _encode(answer: str) -> bytes:
+    raw = answer.encode("utf-8")
+    if len(raw) < COMPRESS_MIN_BYTES:
+        return RAW_MARKER + raw
+    return ZLIB_MARKER + zlib.compress(raw, 6)
+
+def _decode(value: bytes) -> str:
+    marker, payload = value[:1], value[1:]
+    if marker == ZLIB_MARKER:
+        payload = zlib.decompress(payload)
+    return payload.decode("utf-8")
+
+def _on_invalidate(key: str | None):
+    if key is None:
+        local_cache.clear()
+    else:
+        local_cache.delete(key)
+
+def subscribe_invalidations():
+    """Called from the app lifespan, before cache_invalidation.start()."""
+    cache_invalidation.subscribe(INVALIDATION_NAMESPACE, _on_invalidate)
+
+# Lookup counters exported to Prometheus
+_LOOKUP_RESULTS = {"local_hits": "local_hit", "redis_hits": "redis_hit", "misses": "miss"}
+
+def _record(**counts):
+    with _stats_lock:
+        for name, value in counts.items():
+            _stats[name] += value
+    for name, value in counts.items():
+        if name in _LOOKUP_RESULTS and value:
+            AI_CACHE_LOOKUPS.labels(_LOOKUP_RESULTS[name]).inc(value)
+
+def _fetch_from_redis(keys: list[str]) -> list[str | None]:
+    """GET + PTTL for every key in one pipelined round trip; hits are copied into the local tier."""
+    pipe = get_redis_binary_client().pipeline(transaction=False)
+    for key in keys:
+        pipe.get(key)
+        pipe.pttl(key)
+    results = pipe.execute()
+    values = []
+    for i, key in enumerate(keys):
+        value, pttl = results[2 * i], results[2 * i + 1]
+        if value is not None:
+            value = _decode(value)
+            # pttl is -1 for keys without expiry
+            local_cache.set(key, value, ttl=pttl / 1000 if pttl > 0 else None)
+        values.append(value)
+    return values
+
+def get_cached_answer(cache_key: str) -> str | None:
+    value = local_cache.get(cache_key)
+    if value is not None:
+        _record(local_hits=1)
+        return value
+    value = _fetch_from_redis([cache_key])[0]
+    if value is not None:
+        _record(redis_hits=1)
+    else:
+        _record(misses=1)
+    return value
 
-redis_client = get_redis_client()
+def get_cached_answers(cache_keys: list[str]) -> list[str | None]:
+    """Look up several answers; local misses are fetched from Redis in a single round trip."""
+    if not cache_keys:
+        return []
+    values = [local_cache.get(key) for key in cache_keys]
+    missing = [i for i, value in enumerate(values) if value is None]
+    if missing:
+        for i, value in zip(missing, _fetch_from_redis([cache_keys[i] for i in missing])):
+            values[i] = value
+    redis_hits = sum(1 for i in missing if values[i] is not None)
+    _record(
+        local_hits=len(cache_keys) - len(missing),
+        redis_hits=redis_hits,
+        misses=len(missing) - redis_hits,
+    )
+    return values
 
-def get_cached_answer(question: str) -> str | None:
-    return redis_client.get(f"ai_answer:{question}")
+def set_cached_answer(cache_key: str, answer: str):
+    encoded = _encode(answer)
+    pipe = get_redis_binary_client().pipeline(transaction=False)
+    pipe.set(cache_key, encoded, ex=CACHE_EXPIRE_SECONDS)
+    cache_invalidation.publish_invalidation(INVALIDATION_NAMESPACE, cache_key, pipeline=pipe)
+    pipe.execute()
+    local_cache.set(cache_key, answer, ttl=CACHE_EXPIRE_SECONDS)
+    _record(writes=1, bytes_raw=len(answer.encode("utf-8")), bytes_stored=len(encoded))
 
-def set_cached_answer(question: str, answer: str):
-    redis_client.set(f"ai_answer:{question}", answer, ex=CACHE_EXPIRE_SECONDS) 
\ No newline at end of file
+def get_cache_stats() -> dict:
+    """Hit/miss counts and rates per tier plus memory figures, as seen by this worker."""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["local_hits"] + stats["redis_hits"] + stats["misses"]
+    stats["lookups"] = lookups
+    stats["hit_rate"] = round((stats["local_hits"] + stats["redis_hits"]) / lookups, 4) if lookups else 0.0
+    stats["local_hit_rate"] = round(stats["local_hits"] / lookups, 4) if lookups else 0.0
+    stats["redis_hit_rate"] = round(stats["redis_hits"] / lookups, 4) if lookups else 0.0
+    stats["compression_ratio"] = round(stats["bytes_stored"] / stats["bytes_raw"], 4) if stats["bytes_raw"] else None
+    stats["local_tier"] = local_cache.stats()
+    try:
+        memory = get_redis_client().info("memory")
+        stats["redis_used_memory_bytes"] = memory.get("used_memory")
+        stats["redis_maxmemory_bytes"] = memory.get("maxmemory")
+    except Exception:
+        stats["redis_used_memory_bytes"] = None
+        stats["redis_maxmemory_bytes"] = None
+    return stats
@@ -0,0 +1,130 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, tuple_, update, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.app.core.config import get_settings
+from backend.app.core.database import SessionLocal
+from backend.app.core.metrics import ANSWER_STORE_WRITES_DROPPED
+from backend.app.models import Answer
+from backend.app.services.ai_cache import AnswerKey, get_cached_answer, set_cached_answer, question_hash
+
+settings = get_settings()
+logger = logging.getLogger("answer_store")
+
+# Durable writes and hit bookkeeping run on one background thread, off the response path.
+# At most ANSWER_STORE_QUEUE_MAX_SIZE wait for it; beyond that they are dropped (and
+# counted) so a slow database cannot make the queue grow without bound. Redis already
+# holds the answer, so a dropped write only loses durability.
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="answer-store")
+_queue_slots = threading.BoundedSemaphore(settings.ANSWER_STORE_QUEUE_MAX_SIZE)
+
+
+def _submit(kind: str, fn, *args):
+    if not _queue_slots.acquire(blocking=False):
+        ANSWER_STORE_WRITES_DROPPED.labels(kind).inc()
+        return
+    _writer.submit(fn, *args).add_done_callback(lambda _: _queue_slots.release())
+
+
+def _row_key(key: AnswerKey) -> tuple[str, str, str, str]:
+    return (question_hash(key.question), key.deck_version or "none", key.model, key.prompt_version)
+
+
+async def get_answer(db: AsyncSession, key: AnswerKey) -> str | None:
+    """Redis (and the in-process tier) first, then the durable store."""
+    answer = await run_in_threadpool(get_cached_answer, key.redis_key)
+    if answer is not None:
+        return answer
+    return (await get_stored_answers(db, [key]))[0]
+
+
+async def get_stored_answers(db: AsyncSession, keys: list[AnswerKey]) -> list[str | None]:
+    """
+    Read-through for Redis misses: a single indexed query for all keys.
+    Rows found are promoted back into Redis and their hit counters bumped in the background.
+    """
+    if not keys or not settings.ANSWER_STORE_ENABLED:
+        return [None] * len(keys)
+    positions: dict[tuple, list[int]] = {}
+    for i, key in enumerate(keys):
+        positions.setdefault(_row_key(key), []).append(i)
+    try:
+        result = await db.execute(
+            select(
+                Answer.id, Answer.question_hash, Answer.deck_hash, Answer.model, Answer.prompt_version, Answer.answer
+            ).where(
+                tuple_(Answer.question_hash, Answer.deck_hash, Answer.model, Answer.prompt_version).in_(list(positions))
+            )
+        )
+        rows = result.all()
+    except Exception as e:
+        logger.warning(f"Answer store lookup failed: {e}")
+        return [None] * len(keys)
+
+    results: list[str | None] = [None] * len(keys)
+    hit_ids = []
+    promoted = []
+    for row in rows:
+        indexes = positions.get((row.question_hash, row.deck_hash, row.model, row.prompt_version), [])
+        for i in indexes:
+            results[i] = row.answer
+        if indexes:
+            hit_ids.append(row.id)
+            promoted.append((keys[indexes[0]].redis_key, row.answer))
+    if hit_ids:
+        logger.info(f"Answer store hits: {len(hit_ids)}, promoting to Redis")
+        _submit("hits", _record_hits, hit_ids, promoted)
+    return results
+
+
+def store_answer(key: AnswerKey, answer: str):
+    """Cache the answer in Redis now and persist it to Postgres in the background."""
+    set_cached_answer(key.redis_key, answer)
+    if settings.ANSWER_STORE_ENABLED:
+        _submit("persist", _persist, key, answer)
+
+
+def _persist(key: AnswerKey, answer: str):
+    q_hash, deck_hash, model, prompt_version = _row_key(key)
+    statement = insert(Answer).values(
+        question_hash=q_hash,
+        deck_hash=deck_hash,
+        model=model,
+        prompt_version=prompt_version,
+        question=key.question,
+        answer=answer,
+        hit_count=0,
+    ).on_conflict_do_update(
+        constraint="uq_answers_lookup",
+        set_={"answer": answer, "question": key.question},
+    )
+    db = SessionLocal()
+    try:
+        db.execute(statement)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Failed to persist answer: {e}")
+    finally:
+        db.close()
+
+
+def _record_hits(answer_ids: list[int], promoted: list[tuple[str, str]]):
+    for cache_key, answer in promoted:
+        set_cached_answer(cache_key, answer)
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(Answer)
+            .where(Answer.id.in_(answer_ids))
+            .values(hit_count=Answer.hit_count + 1, last_hit_at=func.now())
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Failed to record answer store hits: {e}")
+    finally:
+        db.close()
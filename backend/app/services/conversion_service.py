@@ -1,15 +1,23 @@
 import os
-from pptx import Presentation
-from pptx.util import Inches, Pt
+import tempfile
 from pathlib import Path
-import pdfplumber
-from docx import Document
-from PIL import Image
-from backend.app.utils.file_utils import generate_unique_filename
+from backend.app.core.config import get_settings
+from backend.app.services import pdf_raster
+from backend.app.services.storage import get_storage, make_key
+from backend.app.core.metrics import track_conversion
+
+settings = get_settings()
+
+IMAGE_EXTS = ['.jpg', '.jpeg', '.png', '.gif', '.bmp']
+
+# The document libraries are imported inside each converter, so workers that never
+# convert a file (or a given format) do not pay their import time and memory
 
 class FileConversionService:
     @staticmethod
     def txt_to_pptx(txt_path: str, pptx_path: str):
+        from pptx import Presentation
+        from pptx.util import Inches, Pt
         prs = Presentation()
         slide_width = prs.slide_width
         slide_height = prs.slide_height
@@ -34,28 +42,49 @@ class FileConversionService:
 
     @staticmethod
     def pdf_to_pptx(pdf_path: str, pptx_path: str):
+        import pdfplumber
+        from pptx import Presentation
+        from pptx.util import Inches, Pt
         prs = Presentation()
         slide_width = prs.slide_width
         slide_height = prs.slide_height
         with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
+            texts = [page.extract_text() or '' for page in pdf.pages]
+        with tempfile.TemporaryDirectory() as work_dir:
+            # Page renders keep diagrams and equations, and give the slide an image for multimodal explanations
+            images = pdf_raster.rasterize(pdf_path, len(texts), work_dir) if settings.PDF_RASTERIZE else [None] * len(texts)
+            for text, image_path in zip(texts, images):
                 slide = prs.slides.add_slide(prs.slide_layouts[6])  # blank
-                text = page.extract_text() or ''
                 left = Inches(0.5)
                 top = Inches(0.5)
                 width = slide_width - Inches(1)
                 height = slide_height - Inches(1)
+                font_size = Pt(20)
+                if image_path is not None:
+                    # Page image on the left, its text in a narrower column on the right
+                    from PIL import Image
+                    with Image.open(image_path) as img:
+                        width_px, height_px = img.size
+                    image_width = int(width * 0.6)
+                    scale = min(image_width / width_px, height / height_px)
+                    slide.shapes.add_picture(image_path, left, top, width=int(width_px * scale), height=int(height_px * scale))
+                    left = left + image_width + Inches(0.2)
+                    width = width - image_width - Inches(0.2)
+                    font_size = Pt(10)
                 textbox = slide.shapes.add_textbox(left, top, width, height)
                 tf = textbox.text_frame
                 tf.word_wrap = True
                 p = tf.add_paragraph()
                 p.text = text
-                p.font.size = Pt(20)
-        prs.save(pptx_path)
+                p.font.size = font_size
+            prs.save(pptx_path)
         return pptx_path
 
     @staticmethod
     def docx_to_pptx(docx_path: str, pptx_path: str):
+        from docx import Document
+        from pptx import Presentation
+        from pptx.util import Inches, Pt
         prs = Presentation()
         slide_width = prs.slide_width
         slide_height = prs.slide_height
@@ -95,6 +124,9 @@ class FileConversionService:
 
     @staticmethod
     def images_to_pptx(image_paths: list, pptx_path: str):
+        from PIL import Image
+        from pptx import Presentation
+        from pptx.util import Inches, Pt
         prs = Presentation()
         blank_slide_layout = prs.slide_layouts[6]  # blank
         for img_path in image_paths:
@@ -135,23 +167,31 @@ class FileConversionService:
         return pptx_path
 
     @staticmethod
-    def convert_to_pptx(src_path: str, ext: str, dest_dir: str, batch_image_paths: list = None) -> str:
-        # Generate PPTX filename based on original filename
-        original_name = Path(src_path).stem
-        pptx_name = generate_unique_filename(f"{original_name}.pptx")
-        pptx_path = os.path.join(dest_dir, pptx_name)
-        
-        if ext.lower() == '.txt':
-            return FileConversionService.txt_to_pptx(src_path, pptx_path)
-        elif ext.lower() == '.pdf':
-            return FileConversionService.pdf_to_pptx(src_path, pptx_path)
-        elif ext.lower() in ['.doc', '.docx']:
-            return FileConversionService.docx_to_pptx(src_path, pptx_path)
-        elif ext.lower() in ['.jpg', '.jpeg', '.png', '.gif', '.bmp']:
-            # If batch, convert all images to one PPTX
-            if batch_image_paths:
-                return FileConversionService.images_to_pptx(batch_image_paths, pptx_path)
-            else:
-                return FileConversionService.images_to_pptx([src_path], pptx_path)
+    def convert_to_pptx(src_key: str, ext: str, batch_image_keys: list = None) -> str:
+        """
+        Convert a stored file (or a batch of stored images) to PPTX.
+        Returns the storage key of the new deck.
+        """
+        ext = ext.lower()
+        if ext == '.txt':
+            convert = FileConversionService.txt_to_pptx
+        elif ext == '.pdf':
+            convert = FileConversionService.pdf_to_pptx
+        elif ext in ['.doc', '.docx']:
+            convert = FileConversionService.docx_to_pptx
+        elif ext in IMAGE_EXTS:
+            convert = FileConversionService.images_to_pptx
         else:
-            raise ValueError(f'Unsupported file type for conversion: {ext}') 
\ No newline at end of file
+            raise ValueError(f'Unsupported file type for conversion: {ext}')
+
+        storage = get_storage()
+        # Name the deck after the source file; an image batch becomes one "images" deck
+        pptx_key = make_key("images.pptx" if batch_image_keys else f"{Path(src_key).stem}.pptx")
+        # Conversion time is exported per file type ("image" for any image batch)
+        with track_conversion('image' if ext in IMAGE_EXTS else ext.lstrip('.')):
+            with storage.new_file(pptx_key) as pptx_path:
+                if ext in IMAGE_EXTS:
+                    convert([storage.local_path(key) for key in batch_image_keys or [src_key]], pptx_path)
+                else:
+                    convert(storage.local_path(src_key), pptx_path)
+        return pptx_key
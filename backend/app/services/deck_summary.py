@@ -0,0 +1,304 @@
+"""
+Hierarchical deck summaries.
+
+Large decks are summarized once, in the background: every slide, then every
+DECK_SUMMARY_SECTION_SLIDES slides from their slide summaries. Summaries are stored
+by deck content hash, so re-uploads of the same deck reuse them. /ask then sends the
+section summaries (the same for every question, so they stay in the cacheable prompt
+prefix) followed by the few slides most relevant to the question in full, instead of
+the text of every slide.
+
+Decks to summarize are kept in a Redis set until done. One worker at a time (Redis
+lock) works through it at DECK_SUMMARY_CALLS_PER_MINUTE; each summary is committed as
+soon as it is made, so a deck interrupted by a restart resumes where it stopped. A deck
+whose summarization fails is retried with exponential backoff, at most
+DECK_SUMMARY_MAX_ATTEMPTS times.
+"""
+import logging
+import threading
+import time
+from sqlalchemy import Text, cast, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.app.core.config import get_settings
+from backend.app.core.database import SessionLocal
+from backend.app.models import DeckSummary, File as FileModel, Slide
+from backend.app.services.llm_service import LLMService
+from backend.app.services.pptx_service import PPTXService
+from backend.app.services.slide_index import SEARCH_CONFIG, deck_slides
+from backend.app.services.storage import get_storage
+from backend.app.utils.cache_invalidation import WORKER_ID
+from backend.app.utils.redis_client import get_redis_client
+
+settings = get_settings()
+logger = logging.getLogger("deck_summary")
+
+# Bump when the summary prompts change so existing summaries are rebuilt
+SUMMARY_PROMPT_VERSION = "1"
+
+PENDING_KEY = "deck_summary:pending"
+RETRY_KEY = "deck_summary:retry"  # sorted set of failed decks by the time of their next attempt
+ATTEMPTS_KEY = "deck_summary:attempts"  # failed attempts by deck, until it succeeds
+LOCK_KEY = "deck_summary:lock"
+LOCK_TTL_SECONDS = 120  # renewed after every provider call
+
+# Extend or release the lock only while this worker still holds it
+RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+SLIDE_PROMPT = """Summarize this lecture slide in one or two sentences for a tutor who will answer questions about the deck.
+Keep key terms, definitions, formulas and numbers.
+
+Slide {slide_number}:
+{content}"""
+
+SECTION_PROMPT = """Summarize slides {first}-{last} of a lecture deck in three to five sentences, from the slide summaries below.
+Name the topics covered and which slides cover them.
+
+{summaries}"""
+
+_stop = threading.Event()
+_thread: threading.Thread | None = None
+_renew_script = None
+_release_script = None
+
+
+def _sections(slide_numbers: list[int]) -> list[list[int]]:
+    size = settings.DECK_SUMMARY_SECTION_SLIDES
+    return [slide_numbers[i:i + size] for i in range(0, len(slide_numbers), size)]
+
+
+def enqueue(file_ids: list[int]):
+    """Queue decks for summarization; decks below DECK_SUMMARY_MIN_DECK_CHARS are skipped when processed."""
+    if not settings.DECK_SUMMARY_ENABLED or not file_ids:
+        return
+    try:
+        get_redis_client().sadd(PENDING_KEY, *file_ids)
+    except Exception as e:
+        logger.warning(f"Failed to queue decks {file_ids} for summarization: {e}")
+
+
+# Read side, used by /ask
+
+async def get_deck_overview(db: AsyncSession, deck: FileModel, deck_hash: str) -> str | None:
+    """
+    The section summaries of a large deck, or None when the deck is small enough to
+    send in full or its summaries are not complete yet (it is then queued).
+    """
+    if not settings.DECK_SUMMARY_ENABLED:
+        return None
+    slide_count, deck_chars = (await db.execute(
+        select(func.count(Slide.id), func.coalesce(func.sum(func.length(Slide.content)), 0)).where(deck_slides(deck))
+    )).one()
+    if deck_chars < settings.DECK_SUMMARY_MIN_DECK_CHARS:
+        return None
+    sections = (await db.execute(
+        select(DeckSummary.first_slide, DeckSummary.last_slide, DeckSummary.summary)
+        .where(
+            DeckSummary.deck_hash == deck_hash,
+            DeckSummary.prompt_version == SUMMARY_PROMPT_VERSION,
+            DeckSummary.level == "section",
+        )
+        .order_by(DeckSummary.first_slide)
+    )).all()
+    if len(sections) < -(-slide_count // settings.DECK_SUMMARY_SECTION_SLIDES):
+        enqueue([deck.id])
+        return None
+    lines = [f"Deck Overview ({slide_count} slides):", ""]
+    lines += [f"Slides {first}-{last}: {summary}" for first, last, summary in sections]
+    return "\n".join(lines)
+
+
+async def find_relevant_slides(db: AsyncSession, deck: FileModel, question: str) -> list[Slide]:
+    """The DECK_CONTEXT_SLIDES slides sharing the most terms with the question, in deck order."""
+    # Any question term may match, unlike plainto_tsquery which requires all of them
+    ts_query = func.to_tsquery(
+        SEARCH_CONFIG, func.replace(cast(func.plainto_tsquery(SEARCH_CONFIG, question), Text), "&", "|")
+    )
+    rank = func.ts_rank(Slide.search_vector, ts_query)
+    result = await db.execute(
+        select(Slide)
+        .where(deck_slides(deck), Slide.search_vector.op("@@")(ts_query))
+        .order_by(rank.desc(), Slide.slide_number)
+        .limit(settings.DECK_CONTEXT_SLIDES)
+    )
+    return sorted(result.scalars().all(), key=lambda slide: slide.slide_number)
+
+
+def format_relevant_slides(slides: list[Slide]) -> str:
+    if not slides:
+        return ""
+    return PPTXService.format_slides_for_prompt(
+        [{"slide_number": slide.slide_number, "content": slide.content} for slide in slides]
+    ).replace("Slide Deck Content:", "Most Relevant Slides (full text):", 1)
+
+
+# Build side, run by the background thread
+
+class _Stopped(Exception):
+    pass
+
+
+class _LockLost(Exception):
+    pass
+
+
+def _renew_lock():
+    global _renew_script
+    if _renew_script is None:
+        _renew_script = get_redis_client().register_script(RENEW_SCRIPT)
+    if not _renew_script(keys=[LOCK_KEY], args=[WORKER_ID, LOCK_TTL_SECONDS]):
+        raise _LockLost()
+
+
+def _release_lock():
+    global _release_script
+    if _release_script is None:
+        _release_script = get_redis_client().register_script(RELEASE_SCRIPT)
+    _release_script(keys=[LOCK_KEY], args=[WORKER_ID])
+
+
+def _summarize(prompt: str) -> str:
+    # Only the lock holder summarizes, so pacing here bounds the rate across workers
+    if _stop.wait(60 / settings.DECK_SUMMARY_CALLS_PER_MINUTE):
+        raise _Stopped()
+    summary, _, _ = LLMService.generate(prompt)
+    _renew_lock()
+    return summary.strip()
+
+
+def _store(db, deck_hash: str, level: str, first: int, last: int, summary: str):
+    db.execute(
+        insert(DeckSummary).values(
+            deck_hash=deck_hash,
+            prompt_version=SUMMARY_PROMPT_VERSION,
+            level=level,
+            first_slide=first,
+            last_slide=last,
+            summary=summary,
+        ).on_conflict_do_nothing(constraint="uq_deck_summaries_lookup")
+    )
+    db.commit()
+
+
+def summarize_deck(file_id: int):
+    """Build the missing summaries of one deck, committing each as it is made."""
+    db = SessionLocal()
+    try:
+        deck = db.get(FileModel, file_id)
+        if deck is None or not deck.converted_pptx_path:
+            return
+        slides = db.execute(select(Slide).where(deck_slides(deck)).order_by(Slide.slide_number)).scalars().all()
+        if not slides or sum(len(slide.content) for slide in slides) < settings.DECK_SUMMARY_MIN_DECK_CHARS:
+            return
+        deck_hash = PPTXService.get_content_hash(get_storage().local_path(deck.converted_pptx_path))
+        done = {
+            (row.level, row.first_slide): row.summary
+            for row in db.execute(
+                select(DeckSummary).where(
+                    DeckSummary.deck_hash == deck_hash, DeckSummary.prompt_version == SUMMARY_PROMPT_VERSION
+                )
+            ).scalars()
+        }
+        made = 0
+        for slide in slides:
+            if ("slide", slide.slide_number) in done:
+                continue
+            content = slide.content.strip()
+            if len(content) > settings.DECK_SUMMARY_SLIDE_MIN_CHARS:
+                content = _summarize(SLIDE_PROMPT.format(slide_number=slide.slide_number, content=content))
+                made += 1
+            _store(db, deck_hash, "slide", slide.slide_number, slide.slide_number, content)
+            done[("slide", slide.slide_number)] = content
+        for section in _sections([slide.slide_number for slide in slides]):
+            if ("section", section[0]) in done:
+                continue
+            summaries = "\n".join(f"Slide {n}: {done[('slide', n)] or '(no text)'}" for n in section)
+            summary = _summarize(SECTION_PROMPT.format(first=section[0], last=section[-1], summaries=summaries))
+            made += 1
+            _store(db, deck_hash, "section", section[0], section[-1], summary)
+        if made:
+            logger.info(f"Summarized deck {file_id} ({len(slides)} slides) with {made} provider calls")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _back_off(client, file_id: str, error: Exception):
+    """Move a failed deck out of the queue until its next attempt, or for good after the last one."""
+    attempts = client.hincrby(ATTEMPTS_KEY, file_id, 1)
+    client.srem(PENDING_KEY, file_id)
+    if attempts >= settings.DECK_SUMMARY_MAX_ATTEMPTS:
+        logger.error(f"Giving up on summarizing deck {file_id} after {attempts} attempts: {str(error)}", exc_info=error)
+        return
+    delay = settings.DECK_SUMMARY_RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+    client.zadd(RETRY_KEY, {file_id: time.time() + delay})
+    logger.warning(f"Summarizing deck {file_id} failed (attempt {attempts}), retrying in {delay}s: {str(error)}")
+
+
+def _drain():
+    client = get_redis_client()
+    due = client.zrangebyscore(RETRY_KEY, "-inf", time.time())
+    if due:
+        client.zrem(RETRY_KEY, *due)
+        client.sadd(PENDING_KEY, *due)
+    while not _stop.is_set():
+        file_id = client.srandmember(PENDING_KEY)
+        if file_id is None:
+            return
+        # /ask re-queues incomplete decks, including ones backing off or given up on
+        if (client.zscore(RETRY_KEY, file_id) is not None
+                or int(client.hget(ATTEMPTS_KEY, file_id) or 0) >= settings.DECK_SUMMARY_MAX_ATTEMPTS):
+            client.srem(PENDING_KEY, file_id)
+            continue
+        try:
+            # A retry resumes from the last stored summary
+            summarize_deck(int(file_id))
+        except (_Stopped, _LockLost):
+            raise
+        except Exception as e:
+            _back_off(client, file_id, e)
+            continue
+        client.srem(PENDING_KEY, file_id)
+        client.hdel(ATTEMPTS_KEY, file_id)
+
+
+def _run():
+    while not _stop.wait(settings.DECK_SUMMARY_POLL_SECONDS):
+        client = get_redis_client()
+        try:
+            if not client.set(LOCK_KEY, WORKER_ID, nx=True, ex=LOCK_TTL_SECONDS):
+                continue
+            try:
+                _drain()
+            finally:
+                _release_lock()
+        except _Stopped:
+            return
+        except _LockLost:
+            logger.warning("Lost the deck summary lock to another worker; stopped summarizing")
+        except Exception as e:
+            logger.error(f"Deck summarization failed: {str(e)}", exc_info=True)
+
+
+def start():
+    global _thread
+    if settings.DECK_SUMMARY_ENABLED and _thread is None:
+        _thread = threading.Thread(target=_run, name="deck-summary", daemon=True)
+        _thread.start()
+
+
+def stop():
+    _stop.set()
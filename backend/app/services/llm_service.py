@@ -0,0 +1,274 @@
+import logging
+import base64
+import hashlib
+import mimetypes
+from datetime import timedelta
+from functools import lru_cache
+from backend.app.core.config import get_settings
+from backend.app.core import metrics
+from backend.app.services.provider_limiter import get_provider_limiter, ProviderBusyError
+from backend.app.utils.redis_client import get_redis_client
+
+settings = get_settings()
+logger = logging.getLogger("llm_service")
+
+SUPPORTED_PROVIDERS = ["openai", "gemini"]
+MAX_OUTPUT_TOKENS = 1024
+# Rough per-image input cost used when reserving a provider token budget
+IMAGE_TOKEN_ESTIMATE = 1000
+
+
+class LLMProviderError(Exception):
+    """Raised when both the primary and the fallback provider failed."""
+
+
+def get_model_name(provider: str) -> str:
+    if provider == "openai":
+        return settings.OPENAI_MODEL
+    if provider == "gemini":
+        return settings.GEMINI_MODEL
+    raise ValueError(f"Provider must be 'openai' or 'gemini', got: {provider}")
+
+
+def estimate_tokens(text: str, image_path: str | None = None, prefix: str | None = None) -> int:
+    """Cheap upper-bound estimate (~4 chars per token) of the tokens a call will consume."""
+    tokens = (len(text) + len(prefix or "")) // 4 + MAX_OUTPUT_TOKENS
+    if image_path:
+        tokens += IMAGE_TOKEN_ESTIMATE
+    return tokens
+
+
+# The provider SDKs take a noticeable share of worker startup time and memory, so they
+# are imported on the first call rather than when the routers are loaded
+@lru_cache(maxsize=1)
+def _openai_client():
+    from openai import OpenAI
+    return OpenAI(api_key=settings.OPENAI_API_KEY.get_secret_value())
+
+
+@lru_cache(maxsize=1)
+def _gemini_model(model_name: str):
+    import google.generativeai as genai
+    genai.configure(api_key=settings.GEMINI_API_KEY.get_secret_value())
+    return genai.GenerativeModel(model_name)
+
+
+@lru_cache(maxsize=32)
+def _gemini_cached_model(cache_name: str):
+    import google.generativeai as genai
+    return genai.GenerativeModel.from_cached_content(cached_content=cache_name)
+
+
+def _gemini_context_cache_key(model_name: str, prefix: str) -> str:
+    return f"gemini_context_cache:{model_name}:{hashlib.sha256(prefix.encode('utf-8')).hexdigest()}"
+
+
+def _is_missing_context_cache(error: Exception) -> bool:
+    from google.api_core import exceptions
+    # An expired or deleted cache is reported as not found, or as permission denied
+    return isinstance(error, (exceptions.NotFound, exceptions.PermissionDenied))
+
+
+def _gemini_model_with_prefix(model_name: str, prefix: str):
+    """
+    A model bound to a Gemini context cache holding `prefix`, created on first use and
+    shared by the workers through Redis. None when the prefix is too short to cache, the
+    installed SDK predates context caching, or another worker is creating the cache
+    right now (each cache is billed, so only one is created).
+    """
+    if not settings.GEMINI_CONTEXT_CACHE_ENABLED or len(prefix) // 4 < settings.GEMINI_CONTEXT_CACHE_MIN_TOKENS:
+        return None
+    try:
+        from google.generativeai import caching
+    except ImportError:
+        return None
+    key = _gemini_context_cache_key(model_name, prefix)
+    client = get_redis_client()
+    cache_name = client.get(key)
+    if cache_name is None:
+        # Not released: once the cache exists its name is in Redis, and after a failure it spaces out retries
+        if not client.set(f"{key}:creating", 1, nx=True, ex=30):
+            return None
+        ttl = settings.GEMINI_CONTEXT_CACHE_TTL_SECONDS
+        cache_name = caching.CachedContent.create(
+            model=f"models/{model_name}", contents=[prefix], ttl=timedelta(seconds=ttl)
+        ).name
+        # Forget the cache a little before the provider expires it
+        client.set(key, cache_name, ex=max(1, ttl - 60))
+        logger.info(f"Created Gemini context cache {cache_name} (~{len(prefix) // 4} tokens)")
+    return _gemini_cached_model(cache_name)
+
+
+def _openai_cached_tokens(usage) -> int:
+    # Older SDKs keep the field as a plain dict on the usage object
+    details = getattr(usage, "prompt_tokens_details", None)
+    if isinstance(details, dict):
+        return details.get("cached_tokens") or 0
+    return getattr(details, "cached_tokens", None) or 0
+
+
+def _record_usage(provider: str, model: str, prompt_tokens: int | None, completion_tokens: int | None, cached_tokens: int):
+    metrics.record_llm_tokens(provider, model, prompt_tokens, completion_tokens, cached_tokens)
+    if prompt_tokens:
+        logger.info(f"{provider} {model} usage: {prompt_tokens} prompt tokens ({cached_tokens / prompt_tokens:.0%} cached), {completion_tokens} completion")
+
+
+def _read_image(image_path: str) -> tuple[bytes, str]:
+    with open(image_path, "rb") as image_file:
+        image_data = image_file.read()
+    mime_type, _ = mimetypes.guess_type(image_path)
+    if not mime_type or mime_type not in ["image/jpeg", "image/png"]:
+        mime_type = "image/jpeg"  # Default to JPEG if unknown
+    return image_data, mime_type
+
+
+class LLMService:
+    """
+    Prompts are sent as an optional `prefix` (instructions and deck content, identical
+    for every call on the same deck version) followed by the per-call `text`, so the
+    providers can serve the prefix from their prompt caches.
+    """
+
+    @staticmethod
+    def call_openai(text: str, image_path: str | None = None, prefix: str | None = None) -> str:
+        try:
+            client = _openai_client()
+            if image_path:
+                image_data, mime_type = _read_image(image_path)
+                base64_image = base64.b64encode(image_data).decode("utf-8")
+                content = [
+                    {"type": "text", "text": text},
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:{mime_type};base64,{base64_image}"
+                        }
+                    }
+                ]
+            else:
+                content = text
+            # OpenAI caches the longest previously seen prefix (1024+ tokens) automatically
+            messages = [{"role": "system", "content": prefix}] if prefix else []
+            messages.append({"role": "user", "content": content})
+            request_data = {
+                "model": settings.OPENAI_MODEL,
+                "messages": messages,
+                "temperature": 0.7,
+                "max_tokens": MAX_OUTPUT_TOKENS
+            }
+            response = client.chat.completions.create(**request_data)
+            if response.usage:
+                _record_usage(
+                    "openai", settings.OPENAI_MODEL, response.usage.prompt_tokens, response.usage.completion_tokens,
+                    _openai_cached_tokens(response.usage)
+                )
+            return response.choices[0].message.content.strip()
+        except Exception as e:
+            logger.error(f"OpenAI {'multimodal' if image_path else 'text-only'} request failed: {str(e)}", exc_info=True)
+            raise
+
+    @staticmethod
+    def call_gemini(text: str, image_path: str | None = None, prefix: str | None = None) -> str:
+        try:
+            contents = [text]
+            if image_path:
+                image_data, mime_type = _read_image(image_path)
+                contents.append({"mime_type": mime_type, "data": image_data})
+            generation_config = {
+                "temperature": 0.7,
+                "max_output_tokens": MAX_OUTPUT_TOKENS,
+            }
+            response = None
+            if prefix:
+                cache_key = _gemini_context_cache_key(settings.GEMINI_MODEL, prefix)
+                try:
+                    cached_model = _gemini_model_with_prefix(settings.GEMINI_MODEL, prefix)
+                except Exception as e:
+                    # A failed cache only costs the caching, not the call
+                    logger.warning(f"Gemini context cache unavailable, sending the full prompt: {str(e)}")
+                    cached_model = None
+                if cached_model is not None:
+                    try:
+                        response = cached_model.generate_content(
+                            contents if len(contents) > 1 else contents[0], generation_config=generation_config
+                        )
+                    except Exception as e:
+                        if not _is_missing_context_cache(e):
+                            raise
+                        # Expired or deleted on the provider side while its name was still in Redis
+                        logger.warning(f"Gemini context cache is gone, retrying with the full prompt: {str(e)}")
+                        get_redis_client().delete(cache_key)
+                if response is None:
+                    # Prefix first, so implicit caching can reuse it too
+                    contents.insert(0, prefix)
+            if response is None:
+                response = _gemini_model(settings.GEMINI_MODEL).generate_content(
+                    contents if len(contents) > 1 else contents[0], generation_config=generation_config
+                )
+            usage = getattr(response, "usage_metadata", None)
+            if usage:
+                _record_usage(
+                    "gemini", settings.GEMINI_MODEL, usage.prompt_token_count, usage.candidates_token_count,
+                    getattr(usage, "cached_content_token_count", 0) or 0
+                )
+            return response.text.strip()
+        except Exception as e:
+            logger.error(f"Gemini {'multimodal' if image_path else 'text-only'} request failed: {str(e)}", exc_info=True)
+            raise
+
+    @staticmethod
+    def call_model(provider: str, text: str, image_path: str | None = None, prefix: str | None = None) -> str:
+        logger.info(f"About to call model provider: {provider} (type: {'multimodal' if image_path else 'text-only'})")
+        if provider not in SUPPORTED_PROVIDERS:
+            logger.error(f"Invalid provider specified: {provider}")
+            raise ValueError(f"Provider must be 'openai' or 'gemini', got: {provider}")
+
+        # Wait for a concurrency slot and token budget for this provider/model (bulkhead)
+        model = get_model_name(provider)
+        limiter = get_provider_limiter(provider, model)
+        try:
+            with limiter.slot(estimate_tokens(text, image_path, prefix)):
+                with metrics.track_llm_call(provider, model):
+                    if provider == "openai":
+                        return LLMService.call_openai(text, image_path, prefix)
+                    elif provider == "gemini":
+                        return LLMService.call_gemini(text, image_path, prefix)
+        except ProviderBusyError:
+            # Only raised while waiting for a slot
+            metrics.record_llm_rejected(provider, model)
+            raise
+
+    @staticmethod
+    def generate(prompt: str, image_path: str | None = None, prefix: str | None = None) -> tuple[str, str, bool]:
+        """
+        Answer a prompt (after the cacheable `prefix`, if any) with the primary provider, falling back to the secondary one.
+        Returns (answer, provider, used_fallback).
+        Raises LLMProviderError when both providers fail.
+        """
+        primary_provider = settings.PRIMARY_MODEL_PROVIDER.lower()
+        fallback_provider = settings.FALLBACK_MODEL_PROVIDER.lower()
+
+        try:
+            if primary_provider not in SUPPORTED_PROVIDERS:
+                logger.error(f"Invalid primary provider in settings: {primary_provider}")
+                raise ValueError(f"PRIMARY_MODEL_PROVIDER must be 'openai' or 'gemini', got: {primary_provider}")
+
+            answer = LLMService.call_model(primary_provider, prompt, image_path, prefix)
+            logger.info(f"Successfully got response from primary provider: {primary_provider}")
+            return answer, primary_provider, False
+        except Exception as e:
+            logger.error(f"Primary provider ({primary_provider}) failed with error: {str(e)}")
+            try:
+                logger.info(f"Primary provider failed, attempting fallback provider: {fallback_provider}")
+                if fallback_provider not in SUPPORTED_PROVIDERS:
+                    logger.error(f"Invalid fallback provider in settings: {fallback_provider}")
+                    raise ValueError(f"FALLBACK_MODEL_PROVIDER must be 'openai' or 'gemini', got: {fallback_provider}")
+
+                answer = LLMService.call_model(fallback_provider, prompt, image_path, prefix)
+                logger.info(f"Successfully got response from fallback provider: {fallback_provider}")
+                return answer, fallback_provider, True
+            except Exception as e2:
+                logger.error(f"Both providers failed. Primary ({primary_provider}) error: {str(e)}. Fallback ({fallback_provider}) error: {str(e2)}")
+                raise LLMProviderError(
+                    f"Both AI providers failed. Primary ({primary_provider}) error: {str(e)}. Fallback ({fallback_provider}) error: {str(e2)}"
+                )
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from passlib.context import CryptContext
+from backend.app.core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger("password_hasher")
+
+
+class PasswordHasherBusyError(Exception):
+    """Raised when too many hash operations are already waiting for a worker."""
+
+
+@lru_cache(maxsize=4)
+def _context(rounds: int) -> CryptContext:
+    # Hashes made with any other cost are reported as needing an update
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+
+# These run inside the worker processes
+def _hash(password: str, rounds: int) -> str:
+    return _context(rounds).hash(password)
+
+
+def _verify_and_update(password: str, hashed_password: str, rounds: int) -> tuple[bool, str | None]:
+    return _context(rounds).verify_and_update(password, hashed_password)
+
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+# Operations waiting for or running in the pool; awaited, so no threadpool thread is held
+_pending = asyncio.Semaphore(settings.PASSWORD_HASH_MAX_PENDING)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: forking a multi-threaded server process is not safe
+                _pool = ProcessPoolExecutor(
+                    max_workers=settings.PASSWORD_HASH_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pool
+
+
+async def _run(fn, *args):
+    """
+    Run a bcrypt operation in the process pool and await it on the event loop, so
+    neither the GIL nor a threadpool thread is held while the hash is computed.
+    """
+    timeout = settings.PASSWORD_HASH_TIMEOUT_SECONDS
+    try:
+        await asyncio.wait_for(_pending.acquire(), timeout)
+    except asyncio.TimeoutError:
+        raise PasswordHasherBusyError(f"Timed out after {timeout}s waiting to queue a password hash")
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(_get_pool().submit(fn, *args)), timeout)
+    except asyncio.TimeoutError:
+        raise PasswordHasherBusyError(f"Password hash did not finish within {timeout}s")
+    finally:
+        _pending.release()
+
+
+async def hash_password(password: str) -> str:
+    return await _run(_hash, password, settings.PASSWORD_BCRYPT_ROUNDS)
+
+
+async def verify_password(password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """
+    Check a password against its stored hash.
+    Returns (valid, new_hash); new_hash is set when the stored hash used a different
+    cost than PASSWORD_BCRYPT_ROUNDS and should replace it.
+    """
+    return await _run(_verify_and_update, password, hashed_password, settings.PASSWORD_BCRYPT_ROUNDS)
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
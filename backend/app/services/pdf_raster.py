@@ -0,0 +1,158 @@
+"""
+PDF page rendering for PDF_RASTERIZE conversions.
+
+Pages are rendered with pypdfium2 (installed with pdfplumber) in a separate process
+pool, so rendering runs in parallel without holding the worker's GIL, and each render
+process has a capped address space so one huge page cannot exhaust the server's memory.
+Renders are cached in storage under the document's hash; converting the same PDF again
+reuses them instead of rendering again.
+"""
+import hashlib
+import logging
+import math
+import multiprocessing
+import os
+import resource
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from backend.app.core.config import get_settings
+from backend.app.core.metrics import PDF_PAGES_RASTERIZED
+from backend.app.services.storage import CHUNK_SIZE, get_storage
+
+settings = get_settings()
+logger = logging.getLogger("pdf_raster")
+
+PAGE_CACHE_PREFIX = "pdf_pages"
+
+
+# These run inside the render processes
+def _limit_memory(megabytes: int):
+    limit = megabytes * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+@lru_cache(maxsize=1)
+def _open_document(pdf_path: str):
+    # A process usually renders several pages of the same document in a row
+    import pypdfium2 as pdfium
+    return pdfium.PdfDocument(pdf_path)
+
+
+def _render_page(pdf_path: str, index: int, dpi: int, max_pixels: int, out_path: str) -> str | None:
+    try:
+        page = _open_document(pdf_path)[index]
+        width, height = page.get_size()  # points
+        scale = dpi / 72
+        if width * height * scale * scale > max_pixels:
+            scale = math.sqrt(max_pixels / (width * height))
+        page.render(scale=scale).to_pil().save(out_path, "PNG")
+        return out_path
+    except MemoryError:
+        _open_document.cache_clear()
+        return None
+
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: forking a multi-threaded server process is not safe
+                _pool = ProcessPoolExecutor(
+                    max_workers=settings.PDF_RASTER_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_limit_memory,
+                    initargs=(settings.PDF_RASTER_WORKER_MEMORY_MB,),
+                )
+    return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor, terminate: bool = False):
+    """
+    Replace a pool whose process died (e.g. killed by the memory cap in native code) or,
+    with `terminate`, one still stuck rendering a page: a running render cannot be
+    cancelled, so its processes are killed rather than left holding their slots.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    processes = list((pool._processes or {}).values()) if terminate else []
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+
+
+def _document_digest(pdf_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def page_cache_key(digest: str, page_number: int) -> str:
+    return f"{PAGE_CACHE_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}/{page_number}_{settings.PDF_RASTER_DPI}.png"
+
+
+def rasterize(pdf_path: str, page_count: int, work_dir: str) -> list[str | None]:
+    """
+    Local image paths for pages 1..page_count of `pdf_path`; None for pages that could
+    not be rendered within the memory cap or PDF_RASTER_TIMEOUT_SECONDS. `work_dir` is
+    owned by the caller and holds renders until they are stored.
+    """
+    storage = get_storage()
+    digest = _document_digest(pdf_path)
+    images: list[str | None] = [None] * page_count
+    pending = {}
+    pool = _get_pool()
+    try:
+        for index in range(page_count):
+            key = page_cache_key(digest, index + 1)
+            if storage.exists(key):
+                images[index] = storage.local_path(key)
+                PDF_PAGES_RASTERIZED.labels("cached").inc()
+                continue
+            out_path = os.path.join(work_dir, f"page_{index + 1}.png")
+            future = pool.submit(_render_page, pdf_path, index, settings.PDF_RASTER_DPI, settings.PDF_RASTER_MAX_PIXELS, out_path)
+            pending[future] = (index, key)
+    except BrokenProcessPool:
+        _discard_pool(pool)
+    done, not_done = wait(pending, timeout=settings.PDF_RASTER_TIMEOUT_SECONDS)
+    if not_done:
+        # Other conversions sharing the pool lose their in-flight pages too; they keep their text
+        _discard_pool(pool, terminate=True)
+    for future in done:
+        index, key = pending[future]
+        try:
+            out_path = future.result()
+        except BrokenProcessPool:
+            _discard_pool(pool)
+            out_path = None
+        except Exception as e:
+            logger.warning(f"Rendering page {index + 1} of {pdf_path} failed: {str(e)}")
+            out_path = None
+        if out_path is None:
+            continue
+        storage.put_file(key, out_path)
+        images[index] = storage.local_path(key)
+        PDF_PAGES_RASTERIZED.labels("rendered").inc()
+    failed = images.count(None)
+    if failed:
+        PDF_PAGES_RASTERIZED.labels("failed").inc(failed)
+        logger.warning(f"{failed} of {page_count} pages of {pdf_path} were not rendered; they keep only their text")
+    return images
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
@@ -1,14 +1,26 @@
-from pptx import Presentation
 from typing import List, Dict
 import logging
-from pptx.enum.shapes import MSO_SHAPE_TYPE
-from PIL import Image
 import io
 import os
-import tempfile
+import hashlib
+from functools import lru_cache
 
 logger = logging.getLogger("pptx_service")
 
+@lru_cache(maxsize=1024)
+def _hash_file(path: str, mtime_ns: int, size: int) -> str:
+    # mtime/size are part of the cache key so a rewritten file is hashed again
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _open_presentation(pptx_path: str):
+    # python-pptx (and lxml) is imported on first use rather than at worker startup
+    from pptx import Presentation
+    return Presentation(pptx_path)
+
 class PPTXService:
     @staticmethod
     def extract_text_from_pptx(pptx_path: str) -> List[Dict[str, str]]:
@@ -17,7 +29,7 @@ class PPTXService:
         Returns a list of dictionaries containing slide number and content.
         """
         try:
-            prs = Presentation(pptx_path)
+            prs = _open_presentation(pptx_path)
             slides_content = []
             
             for idx, slide in enumerate(prs.slides, 1):
@@ -42,6 +54,48 @@ class PPTXService:
             logger.error(f"Error extracting text from PPTX {pptx_path}: {str(e)}", exc_info=True)
             raise
 
+    @staticmethod
+    def extract_slides(pptx_path: str, image_dir: str) -> List[Dict]:
+        """
+        Extract text and the first image of every slide in one pass.
+        Images are written to `image_dir` so they can be served without reopening the PPTX.
+        Returns a list of dicts: {slide_number, content, image_path (None without an image)}
+        """
+        try:
+            prs = _open_presentation(pptx_path)
+            from pptx.enum.shapes import MSO_SHAPE_TYPE
+            slides = []
+            for idx, slide in enumerate(prs.slides, 1):
+                slide_text = []
+                image_path = None
+                for shape in slide.shapes:
+                    if hasattr(shape, "text") and shape.text.strip():
+                        slide_text.append(shape.text.strip())
+                    if image_path is None and shape.shape_type == MSO_SHAPE_TYPE.PICTURE:
+                        os.makedirs(image_dir, exist_ok=True)
+                        image_path = os.path.join(image_dir, f"slide_{idx}.{shape.image.ext}")
+                        with open(image_path, "wb") as f:
+                            f.write(shape.image.blob)
+                slides.append({
+                    "slide_number": idx,
+                    "content": "\n".join(slide_text),
+                    "image_path": image_path,
+                })
+            logger.info(f"Extracted {len(slides)} slides from {pptx_path}")
+            return slides
+        except Exception as e:
+            logger.error(f"Error extracting slides from PPTX {pptx_path}: {str(e)}", exc_info=True)
+            raise
+
+    @staticmethod
+    def get_content_hash(pptx_path: str) -> str:
+        """
+        Return the SHA-256 of the PPTX file, used as the deck version in cache keys.
+        Memoized per (path, mtime, size) so repeated calls only cost a stat().
+        """
+        stat = os.stat(pptx_path)
+        return _hash_file(pptx_path, stat.st_mtime_ns, stat.st_size)
+
     @staticmethod
     def format_slides_for_prompt(slides_content: List[Dict[str, str]]) -> str:
         """
@@ -53,26 +107,26 @@ class PPTXService:
         return formatted_content.strip()
 
     @staticmethod
-    def extract_images_from_pptx(pptx_path: str) -> List[Dict[str, str]]:
+    def extract_images_from_pptx(pptx_path: str, image_dir: str) -> List[Dict[str, str]]:
         """
-        Extract the first image from each slide in a PPTX file.
+        Extract the first image from each slide in a PPTX file into `image_dir`,
+        which the caller owns and cleans up (e.g. a TemporaryDirectory).
         Returns a list of dicts: {slide_number, image_path}
         """
         try:
-            prs = Presentation(pptx_path)
+            prs = _open_presentation(pptx_path)
+            from pptx.enum.shapes import MSO_SHAPE_TYPE
             slides_images = []
             for idx, slide in enumerate(prs.slides, 1):
                 for shape in slide.shapes:
                     if shape.shape_type == MSO_SHAPE_TYPE.PICTURE:
                         image = shape.image
-                        image_bytes = image.blob
-                        ext = image.ext
-                        with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{ext}') as tmp:
-                            tmp.write(image_bytes)
-                            tmp_path = tmp.name
+                        image_path = os.path.join(image_dir, f"slide_{idx}.{image.ext}")
+                        with open(image_path, "wb") as f:
+                            f.write(image.blob)
                         slides_images.append({
                             "slide_number": idx,
-                            "image_path": tmp_path
+                            "image_path": image_path
                         })
                         break  # Only first image per slide for now
             logger.info(f"Extracted images from {len(slides_images)} slides in {pptx_path}")
@@ -88,7 +142,8 @@ class PPTXService:
         Returns (image_bytes, mime_type) or (None, None) if not found.
         """
         try:
-            prs = Presentation(pptx_path)
+            prs = _open_presentation(pptx_path)
+            from pptx.enum.shapes import MSO_SHAPE_TYPE
             if slide_number < 1 or slide_number > len(prs.slides):
                 return None, None
             slide = prs.slides[slide_number - 1]
@@ -0,0 +1,207 @@
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from backend.app.core.config import get_settings
+from backend.app.core.metrics import (
+    LLM_LIMITER_IN_FLIGHT,
+    LLM_LIMITER_QUEUE_DEPTH,
+    LLM_LIMITER_REJECTIONS,
+    LLM_LIMITER_WAIT,
+)
+from backend.app.utils.redis_client import get_redis_client
+
+settings = get_settings()
+logger = logging.getLogger("provider_limiter")
+
+# Atomically take a concurrency lease and reserve tokens from the current
+# one-minute budget. Returns 0 when acquired, otherwise the number of
+# milliseconds the caller should wait before retrying.
+ACQUIRE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[2]) then
+    return 50
+end
+local tokens = tonumber(ARGV[4])
+local budget = tonumber(ARGV[5])
+if budget > 0 then
+    local window = KEYS[2] .. ':' .. math.floor(now / 60000)
+    local used = tonumber(redis.call('GET', window) or '0')
+    if used > 0 and used + tokens > budget then
+        return 60000 - (now % 60000)
+    end
+    redis.call('INCRBY', window, tokens)
+    redis.call('PEXPIRE', window, 120000)
+end
+redis.call('ZADD', KEYS[1], now + tonumber(ARGV[3]), ARGV[1])
+return 0
+"""
+
+_acquire_script = None
+
+
+def _get_acquire_script():
+    global _acquire_script
+    if _acquire_script is None:
+        _acquire_script = get_redis_client().register_script(ACQUIRE_SCRIPT)
+    return _acquire_script
+
+
+class ProviderBusyError(Exception):
+    """Raised when a provider's queue is full or the queue deadline passed."""
+
+
+class ProviderLimiter:
+    """
+    Bulkhead for one provider/model pair.
+
+    Concurrency is capped per worker with a local semaphore and across workers
+    with a Redis sorted set of expiring leases; tokens-per-minute budgets are
+    tracked in a per-minute Redis counter. Callers that cannot get a slot wait
+    in a bounded queue until their deadline. If Redis is unavailable the
+    limiter degrades to the per-worker semaphore only.
+    """
+
+    def __init__(self, provider: str, model: str, max_concurrency: int, tokens_per_minute: int,
+                 max_queue: int, queue_timeout: float):
+        self.provider = provider
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.tokens_per_minute = tokens_per_minute
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._local_slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._slots_key = f"llm_limiter:{provider}:{model}:slots"
+        self._tokens_key = f"llm_limiter:{provider}:{model}:tokens"
+        # Metrics
+        self.queue_depth = 0
+        self.in_flight = 0
+        self.acquired_total = 0
+        self.rejected_total = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _enter_queue(self):
+        with self._lock:
+            if self.queue_depth >= self.max_queue:
+                self.rejected_total += 1
+                LLM_LIMITER_REJECTIONS.labels(self.provider, self.model, "queue_full").inc()
+                raise ProviderBusyError(f"{self.provider}/{self.model} queue is full ({self.max_queue} waiting)")
+            self.queue_depth += 1
+            LLM_LIMITER_QUEUE_DEPTH.labels(self.provider, self.model).inc()
+
+    def _leave_queue(self, waited: float, acquired: bool):
+        with self._lock:
+            self.queue_depth -= 1
+            LLM_LIMITER_QUEUE_DEPTH.labels(self.provider, self.model).dec()
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            if acquired:
+                self.acquired_total += 1
+                self.in_flight += 1
+                LLM_LIMITER_IN_FLIGHT.labels(self.provider, self.model).inc()
+            else:
+                self.rejected_total += 1
+                LLM_LIMITER_REJECTIONS.labels(self.provider, self.model, "timeout").inc()
+
+    def _acquire_global(self, lease_id: str, tokens: int, deadline: float) -> bool:
+        lease_ms = settings.LLM_SLOT_LEASE_SECONDS * 1000
+        while True:
+            try:
+                retry_ms = _get_acquire_script()(
+                    keys=[self._slots_key, self._tokens_key],
+                    args=[lease_id, self.max_concurrency, lease_ms, tokens, self.tokens_per_minute],
+                    client=get_redis_client(),
+                )
+            except Exception as e:
+                logger.warning(f"Redis limiter unavailable for {self.provider}/{self.model}, using local limit only: {e}")
+                return True
+            if int(retry_ms) == 0:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(int(retry_ms) / 1000, remaining))
+
+    def _release_global(self, lease_id: str):
+        try:
+            get_redis_client().zrem(self._slots_key, lease_id)
+        except Exception as e:
+            # The lease expires on its own after LLM_SLOT_LEASE_SECONDS
+            logger.warning(f"Failed to release limiter lease for {self.provider}/{self.model}: {e}")
+
+    @contextmanager
+    def slot(self, tokens: int):
+        """Hold a concurrency slot with `tokens` reserved for the duration of a provider call."""
+        self._enter_queue()
+        start = time.monotonic()
+        deadline = start + self.queue_timeout
+        lease_id = uuid.uuid4().hex
+        acquired_local = self._local_slots.acquire(timeout=self.queue_timeout)
+        acquired = acquired_local and self._acquire_global(lease_id, tokens, deadline)
+        if acquired_local and not acquired:
+            self._local_slots.release()
+        waited = time.monotonic() - start
+        LLM_LIMITER_WAIT.labels(self.provider, self.model, "acquired" if acquired else "timeout").observe(waited)
+        self._leave_queue(waited, acquired)
+        if not acquired:
+            raise ProviderBusyError(
+                f"Timed out after {self.queue_timeout}s waiting for {self.provider}/{self.model} capacity"
+            )
+        try:
+            yield
+        finally:
+            self._release_global(lease_id)
+            self._local_slots.release()
+            with self._lock:
+                self.in_flight -= 1
+                LLM_LIMITER_IN_FLIGHT.labels(self.provider, self.model).dec()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "provider": self.provider,
+                "model": self.model,
+                "max_concurrency": self.max_concurrency,
+                "tokens_per_minute": self.tokens_per_minute,
+                "in_flight": self.in_flight,
+                "queue_depth": self.queue_depth,
+                "acquired_total": self.acquired_total,
+                "rejected_total": self.rejected_total,
+                "wait_seconds_total": round(self.wait_seconds_total, 3),
+                "wait_seconds_max": round(self.wait_seconds_max, 3),
+            }
+
+
+_limiters: dict[tuple[str, str], ProviderLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_provider_limiter(provider: str, model: str) -> ProviderLimiter:
+    """Return the shared limiter for a provider/model, creating it from settings on first use."""
+    key = (provider, model)
+    limiter = _limiters.get(key)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(key)
+            if limiter is None:
+                # Per provider/model overrides, e.g. {"openai:gpt-4o-mini": {"max_concurrency": 16}}
+                overrides = settings.LLM_PROVIDER_LIMITS.get(f"{provider}:{model}", {})
+                limiter = ProviderLimiter(
+                    provider,
+                    model,
+                    max_concurrency=overrides.get("max_concurrency", settings.LLM_MAX_CONCURRENCY),
+                    tokens_per_minute=overrides.get("tokens_per_minute", settings.LLM_TOKENS_PER_MINUTE),
+                    max_queue=overrides.get("max_queue", settings.LLM_QUEUE_MAX_SIZE),
+                    queue_timeout=overrides.get("queue_timeout", settings.LLM_QUEUE_TIMEOUT_SECONDS),
+                )
+                _limiters[key] = limiter
+    return limiter
+
+
+def get_limiter_stats() -> list[dict]:
+    return [limiter.stats() for limiter in list(_limiters.values())]
@@ -0,0 +1,198 @@
+import hashlib
+import logging
+import threading
+import time
+from backend.app.core.config import get_settings
+from backend.app.services.ai_cache import question_hash
+from backend.app.utils.question_text import embed_question, is_negated
+
+settings = get_settings()
+logger = logging.getLogger("semantic_cache")
+
+
+class SemanticCache:
+    """
+    Opt-in near-duplicate answer cache. Each cache namespace (scope, deck version,
+    prompt version, model) gets its own chromadb collection, so a lookup only
+    searches answers grounded on the same deck content.
+
+    Embedded chroma is not safe to share between processes, so workers either share
+    a chroma server (`chroma_host`) or each keep their own in-memory collections.
+    Entries expire after `ttl_seconds`, like the exact-match tier, and a collection
+    keeps at most `max_entries`, evicting the oldest.
+    """
+
+    # Expired entries and emptied collections are removed at most this often per worker
+    PRUNE_INTERVAL_SECONDS = 600
+
+    def __init__(self, threshold: float, embedding_model: str | None = None, chroma_host: str | None = None,
+                 chroma_port: int = 8000, ttl_seconds: int = 3600, max_entries: int = 1000):
+        self.threshold = threshold
+        # Optional local sentence-transformers model (name or path); hashing vectorizer otherwise
+        self.embedding_model = embedding_model
+        self.chroma_host = chroma_host
+        self.chroma_port = chroma_port
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._encoder = None
+        self._client = None
+        self._collections = {}
+        self._lock = threading.Lock()
+        self._prune_lock = threading.Lock()
+        self._last_prune = time.monotonic()
+        self._stats_lock = threading.Lock()
+        self._stats = {"lookups": 0, "hits": 0, "misses": 0, "errors": 0, "evicted": 0, "hit_similarity_total": 0.0,
+                       "lookup_seconds_total": 0.0, "lookup_seconds_max": 0.0}
+
+    def _embed(self, question: str) -> list[float]:
+        if not self.embedding_model:
+            return embed_question(question)
+        if self._encoder is None:
+            with self._lock:
+                if self._encoder is None:
+                    from sentence_transformers import SentenceTransformer  # optional dependency
+                    self._encoder = SentenceTransformer(self.embedding_model, device="cpu")
+        return self._encoder.encode(question, normalize_embeddings=True).tolist()
+
+    def _get_client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import chromadb  # heavy import, only paid when the semantic cache is enabled
+                    if self.chroma_host:
+                        self._client = chromadb.HttpClient(host=self.chroma_host, port=self.chroma_port)
+                    else:
+                        self._client = chromadb.EphemeralClient()
+        return self._client
+
+    def _collection_name(self, namespace: str) -> str:
+        # Vectors from different embedders are not comparable, so they never share a collection
+        embedder = self.embedding_model or "hashing"
+        return "sc_" + hashlib.sha1(f"{embedder}|{namespace}".encode("utf-8")).hexdigest()
+
+    def _get_collection(self, namespace: str):
+        name = self._collection_name(namespace)
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._get_client().get_or_create_collection(name, metadata={"hnsw:space": "cosine"})
+            self._collections[name] = collection
+        return collection
+
+    def lookup(self, question: str, namespace: str) -> tuple[str, float, str] | None:
+        """
+        Return (answer, similarity, matched_question) for the closest previous question
+        above the threshold that is negated exactly when `question` is.
+        """
+        start = time.perf_counter()
+        result = None
+        try:
+            collection = self._get_collection(namespace)
+            count = collection.count()
+            if count > 0:
+                matches = collection.query(
+                    query_embeddings=[self._embed(question)],
+                    n_results=min(count, 3),
+                    where={"created_at": {"$gte": time.time() - self.ttl_seconds}},
+                    include=["documents", "metadatas", "distances"],
+                )
+                negated = is_negated(question)
+                for answer, metadata, distance in zip(
+                    matches["documents"][0], matches["metadatas"][0], matches["distances"][0]
+                ):
+                    similarity = 1.0 - distance
+                    if similarity < self.threshold:
+                        break
+                    if is_negated(metadata["question"]) == negated:
+                        result = (answer, similarity, metadata["question"])
+                        break
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup failed: {e}")
+            # The collection may have been pruned by another worker; look it up again next time
+            self._collections.pop(self._collection_name(namespace), None)
+            self._record(errors=1)
+        elapsed = time.perf_counter() - start
+        if result:
+            # Logged so hits can be audited for precision
+            logger.info(f"Semantic cache hit (similarity={result[1]:.3f}): {question!r} matched {result[2]!r}")
+            self._record(lookups=1, hits=1, hit_similarity_total=result[1], elapsed=elapsed)
+        else:
+            self._record(lookups=1, misses=1, elapsed=elapsed)
+        return result
+
+    def store(self, question: str, namespace: str, answer: str):
+        try:
+            collection = self._get_collection(namespace)
+            collection.upsert(
+                ids=[question_hash(question)],
+                embeddings=[self._embed(question)],
+                documents=[answer],
+                metadatas=[{"question": question, "created_at": time.time()}],
+            )
+            if collection.count() > self.max_entries:
+                self._evict_oldest(collection)
+        except Exception as e:
+            logger.warning(f"Semantic cache store failed: {e}")
+            self._collections.pop(self._collection_name(namespace), None)
+            self._record(errors=1)
+        self._maybe_prune()
+
+    def _evict_oldest(self, collection):
+        # Down to 90% of the cap, so eviction does not run again on the next store
+        entries = collection.get(include=["metadatas"])
+        by_age = sorted(zip(entries["ids"], entries["metadatas"]), key=lambda entry: entry[1].get("created_at", 0))
+        evicted = [entry_id for entry_id, _ in by_age[:len(by_age) - int(self.max_entries * 0.9)]]
+        collection.delete(ids=evicted)
+        self._record(evicted=len(evicted))
+
+    def _maybe_prune(self):
+        """Delete expired entries, and collections left empty (e.g. of old deck versions)."""
+        if time.monotonic() - self._last_prune < self.PRUNE_INTERVAL_SECONDS or not self._prune_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_prune = time.monotonic()
+            client = self._get_client()
+            cutoff = time.time() - self.ttl_seconds
+            for collection in client.list_collections():
+                if not collection.name.startswith("sc_"):
+                    continue
+                collection.delete(where={"created_at": {"$lt": cutoff}})
+                if collection.count() == 0:
+                    client.delete_collection(collection.name)
+                    self._collections.pop(collection.name, None)
+        except Exception as e:
+            logger.warning(f"Semantic cache prune failed: {e}")
+        finally:
+            self._prune_lock.release()
+
+    def _record(self, elapsed: float = 0.0, **counts):
+        with self._stats_lock:
+            for name, value in counts.items():
+                self._stats[name] += value
+            self._stats["lookup_seconds_total"] += elapsed
+            self._stats["lookup_seconds_max"] = max(self._stats["lookup_seconds_max"], elapsed)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["threshold"] = self.threshold
+        stats["backend"] = f"http://{self.chroma_host}:{self.chroma_port}" if self.chroma_host else "in-memory"
+        stats["embedding_model"] = self.embedding_model or "hashing"
+        stats["hit_rate"] = round(stats["hits"] / stats["lookups"], 4) if stats["lookups"] else 0.0
+        stats["mean_hit_similarity"] = round(stats["hit_similarity_total"] / stats["hits"], 4) if stats["hits"] else None
+        stats["mean_lookup_ms"] = round(stats["lookup_seconds_total"] * 1000 / stats["lookups"], 3) if stats["lookups"] else None
+        return stats
+
+
+semantic_cache = SemanticCache(
+    settings.SEMANTIC_CACHE_THRESHOLD,
+    settings.SEMANTIC_CACHE_EMBEDDING_MODEL,
+    chroma_host=settings.SEMANTIC_CACHE_CHROMA_HOST,
+    chroma_port=settings.SEMANTIC_CACHE_CHROMA_PORT,
+    ttl_seconds=settings.SEMANTIC_CACHE_TTL_SECONDS,
+    max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+) if settings.SEMANTIC_CACHE_ENABLED else None
+
+
+def get_semantic_cache() -> SemanticCache | None:
+    """Return the semantic cache, or None when SEMANTIC_CACHE_ENABLED is off."""
+    return semantic_cache
@@ -0,0 +1,149 @@
+import logging
+import os
+import tempfile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, func, insert, literal_column, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from backend.app.models import File as FileModel, Slide
+from backend.app.services.pptx_service import PPTXService
+from backend.app.services.storage import derived_prefix, get_storage
+
+logger = logging.getLogger("slide_index")
+
+# Storage prefix of the slide images extracted at ingest, one directory per converted deck
+SLIDE_IMAGE_PREFIX = "slide_images"
+
+# Must match the configuration of the slides.search_vector column
+SEARCH_CONFIG = literal_column("'english'::regconfig")
+
+
+def extract_deck_slides(pptx_key: str) -> list[dict]:
+    """Text and first image of each slide; images are stored and referenced by key."""
+    storage = get_storage()
+    image_prefix = derived_prefix(pptx_key, SLIDE_IMAGE_PREFIX)
+    with tempfile.TemporaryDirectory() as image_dir:
+        slides = PPTXService.extract_slides(storage.local_path(pptx_key), image_dir)
+        for slide in slides:
+            if slide["image_path"]:
+                image_key = f"{image_prefix}/{os.path.basename(slide['image_path'])}"
+                storage.put_file(image_key, slide["image_path"])
+                slide["image_path"] = image_key
+    return slides
+
+
+def _owner_id(pptx_path, user_id):
+    """
+    Uploads that share a converted PPTX (image batches) share one set of slides, stored
+    under the lowest id among those files. Takes values or (correlated) columns.
+    """
+    owner = aliased(FileModel)
+    return (
+        select(func.min(owner.id))
+        .where(owner.converted_pptx_path == pptx_path, owner.user_id == user_id)
+        .correlate_except(owner)
+        .scalar_subquery()
+    )
+
+
+def deck_slides(deck: FileModel):
+    """Condition selecting the slides of `deck`."""
+    return Slide.file_id == _owner_id(deck.converted_pptx_path, deck.user_id)
+
+
+async def index_decks(db: AsyncSession, decks: list[FileModel]):
+    """
+    Parse each converted deck once and (re)write its rows in the slides table, under
+    the deck's owning file. Failures are logged; the deck can still be read from the PPTX.
+    """
+    by_path: dict[tuple[str, int], list[int]] = {}
+    for deck in decks:
+        if deck.converted_pptx_path:
+            by_path.setdefault((deck.converted_pptx_path, deck.user_id), []).append(deck.id)
+    for (pptx_path, user_id), file_ids in by_path.items():
+        try:
+            slides = await run_in_threadpool(extract_deck_slides, pptx_path)
+            sharing = select(FileModel.id).where(FileModel.converted_pptx_path == pptx_path, FileModel.user_id == user_id)
+            await db.execute(delete(Slide).where(Slide.file_id.in_(sharing)))
+            if slides:
+                owner_id = await db.scalar(select(func.min(FileModel.id)).where(
+                    FileModel.converted_pptx_path == pptx_path, FileModel.user_id == user_id
+                ))
+                await db.execute(insert(Slide), [{"file_id": owner_id, **slide} for slide in slides])
+            await db.commit()
+            logger.info(f"Indexed {len(slides)} slides for files {file_ids}")
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Failed to index slides for files {file_ids}: {str(e)}", exc_info=True)
+
+
+def _user_slides(user_id: int, deck_id: int):
+    return select(Slide).join(
+        FileModel, Slide.file_id == _owner_id(FileModel.converted_pptx_path, FileModel.user_id)
+    ).where(FileModel.id == deck_id, FileModel.user_id == user_id)
+
+
+async def find_user_deck_slides(db: AsyncSession, user_id: int, deck_id: int) -> list[Slide]:
+    """A deck's indexed slides in one query, empty if the deck is not the user's or not indexed yet."""
+    result = await db.execute(_user_slides(user_id, deck_id).order_by(Slide.slide_number))
+    return result.scalars().all()
+
+
+async def find_user_slide(db: AsyncSession, user_id: int, deck_id: int, slide_number: int) -> Slide | None:
+    result = await db.execute(_user_slides(user_id, deck_id).where(Slide.slide_number == slide_number))
+    return result.scalars().first()
+
+
+async def get_deck_slides(db: AsyncSession, deck: FileModel) -> list[Slide]:
+    """All slides of a deck in order; decks converted before the slides table existed are indexed on first read."""
+    query = select(Slide).where(deck_slides(deck)).order_by(Slide.slide_number)
+    slides = (await db.execute(query)).scalars().all()
+    if not slides:
+        await index_decks(db, [deck])
+        slides = (await db.execute(query)).scalars().all()
+    return slides
+
+
+async def get_slide(db: AsyncSession, deck: FileModel, slide_number: int) -> Slide | None:
+    query = select(Slide).where(deck_slides(deck), Slide.slide_number == slide_number)
+    slide = (await db.execute(query)).scalars().first()
+    if slide is None:
+        indexed = (await db.execute(select(Slide.id).where(deck_slides(deck)).limit(1))).first()
+        if indexed is None:
+            await index_decks(db, [deck])
+            slide = (await db.execute(query)).scalars().first()
+    return slide
+
+
+async def search_slides(db: AsyncSession, user_id: int, query: str, limit: int = 20) -> list[dict]:
+    """
+    Full-text search over the slides of all of a user's decks, best matches first.
+    Accepts web-search syntax: quoted phrases, OR, and -excluded words.
+    """
+    ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+    rank = func.ts_rank(Slide.search_vector, ts_query)
+    result = await db.execute(
+        select(
+            Slide.file_id,
+            FileModel.filename,
+            Slide.slide_number,
+            func.ts_headline(
+                SEARCH_CONFIG, Slide.content, ts_query, "MaxFragments=2, MaxWords=20, MinWords=5"
+            ).label("snippet"),
+            rank.label("rank"),
+        )
+        .join(FileModel, FileModel.id == Slide.file_id)
+        .where(FileModel.user_id == user_id, Slide.search_vector.op("@@")(ts_query))
+        .order_by(rank.desc(), Slide.file_id, Slide.slide_number)
+        .limit(limit)
+    )
+    return [
+        {
+            "slide_deck_id": row.file_id,
+            "filename": row.filename,
+            "slide_number": row.slide_number,
+            "snippet": row.snippet,
+            "rank": round(float(row.rank), 4),
+        }
+        for row in result
+    ]
@@ -0,0 +1,318 @@
+"""
+Storage for uploaded files, converted decks and slide images.
+
+Objects are addressed by keys such as "3f/a2/lecture_202610191200_ab12cd.pptx": the two
+leading directories come from a hash of the name, so no directory grows beyond a few
+thousand entries. The local backend keeps objects under STORAGE_LOCAL_ROOT; the S3
+backend works with any S3-compatible service (MinIO locally). Reads and writes are
+streamed in chunks rather than buffered whole.
+"""
+import hashlib
+import logging
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import BinaryIO, Iterator
+from fastapi.responses import FileResponse, StreamingResponse
+from backend.app.core.config import get_settings
+from backend.app.utils.file_utils import generate_unique_filename
+
+settings = get_settings()
+logger = logging.getLogger("storage")
+
+CHUNK_SIZE = 1024 * 1024
+STAGING_DIR = ".staging"
+
+
+def shard(name: str) -> str:
+    digest = hashlib.sha1(name.encode("utf-8")).hexdigest()
+    return f"{digest[:2]}/{digest[2:4]}"
+
+
+def make_key(filename: str, prefix: str = "") -> str:
+    """A new, unique key for a file called `filename`."""
+    unique = generate_unique_filename(filename)
+    return "/".join(part for part in (prefix, shard(unique), unique) if part)
+
+
+def derived_prefix(key: str, kind: str) -> str:
+    """Prefix for objects derived from `key` (e.g. the slide images of a deck), in the same shard."""
+    stem = os.path.splitext(os.path.basename(key))[0]
+    return f"{kind}/{shard(os.path.basename(key))}/{stem}"
+
+
+class Storage:
+    is_local = False
+
+    def __init__(self, staging_root: str):
+        self.staging_root = staging_root
+
+    @contextmanager
+    def new_file(self, key: str):
+        """
+        Yield a local path to write the object to; it is stored under `key` when the
+        block exits without an error and discarded otherwise.
+        """
+        staging_dir = os.path.join(self.staging_root, STAGING_DIR)
+        os.makedirs(staging_dir, exist_ok=True)
+        path = os.path.join(staging_dir, f"{uuid.uuid4().hex}{os.path.splitext(key)[1]}")
+        try:
+            yield path
+            self.put_file(key, path)
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def save(self, key: str, stream: BinaryIO) -> int:
+        """Copy `stream` to `key` in chunks; returns the number of bytes written."""
+        with self.new_file(key) as path:
+            with open(path, "wb") as f:
+                shutil.copyfileobj(stream, f, CHUNK_SIZE)
+                size = f.tell()
+        return size
+
+    def reference_forms(self, key: str) -> list[str]:
+        """The values a database row may hold for `key`."""
+        return [key]
+
+    def trim_cache(self) -> int:
+        """Evict local copies of remote objects beyond the cache size; returns the bytes freed."""
+        return 0
+
+    def file_response(self, key: str, media_type: str, filename: str | None = None):
+        """Serve a stored object; raises FileNotFoundError before the response starts if it is missing."""
+        headers = {"Content-Disposition": f"attachment; filename=\"{filename}\""} if filename else None
+        if self.is_local:
+            path = self.local_path(key)
+            if not os.path.isfile(path):
+                raise FileNotFoundError(key)
+            return FileResponse(path, media_type=media_type, headers=headers)
+        return StreamingResponse(self.iter_chunks(key), media_type=media_type, headers=headers)
+
+
+class LocalStorage(Storage):
+    is_local = True
+
+    def __init__(self, root: str):
+        super().__init__(root)
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        # Rows written before the storage layer hold the full path under the root
+        if os.path.isabs(key) or key.startswith(self.root + "/"):
+            return key
+        return os.path.join(self.root, key)
+
+    def put_file(self, key: str, src_path: str):
+        """Move a local file into storage under `key`."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.move(src_path, path)
+
+    def local_path(self, key: str) -> str:
+        return self._path(key)
+
+    def iter_chunks(self, key: str) -> Iterator[bytes]:
+        f = open(self._path(key), "rb")
+
+        def chunks():
+            with f:
+                while chunk := f.read(CHUNK_SIZE):
+                    yield chunk
+        return chunks()
+
+    def reference_forms(self, key: str) -> list[str]:
+        return [key, f"{self.root}/{key}"]
+
+    def iter_objects(self, start_after: str = "") -> Iterator[tuple[str, int, float]]:
+        """(key, size, mtime) of every stored object in key order, starting after `start_after`."""
+        yield from self._walk("", start_after)
+
+    def _walk(self, prefix: str, start_after: str):
+        directory = os.path.join(self.root, prefix) if prefix else self.root
+        try:
+            entries = [entry for entry in os.scandir(directory) if not entry.name.startswith(".")]
+        except FileNotFoundError:
+            return
+        # A directory's keys sort as "<name>/...", so order entries the same way
+        entries.sort(key=lambda entry: entry.name + "/" if entry.is_dir() else entry.name)
+        for entry in entries:
+            key = prefix + entry.name
+            if entry.is_dir():
+                # Skip subtrees whose keys all sort before the resume point
+                if key + "/\U0010ffff" > start_after:
+                    yield from self._walk(key + "/", start_after)
+            elif key > start_after:
+                stat = entry.stat()
+                yield key, stat.st_size, stat.st_mtime
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self._path(key))
+
+    def size(self, key: str) -> int:
+        return os.path.getsize(self._path(key))
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3Storage(Storage):
+    """
+    Objects in an S3-compatible bucket. Parsing and conversion need real files, so
+    objects written by this worker stay in STORAGE_CACHE_DIR and `local_path` downloads
+    others there on first use; keys are never reused, so cached copies do not go stale.
+    `trim_cache` keeps the directory under STORAGE_CACHE_MAX_BYTES, least recently used first.
+    """
+
+    # Copies used this recently may still be open by a conversion, so are never evicted
+    CACHE_MIN_AGE_SECONDS = 600
+
+    def __init__(self, bucket: str, cache_dir: str):
+        super().__init__(cache_dir)
+        try:
+            import boto3  # optional dependency, only needed for this backend
+        except ImportError:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires boto3 (pip install boto3)")
+        self.bucket = bucket
+        self.cache_dir = cache_dir
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            region_name=settings.S3_REGION,
+            aws_access_key_id=settings.S3_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.S3_SECRET_ACCESS_KEY.get_secret_value() if settings.S3_SECRET_ACCESS_KEY else None,
+        )
+
+    def _cache_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def _is_missing(self, error) -> bool:
+        return error.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+    def put_file(self, key: str, src_path: str):
+        """Upload a local file under `key` (multipart for large files) and keep it as the cached copy."""
+        self.client.upload_file(src_path, self.bucket, key)
+        path = self._cache_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.move(src_path, path)
+
+    def local_path(self, key: str) -> str:
+        from botocore.exceptions import ClientError
+        path = self._cache_path(key)
+        try:
+            os.utime(path)  # the mtime is the last use, for trim_cache
+            return path
+        except FileNotFoundError:
+            pass
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+        try:
+            self.client.download_file(self.bucket, key, tmp_path)
+            os.replace(tmp_path, path)
+        except ClientError as e:
+            if self._is_missing(e):
+                raise FileNotFoundError(key)
+            raise
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return path
+
+    def trim_cache(self) -> int:
+        files = []
+        total = 0
+        for directory, subdirs, names in os.walk(self.cache_dir):
+            if directory == self.cache_dir and STAGING_DIR in subdirs:
+                subdirs.remove(STAGING_DIR)
+            for name in names:
+                if name.endswith(".part"):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        freed = 0
+        cutoff = time.time() - self.CACHE_MIN_AGE_SECONDS
+        for mtime, size, path in sorted(files):
+            if total - freed <= settings.STORAGE_CACHE_MAX_BYTES or mtime > cutoff:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            freed += size
+        if freed:
+            logger.info(f"Evicted {freed} bytes from the storage cache ({total - freed} bytes left)")
+        return freed
+
+    def iter_chunks(self, key: str) -> Iterator[bytes]:
+        from botocore.exceptions import ClientError
+        try:
+            body = self.client.get_object(Bucket=self.bucket, Key=key)["Body"]
+        except ClientError as e:
+            if self._is_missing(e):
+                raise FileNotFoundError(key)
+            raise
+
+        def chunks():
+            try:
+                yield from body.iter_chunks(CHUNK_SIZE)
+            finally:
+                body.close()
+        return chunks()
+
+    def iter_objects(self, start_after: str = "") -> Iterator[tuple[str, int, float]]:
+        """(key, size, mtime) of every object in the bucket in key order, starting after `start_after`."""
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, StartAfter=start_after):
+            for item in page.get("Contents", []):
+                yield item["Key"], item["Size"], item["LastModified"].timestamp()
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if self._is_missing(e):
+                return False
+            raise
+
+    def size(self, key: str) -> int:
+        from botocore.exceptions import ClientError
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=key)["ContentLength"]
+        except ClientError as e:
+            if self._is_missing(e):
+                raise FileNotFoundError(key)
+            raise
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+        try:
+            os.remove(self._cache_path(key))
+        except FileNotFoundError:
+            pass
+
+
+@lru_cache()
+def get_storage() -> Storage:
+    """The configured storage backend, shared by the worker."""
+    backend = settings.STORAGE_BACKEND.lower()
+    if backend == "local":
+        return LocalStorage(settings.STORAGE_LOCAL_ROOT)
+    if backend == "s3":
+        if not settings.S3_BUCKET:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires S3_BUCKET")
+        logger.info(f"Using S3 storage: bucket {settings.S3_BUCKET} at {settings.S3_ENDPOINT_URL or 'AWS'}")
+        return S3Storage(settings.S3_BUCKET, settings.STORAGE_CACHE_DIR)
+    raise ValueError(f"STORAGE_BACKEND must be 'local' or 's3', got: {settings.STORAGE_BACKEND}")
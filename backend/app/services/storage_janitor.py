@@ -0,0 +1,238 @@
+"""
+Storage janitor.
+
+Every worker runs the janitor thread, but a Redis lock lets only one of them do a
+batch per JANITOR_INTERVAL_SECONDS. A batch inspects at most JANITOR_BATCH_SIZE stored
+objects, resuming from a cursor kept in Redis, and deletes those no files/slides row
+refers to, and cached PDF page renders older than PDF_PAGE_CACHE_TTL_DAYS. A full pass
+over a large store is thus spread over many small batches. Each pass also starts with
+bounded housekeeping: files rows without a size, expired staging files, a report of
+users over quota and, only when JANITOR_DELETE_FAILED_CONVERSIONS is set, uploads whose
+conversion failed more than JANITOR_FAILED_RETENTION_DAYS ago.
+
+The local cache of remote objects (S3 backend) is per host, so every worker trims it,
+outside the lock, every CACHE_TRIM_INTERVAL_SECONDS.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from itertools import islice
+from sqlalchemy import func, select
+from backend.app.core.config import get_settings
+from backend.app.core.database import SessionLocal
+from backend.app.core.metrics import STORAGE_RECLAIMED_BYTES, STORAGE_RECLAIMED_FILES
+from backend.app.models import File as FileModel, Slide
+from backend.app.services.pdf_raster import PAGE_CACHE_PREFIX
+from backend.app.services.storage import STAGING_DIR, Storage, get_storage
+from backend.app.utils.cache_invalidation import WORKER_ID
+from backend.app.utils.redis_client import get_redis_client
+
+settings = get_settings()
+logger = logging.getLogger("storage_janitor")
+
+LOCK_KEY = "storage_janitor:lock"
+# Well above the worst-case batch, so the lock cannot expire while a batch runs
+LOCK_TTL_SECONDS = 600
+CURSOR_KEY = "storage_janitor:cursor"
+PASS_KEY = "storage_janitor:pass"
+CACHE_TRIM_INTERVAL_SECONDS = 300
+
+# Hand the lock back after a batch: it then expires one interval later, so batches stay
+# JANITOR_INTERVAL_SECONDS apart across workers. No-op if this worker no longer holds it.
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_stop = threading.Event()
+_thread: threading.Thread | None = None
+_release_script = None
+
+
+def _record(totals: Counter, reason: str, size: int):
+    """Count a deletion; the batch's totals are added to the pass totals in Redis once, by run_batch."""
+    STORAGE_RECLAIMED_BYTES.labels(reason).inc(size)
+    STORAGE_RECLAIMED_FILES.labels(reason).inc()
+    totals["bytes"] += size
+    totals["files"] += 1
+
+
+def _referenced(db, storage: Storage, keys: list[str]) -> set[str]:
+    """The subset of `keys` some files or slides row refers to."""
+    forms = {form: key for key in keys for form in storage.reference_forms(key)}
+    referenced = set()
+    for column in (FileModel.path, FileModel.converted_pptx_path, Slide.image_path):
+        for value in db.execute(select(column).where(column.in_(list(forms)))).scalars():
+            referenced.add(forms[value])
+    return referenced
+
+
+def _sweep_orphans(db, storage: Storage, cursor: str, totals: Counter) -> str:
+    """Delete unreferenced objects among the next batch after `cursor`; returns the new cursor ("" at the end)."""
+    objects = list(islice(storage.iter_objects(cursor), settings.JANITOR_BATCH_SIZE))
+    if not objects:
+        return ""
+    referenced = _referenced(db, storage, [key for key, _, _ in objects])
+    # Uploads are stored before their row is committed, so young objects are left alone
+    cutoff = time.time() - settings.JANITOR_ORPHAN_GRACE_SECONDS
+    page_cache_cutoff = time.time() - settings.PDF_PAGE_CACHE_TTL_DAYS * 86400
+    for key, size, mtime in objects:
+        if key.startswith(PAGE_CACHE_PREFIX + "/"):
+            # PDF page renders are a cache, never referenced by a row
+            if mtime < page_cache_cutoff:
+                storage.delete(key)
+                _record(totals, "page_cache", size)
+            continue
+        if key in referenced or mtime > cutoff:
+            continue
+        storage.delete(key)
+        _record(totals, "orphan", size)
+        logger.info(f"Deleted orphaned object {key} ({size} bytes)")
+    return objects[-1][0]
+
+
+def _delete_failed_conversions(db, storage: Storage, totals: Counter):
+    """Opt-in: the upload stays listed and downloadable until its row is deleted here."""
+    if not settings.JANITOR_DELETE_FAILED_CONVERSIONS:
+        return
+    cutoff = datetime.utcnow() - timedelta(days=settings.JANITOR_FAILED_RETENTION_DAYS)
+    rows = db.execute(
+        select(FileModel)
+        .where(FileModel.conversion_status.like("failed%"), FileModel.upload_time < cutoff)
+        .limit(settings.JANITOR_BATCH_SIZE)
+    ).scalars().all()
+    for row in rows:
+        size = row.size_bytes or 0
+        storage.delete(row.path)
+        db.delete(row)
+        _record(totals, "failed_conversion", size)
+    db.commit()
+    if rows:
+        logger.info(f"Deleted {len(rows)} failed conversions older than {settings.JANITOR_FAILED_RETENTION_DAYS} days")
+
+
+def _measure_unsized(db, storage: Storage):
+    """Fill in size_bytes for rows stored before sizes were recorded."""
+    rows = db.execute(
+        select(FileModel).where(FileModel.size_bytes.is_(None)).limit(settings.JANITOR_BATCH_SIZE)
+    ).scalars().all()
+    for row in rows:
+        try:
+            row.size_bytes = storage.size(row.path)
+        except FileNotFoundError:
+            logger.warning(f"Source of file {row.id} is missing from storage: {row.path}")
+            row.size_bytes = 0
+    db.commit()
+
+
+def _sweep_staging(storage: Storage, totals: Counter):
+    """Delete staging files left behind by crashed writes; only the app's own staging directory is touched."""
+    cutoff = time.time() - settings.JANITOR_TEMP_MAX_AGE_SECONDS
+    try:
+        entries = os.scandir(os.path.join(storage.staging_root, STAGING_DIR))
+    except FileNotFoundError:
+        return
+    with entries:
+        # Filter by age first, so young files in progress never use up the batch
+        expired = (
+            (entry, stat) for entry in entries if entry.is_file()
+            for stat in (entry.stat(),) if stat.st_mtime < cutoff
+        )
+        for entry, stat in islice(expired, settings.JANITOR_BATCH_SIZE):
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            _record(totals, "temporary", stat.st_size)
+
+
+def _report_quota(db):
+    if not settings.STORAGE_QUOTA_BYTES_PER_USER:
+        return
+    used = func.sum(FileModel.size_bytes)
+    for user_id, total in db.execute(
+        select(FileModel.user_id, used).group_by(FileModel.user_id).having(used > settings.STORAGE_QUOTA_BYTES_PER_USER)
+    ):
+        logger.warning(f"User {user_id} is over the storage quota: {total} of {settings.STORAGE_QUOTA_BYTES_PER_USER} bytes")
+
+
+def run_batch():
+    """One bounded unit of janitor work."""
+    storage = get_storage()
+    client = get_redis_client()
+    cursor = client.get(CURSOR_KEY) or ""
+    totals = Counter()
+    db = SessionLocal()
+    try:
+        if not cursor:
+            _delete_failed_conversions(db, storage, totals)
+            _measure_unsized(db, storage)
+            _sweep_staging(storage, totals)
+            _report_quota(db)
+        next_cursor = _sweep_orphans(db, storage, cursor, totals)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+        if totals:
+            pipe = client.pipeline(transaction=False)
+            pipe.hincrby(PASS_KEY, "bytes", totals["bytes"])
+            pipe.hincrby(PASS_KEY, "files", totals["files"])
+            pipe.execute()
+    client.set(CURSOR_KEY, next_cursor)
+    if not next_cursor:
+        totals = client.hgetall(PASS_KEY)
+        client.delete(PASS_KEY)
+        logger.info(f"Storage janitor pass complete: reclaimed {totals.get('bytes', 0)} bytes in {totals.get('files', 0)} files")
+
+
+def _trim_cache():
+    # Cached copies are not stored objects, so only the bytes are counted
+    STORAGE_RECLAIMED_BYTES.labels("cache").inc(get_storage().trim_cache())
+
+
+def _run_locked():
+    global _release_script
+    client = get_redis_client()
+    token = f"{WORKER_ID}:{uuid.uuid4().hex}"
+    if not client.set(LOCK_KEY, token, nx=True, ex=LOCK_TTL_SECONDS):
+        return
+    try:
+        run_batch()
+    finally:
+        if _release_script is None:
+            _release_script = client.register_script(RELEASE_SCRIPT)
+        _release_script(keys=[LOCK_KEY], args=[token, max(1, int(settings.JANITOR_INTERVAL_SECONDS))])
+
+
+def _run():
+    last_trim = 0.0
+    while not _stop.wait(settings.JANITOR_INTERVAL_SECONDS):
+        try:
+            if time.monotonic() - last_trim >= CACHE_TRIM_INTERVAL_SECONDS:
+                last_trim = time.monotonic()
+                _trim_cache()
+        except Exception as e:
+            logger.error(f"Storage cache trim failed: {str(e)}", exc_info=True)
+        try:
+            _run_locked()
+        except Exception as e:
+            logger.error(f"Storage janitor batch failed: {str(e)}", exc_info=True)
+
+
+def start():
+    global _thread
+    if settings.JANITOR_ENABLED and _thread is None:
+        _thread = threading.Thread(target=_run, name="storage-janitor", daemon=True)
+        _thread.start()
+
+
+def stop():
+    _stop.set()
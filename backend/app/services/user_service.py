@@ -1,27 +1,82 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from backend.app.models.user import User
-from passlib.context import CryptContext
+from backend.app.core.config import get_settings
+from backend.app.utils.local_cache import LocalTTLCache
+from backend.app.utils import cache_invalidation
+from backend.app.services import password_hasher
+import logging
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+settings = get_settings()
+logger = logging.getLogger("user_service")
 
-def get_user_by_email(db: Session, email: str):
-    return db.query(User).filter(User.email == email).first()
+PRINCIPAL_NAMESPACE = "auth_user"
 
-def create_user(db: Session, email: str, password: str):
-    hashed_password = pwd_context.hash(password)
+# email -> (id, email, is_active) for authenticated requests. Entries expire after
+# AUTH_USER_CACHE_TTL_SECONDS and are dropped on every worker when the user changes.
+principal_cache = LocalTTLCache(
+    max_entries=settings.AUTH_USER_CACHE_MAX_ENTRIES,
+    max_bytes=16 * 1024 * 1024,
+    default_ttl=settings.AUTH_USER_CACHE_TTL_SECONDS,
+)
+
+def _on_invalidate(email: str | None):
+    if email is None:
+        principal_cache.clear()
+    else:
+        principal_cache.delete(email)
+
+def subscribe_invalidations():
+    """Called from the app lifespan, before cache_invalidation.start()."""
+    cache_invalidation.subscribe(PRINCIPAL_NAMESPACE, _on_invalidate)
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
+
+async def get_user_principal(db: AsyncSession, email: str) -> User | None:
+    """
+    The user behind a token, served from the per-worker cache when warm.
+    Returns a detached User carrying only id, email and is_active.
+    """
+    principal = principal_cache.get(email)
+    if principal is None:
+        user = await get_user_by_email(db, email)
+        if user is None:
+            return None
+        principal = (user.id, user.email, bool(user.is_active))
+        principal_cache.set(email, principal)
+    user_id, user_email, is_active = principal
+    return User(id=user_id, email=user_email, is_active=is_active)
+
+async def invalidate_user(email: str):
+    """Call after creating, changing or deactivating a user so every worker reloads it."""
+    principal_cache.delete(email)
+    await cache_invalidation.publish_invalidation_async(PRINCIPAL_NAMESPACE, email)
+
+async def create_user(db: AsyncSession, email: str, password: str):
+    hashed_password = await password_hasher.hash_password(password)
     user = User(email=email, hashed_password=hashed_password)
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
+    await invalidate_user(user.email)
     return user
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return (await password_hasher.verify_password(plain_password, hashed_password))[0]
 
-def authenticate_user(db: Session, email: str, password: str):
-    user = get_user_by_email(db, email)
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    user = await get_user_by_email(db, email)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = await password_hasher.verify_password(password, user.hashed_password)
+    if not valid:
         return None
-    return user 
\ No newline at end of file
+    if new_hash:
+        # Stored with an outdated bcrypt cost; upgrade it now that we know the password
+        user.hashed_password = new_hash
+        await db.commit()
+        await invalidate_user(user.email)
+        logger.info(f"Rehashed password for user {user.id}")
+    return user
@@ -0,0 +1,108 @@
+import json
+import logging
+import os
+import threading
+import uuid
+from typing import Callable
+from backend.app.utils.redis_client import get_async_redis_client, get_redis_client
+
+logger = logging.getLogger("cache_invalidation")
+
+CHANNEL = "cache_invalidation"
+
+# Identifies this worker so it can ignore its own invalidation messages
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+# namespace -> callback(key); key None means "drop everything in this namespace"
+_handlers: dict[str, Callable[[str | None], None]] = {}
+_listener_thread: threading.Thread | None = None
+_listener_lock = threading.Lock()
+_stop = threading.Event()
+
+
+def _message(namespace: str, key: str) -> str:
+    return json.dumps({"ns": namespace, "key": key, "origin": WORKER_ID})
+
+
+def publish_invalidation(namespace: str, key: str, pipeline=None):
+    """
+    Tell the other workers to drop `key` from their in-process `namespace` cache.
+    Pass a Redis pipeline to piggyback the publish on an existing round trip.
+    """
+    target = pipeline if pipeline is not None else get_redis_client()
+    try:
+        target.publish(CHANNEL, _message(namespace, key))
+    except Exception as e:
+        logger.warning(f"Failed to publish cache invalidation for {namespace}: {e}")
+
+
+async def publish_invalidation_async(namespace: str, key: str):
+    """publish_invalidation for async endpoints, on the asyncio client."""
+    try:
+        await get_async_redis_client().publish(CHANNEL, _message(namespace, key))
+    except Exception as e:
+        logger.warning(f"Failed to publish cache invalidation for {namespace}: {e}")
+
+
+def subscribe(namespace: str, handler: Callable[[str | None], None]):
+    """Register the invalidation handler for a namespace; messages are delivered once start() has run."""
+    _handlers[namespace] = handler
+
+
+def start():
+    """Start the listener thread; called from the app lifespan, once Redis is configured."""
+    global _listener_thread
+    with _listener_lock:
+        if _listener_thread is None:
+            _stop.clear()
+            _listener_thread = threading.Thread(target=_listen, name="cache-invalidation", daemon=True)
+            _listener_thread.start()
+
+
+def stop():
+    global _listener_thread
+    with _listener_lock:
+        thread, _listener_thread = _listener_thread, None
+    _stop.set()
+    if thread is not None:
+        thread.join(timeout=2)
+
+
+def _flush_all():
+    for handler in list(_handlers.values()):
+        handler(None)
+
+
+def _listen():
+    backoff = 1
+    while not _stop.is_set():
+        pubsub = get_redis_client().pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(CHANNEL)
+            # Messages may have been missed while disconnected, so start from a clean slate
+            _flush_all()
+            backoff = 1
+            while not _stop.is_set():
+                # Poll with a timeout instead of listen(): the pool's socket_timeout would abort a blocking read
+                message = pubsub.get_message(timeout=1.0)
+                if message is None:
+                    continue
+                try:
+                    payload = json.loads(message["data"])
+                except (TypeError, ValueError):
+                    continue
+                if payload.get("origin") == WORKER_ID:
+                    continue
+                handler = _handlers.get(payload.get("ns"))
+                if handler:
+                    handler(payload.get("key"))
+        except Exception as e:
+            logger.warning(f"Cache invalidation listener disconnected, retrying in {backoff}s: {e}")
+            _flush_all()
+            _stop.wait(backoff)
+            backoff = min(backoff * 2, 30)
+        finally:
+            try:
+                pubsub.close()
+            except Exception:
+                pass
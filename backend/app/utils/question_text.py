@@ -0,0 +1,67 @@
+import hashlib
+import math
+import re
+import unicodedata
+
+EMBEDDING_DIM = 512
+PREFIX_LENGTHS = (5, 6, 7, 8)
+
+# Words that carry the shape of a question rather than its topic
+STOP_WORDS = frozenset("""
+a an the is are was were be been being of to in on for with and or it its this that these those
+what whats how does do did why when where which who whom can could would should will you me i my
+explain describe define definition meaning mean means tell about please give example examples work works working
+""".split())
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+# "What is not a prime number?" embeds close to "What is a prime number?" but needs another answer
+_NEGATION_RE = re.compile(r"\b(?:not|no|never|none|nothing|neither|nor|without|cannot)\b|n['’]t\b")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """Case-fold, drop punctuation and collapse whitespace so trivially different questions compare equal."""
+    text = unicodedata.normalize("NFKC", question).casefold()
+    text = _PUNCTUATION_RE.sub(" ", text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def is_negated(question: str) -> bool:
+    """Whether the question contains a negation; a cached answer only serves questions of the same polarity."""
+    return bool(_NEGATION_RE.search(unicodedata.normalize("NFKC", question).casefold()))
+
+
+def embed_question(question: str, dim: int = EMBEDDING_DIM) -> list[float]:
+    """
+    Offline hashing-vectorizer embedding. Question boilerplate ("what is", "explain",
+    "how does ... work") is dropped; the remaining words, their 5- to 8-character
+    prefixes (so "backprop" meets "backpropagation", more closely the longer the shared
+    prefix), word bigrams and character 4-grams are hashed into `dim` signed buckets
+    and L2-normalized.
+    Deterministic, dependency-free and fast enough to run on every request.
+    """
+    words = normalize_question(question).split()
+    content = [w for w in words if w not in STOP_WORDS] or words
+
+    features = []
+    for word in content:
+        features.append((f"w:{word}", 1.0))
+        features.extend((f"p:{word[:n]}", 1.5) for n in PREFIX_LENGTHS if len(word) >= n)
+        padded = f"<{word}>"
+        features.extend((f"c:{padded[i:i + 4]}", 0.5) for i in range(len(padded) - 3))
+    features.extend((f"b:{a} {b}", 1.0) for a, b in zip(content, content[1:]))
+
+    vector = [0.0] * dim
+    for feature, weight in features:
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dim
+        vector[bucket] += weight if digest[4] & 1 else -weight
+    norm = math.sqrt(sum(v * v for v in vector))
+    if norm:
+        vector = [v / norm for v in vector]
+    return vector
+
+
+def cosine_similarity(a: list[float], b: list[float]) -> float:
+    # Embeddings are already L2-normalized
+    return sum(x * y for x, y in zip(a, b))
@@ -1,14 +1,102 @@
+import threading
 import redis
+import redis.asyncio as redis_async
 from backend.app.core.config import get_settings
 
 settings = get_settings()
 
-redis_client = redis.Redis(
-    host=settings.REDIS_HOST,
-    port=settings.REDIS_PORT,
-    password=getattr(settings, "REDIS_PASSWORD", None),
-    decode_responses=True
-)
+# Shared clients, created once per worker (eagerly in the app lifespan, lazily elsewhere)
+redis_client: redis.Redis | None = None
+redis_binary_client: redis.Redis | None = None
+async_redis_client: redis_async.Redis | None = None
+_lock = threading.Lock()
 
-def get_redis_client():
-    return redis_client 
\ No newline at end of file
+
+def _connection_kwargs() -> dict:
+    return {
+        "host": settings.REDIS_HOST,
+        "port": settings.REDIS_PORT,
+        "password": settings.REDIS_PASSWORD.get_secret_value() if settings.REDIS_PASSWORD else None,
+        "max_connections": settings.REDIS_MAX_CONNECTIONS,
+        "timeout": settings.REDIS_POOL_TIMEOUT,
+        "socket_timeout": settings.REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+        "health_check_interval": settings.REDIS_HEALTH_CHECK_INTERVAL,
+    }
+
+
+def init_redis_clients():
+    """
+    Create the shared sync, binary and asyncio clients. Their pools are bounded and
+    blocking: when all connections are in use a caller waits up to REDIS_POOL_TIMEOUT
+    for one to be returned, then gets a ConnectionError, instead of failing at once.
+    """
+    global redis_client, redis_binary_client, async_redis_client
+    with _lock:
+        if redis_client is None:
+            redis_client = redis.Redis(
+                connection_pool=redis.BlockingConnectionPool(decode_responses=True, **_connection_kwargs())
+            )
+        if redis_binary_client is None:
+            # Returns raw bytes, for values stored in binary form (e.g. compressed cache entries)
+            redis_binary_client = redis.Redis(
+                connection_pool=redis.BlockingConnectionPool(decode_responses=False, **_connection_kwargs())
+            )
+        if async_redis_client is None:
+            async_redis_client = redis_async.Redis(
+                connection_pool=redis_async.BlockingConnectionPool(decode_responses=True, **_connection_kwargs())
+            )
+
+
+async def close_redis_clients():
+    global redis_client, redis_binary_client, async_redis_client
+    with _lock:
+        sync_clients = [redis_client, redis_binary_client]
+        async_client = async_redis_client
+        redis_client = redis_binary_client = async_redis_client = None
+    for client in sync_clients:
+        if client is not None:
+            client.connection_pool.disconnect()
+    if async_client is not None:
+        await async_client.connection_pool.disconnect()
+
+
+def get_redis_client() -> redis.Redis:
+    if redis_client is None:
+        init_redis_clients()
+    return redis_client
+
+
+def get_redis_binary_client() -> redis.Redis:
+    if redis_binary_client is None:
+        init_redis_clients()
+    return redis_binary_client
+
+
+def get_async_redis_client() -> redis_async.Redis:
+    """asyncio client for use inside async endpoints, so Redis I/O never blocks the event loop."""
+    if async_redis_client is None:
+        init_redis_clients()
+    return async_redis_client
+
+
+def _pool_stats(pool) -> dict:
+    if hasattr(pool, "_in_use_connections"):
+        in_use = len(pool._in_use_connections)
+        available = len(pool._available_connections)
+    else:
+        # The sync BlockingConnectionPool keeps idle connections (and None placeholders) in a queue
+        available = sum(1 for connection in list(pool.pool.queue) if connection is not None)
+        in_use = len(pool._connections) - available
+    return {
+        "max_connections": pool.max_connections,
+        "in_use": in_use,
+        "idle": available,
+        "created": in_use + available,
+    }
+
+
+def get_redis_pool_stats() -> dict:
+    """Connection usage for each shared pool in this worker."""
+    clients = {"sync": redis_client, "binary": redis_binary_client, "async": async_redis_client}
+    return {name: _pool_stats(client.connection_pool) for name, client in clients.items() if client is not None}
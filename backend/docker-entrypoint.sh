@@ -18,6 +18,11 @@ echo "Running database migrations..."
 cd /app/backend
 PYTHONPATH=/app alembic upgrade head 2>&1 | tee /app/alembic.log
 
+# Prometheus multiprocess mode: every worker writes its metrics here, /metrics aggregates them
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus_multiproc}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
 # Start the FastAPI application
 echo "Starting FastAPI application..."
 exec uvicorn backend.main:app --host 0.0.0.0 --port 8000 --reload 
\ No newline at end of file
@@ -1,19 +1,47 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from backend.app.api import auth, file_upload, ai_teacher
+from fastapi.responses import JSONResponse, Response
+from backend.app.api import auth, file_upload, ai_teacher, profiles
 from backend.app.core import logging_config  # noqa: F401
-from sqlalchemy.exc import OperationalError
-from backend.app.core.database import get_db
-import redis
+from backend.app.core import health, metrics, profiling, tracing
+from backend.app.core.database import async_engine, get_db_pool_stats
 from backend.app.core.config import get_settings
-import logging
-from sqlalchemy import text
+from backend.app.services.provider_limiter import get_limiter_stats
+from backend.app.services import ai_cache, deck_summary, password_hasher, pdf_raster, storage_janitor, user_service
+from backend.app.utils import cache_invalidation
+from backend.app.utils.redis_client import init_redis_clients, close_redis_clients, get_redis_pool_stats
+
+settings = get_settings()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared Redis connection pools for this worker
+    init_redis_clients()
+    # Cross-worker invalidation of the in-process caches
+    ai_cache.subscribe_invalidations()
+    user_service.subscribe_invalidations()
+    cache_invalidation.start()
+    tracing.init_tracing()
+    await health.start()
+    storage_janitor.start()
+    deck_summary.start()
+    yield
+    deck_summary.stop()
+    storage_janitor.stop()
+    await health.stop()
+    cache_invalidation.stop()
+    await close_redis_clients()
+    await async_engine.dispose()
+    password_hasher.shutdown()
+    pdf_raster.shutdown()
+    metrics.mark_worker_exited()
 
 app = FastAPI(
     title="AI Tutor API",
     description="Backend API for the AI Tutor platform",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # Configure CORS
@@ -23,13 +51,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Request-ID", "X-Profile-ID"],
 )
 
+app.add_middleware(metrics.PrometheusMiddleware)
+if settings.PROFILING_ENABLED:
+    app.add_middleware(profiling.ProfilingMiddleware)
+# Added last so it is outermost: request ids and timings cover the whole stack
+app.add_middleware(tracing.TracingMiddleware)
+
 app.include_router(auth.router, prefix="/api/v1")
 app.include_router(file_upload.router, prefix="/api/v1/files")
 app.include_router(ai_teacher.router, prefix="/api/v1/ai")
-
-settings = get_settings()
+if settings.PROFILING_ENABLED:
+    app.include_router(profiles.router, prefix="/api/v1")
 
 @app.get("/")
 async def root():
@@ -42,47 +77,48 @@ async def root():
         }
     )
 
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Prometheus scrape endpoint, aggregated over all workers."""
+    payload, content_type = metrics.render_metrics()
+    return Response(content=payload, media_type=content_type)
+
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe: the worker's event loop is responsive. Never touches dependencies."""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness probe from the last background dependency check, so probes cost no I/O."""
+    ready, report = health.get_readiness()
+    return JSONResponse(status_code=200 if ready else 503, content=report)
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint for monitoring."""
-    # API status
-    api_status = "up"
+    _, report = health.get_readiness()
+    checks = report["checks"]
 
-    # Database status
-    db_status = "up"
-    try:
-        db = next(get_db())
-        db.execute(text("SELECT 1"))
-    except OperationalError as e:
-        logging.error(f"Database OperationalError: {e}")
-        db_status = "down"
-    except Exception as e:
-        logging.error(f"Database Exception: {e}")
-        db_status = "error"
-
-    # Redis status
-    redis_status = "not_configured"
-    if hasattr(settings, "REDIS_HOST") and settings.REDIS_HOST:
-        try:
-            r = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, password=getattr(settings, "REDIS_PASSWORD", None))
-            if r.ping():
-                redis_status = "up"
-            else:
-                redis_status = "down"
-        except Exception:
-            redis_status = "error"
-
-    # AI Models status (placeholder)
-    ai_models_status = "not_configured"
+    # AI Models status: per provider/model bulkhead load (queue depth, wait times)
+    ai_models_status = {
+        f"{stats['provider']}:{stats['model']}": stats for stats in get_limiter_stats()
+    }
 
     return JSONResponse(
         content={
-            "status": "healthy",
+            "status": "healthy" if report["status"] in ("ready", "degraded") else "unhealthy",
             "services": {
-                "api": api_status,
-                "database": db_status,
-                "redis": redis_status,
+                "api": "up",
+                "database": checks.get("database", {}).get("status", "unknown"),
+                "redis": checks.get("redis", {}).get("status", "unknown"),
                 "ai_models": ai_models_status,
+            },
+            "checks": checks,
+            "checked_seconds_ago": report.get("checked_seconds_ago"),
+            "pools": {
+                "redis": get_redis_pool_stats(),
+                "database": get_db_pool_stats(),
             }
         }
     )
@@ -19,6 +19,9 @@ export default function TeachingSession({ selectedSlideDeckId }: TeachingSession
   const [explaining, setExplaining] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [imageUrl, setImageUrl] = useState<string | null>(null);
+  // Explanations streamed by "Teach the whole deck", keyed by slide number
+  const [deckExplanations, setDeckExplanations] = useState<Record<number, string>>({});
+  const [explainingDeck, setExplainingDeck] = useState(false);
 
   const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
 
@@ -27,8 +30,10 @@ export default function TeachingSession({ selectedSlideDeckId }: TeachingSession
       setSlides([]);
       setCurrent(0);
       setExplanation(null);
+      setDeckExplanations({});
       return;
     }
+    setDeckExplanations({});
     setLoadingSlides(true);
     setError(null);
     fetch(`${apiUrl}/api/v1/ai/slides/${selectedSlideDeckId}`, {
@@ -91,8 +96,55 @@ export default function TeachingSession({ selectedSlideDeckId }: TeachingSession
     setExplanation(null);
   };
 
+  const handleExplainDeck = async () => {
+    if (!selectedSlideDeckId) return;
+    setExplainingDeck(true);
+    setError(null);
+    try {
+      const res = await fetch(`${apiUrl}/api/v1/ai/explain-deck`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          'Authorization': `Bearer ${localStorage.getItem('token')}`
+        },
+        body: JSON.stringify({ slide_deck_id: selectedSlideDeckId })
+      });
+      if (!res.ok || !res.body) {
+        const errorData = await res.json().catch(() => ({}));
+        throw new Error(errorData.detail || 'Failed to explain the deck');
+      }
+      // One JSON object per line, in slide order
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffered = '';
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffered += decoder.decode(value, { stream: true });
+        const lines = buffered.split('\n');
+        buffered = lines.pop() || '';
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const result = JSON.parse(line);
+          if (result.explanation) {
+            setDeckExplanations(prev => ({ ...prev, [result.slide_number]: result.explanation }));
+          }
+        }
+      }
+    } catch (err) {
+      setError(err instanceof Error ? err.message : 'Failed to explain the deck');
+    } finally {
+      setExplainingDeck(false);
+    }
+  };
+
   const handleExplain = async () => {
     if (!selectedSlideDeckId || !slides[current]) return;
+    const prefetched = deckExplanations[slides[current].slide_number];
+    if (prefetched) {
+      setExplanation(prefetched);
+      return;
+    }
     setExplaining(true);
     setError(null);
     setExplanation(null);
@@ -223,6 +275,15 @@ export default function TeachingSession({ selectedSlideDeckId }: TeachingSession
             >
               {explaining ? 'Explaining...' : 'Teach me this slide'}
             </button>
+            <button 
+              onClick={handleExplainDeck} 
+              disabled={explainingDeck} 
+              className="btn-secondary flex-1 md:flex-none min-w-[160px]"
+            >
+              {explainingDeck
+                ? `Preparing deck (${Object.keys(deckExplanations).length}/${slides.length})...`
+                : 'Teach the whole deck'}
+            </button>
           </div>
           {explanation && (
             <div className="mt-4 p-4 bg-blue-50 border border-blue-200 rounded overflow-hidden">
@@ -15,6 +15,8 @@ interface Deck {
   isConverted?: boolean;
 }
 
+const FILES_PAGE_SIZE = 50;
+
 interface UploadedFile {
   id: number;
   filename: string;
@@ -36,44 +38,54 @@ export default function DashboardPage() {
   const [uploadFiles, setUploadFiles] = useState<File[]>([]);
   const [uploadedFiles, setUploadedFiles] = useState<any[]>([]);
   const [loadingFiles, setLoadingFiles] = useState(false);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
 
-  const fetchFilesAndDecks = useCallback(async () => {
+  // Files are listed a page at a time; pass the previous page's cursor to append the next one
+  const fetchFilesAndDecks = useCallback(async (cursor: string | null = null) => {
     try {
-      const response = await fetch(`${apiUrl}/api/v1/files/list`, {
+      const params = new URLSearchParams({ limit: String(FILES_PAGE_SIZE) });
+      if (cursor) params.set('cursor', cursor);
+      const response = await fetch(`${apiUrl}/api/v1/files/list?${params}`, {
         headers: {
           'Authorization': `Bearer ${localStorage.getItem('token')}`
         }
       });
       if (!response.ok) throw new Error('Failed to fetch files');
       const data = await response.json();
-      setFiles(data);
-      // Decks logic
-      const pptxMime = 'application/vnd.openxmlformats-officedocument.presentationml.presentation';
-      const isDirectPptx = (file: any) =>
-        (file.content_type === pptxMime || (file.filename && file.filename.toLowerCase().endsWith('.pptx')));
-      const directPptx = data.filter(isDirectPptx);
-      const convertedPptx = data.filter((file: any) => file.converted_pptx_path && file.conversion_status === 'success');
-      const allDecks: any[] = [];
-      const seen = new Set();
-      for (const file of directPptx) {
-        allDecks.push({ ...file, isConverted: false });
-        seen.add(file.id);
-      }
-      for (const file of convertedPptx) {
-        if (!seen.has(file.id)) {
-          allDecks.push({ ...file, isConverted: true });
-          seen.add(file.id);
-        }
-      }
-      setDecks(allDecks);
-      if (allDecks.length > 0) setSelectedDeckId(allDecks[0].id);
+      setFiles(prev => (cursor ? [...prev, ...data.items] : data.items));
+      setNextCursor(data.next_cursor);
     } catch {
-      setFiles([]);
-      setDecks([]);
+      if (!cursor) {
+        setFiles([]);
+        setNextCursor(null);
+      }
     }
   }, [apiUrl]);
 
+  useEffect(() => {
+    // Decks logic
+    const pptxMime = 'application/vnd.openxmlformats-officedocument.presentationml.presentation';
+    const isDirectPptx = (file: any) =>
+      (file.content_type === pptxMime || (file.filename && file.filename.toLowerCase().endsWith('.pptx')));
+    const directPptx = files.filter(isDirectPptx);
+    const convertedPptx = files.filter((file: any) => file.converted_pptx_path && file.conversion_status === 'success');
+    const allDecks: any[] = [];
+    const seen = new Set();
+    for (const file of directPptx) {
+      allDecks.push({ ...file, isConverted: false });
+      seen.add(file.id);
+    }
+    for (const file of convertedPptx) {
+      if (!seen.has(file.id)) {
+        allDecks.push({ ...file, isConverted: true });
+        seen.add(file.id);
+      }
+    }
+    setDecks(allDecks);
+    setSelectedDeckId(prev => prev ?? (allDecks.length > 0 ? allDecks[0].id : null));
+  }, [files]);
+
   useEffect(() => {
     const token = localStorage.getItem('token');
     if (!token) {
@@ -195,6 +207,11 @@ export default function DashboardPage() {
         </div>
       </div>
       <FileList files={files} />
+      {nextCursor && (
+        <button className="btn-secondary mt-4" onClick={() => fetchFilesAndDecks(nextCursor)}>
+          Load more files
+        </button>
+      )}
       <div className="my-8">
         <h3 className="text-lg font-semibold mb-2">Select a Slide Deck</h3>
         {decks.length === 0 ? (
@@ -0,0 +1,97 @@
+"""
+Measure login throughput under concurrency against a running backend.
+
+Usage (from the repo root, with the API running):
+    python scripts/bench_login.py                      # http://localhost:8000, 200 logins, 20 clients
+    python scripts/bench_login.py --url http://localhost:8000 --logins 500 --concurrency 50
+
+Registers a throwaway user, then fires `--logins` logins from `--concurrency`
+client threads while a separate thread keeps probing GET / once every 50 ms.
+Reports login throughput and latency, and the latency of the probe: with
+hashing off the request threads, the probe should stay fast while logins queue.
+Standard library only.
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+def post_json(url: str, payload: dict) -> int:
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode("utf-8"), headers={"Content-Type": "application/json"}
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    base = args.url.rstrip("/")
+    credentials = {"email": f"bench-{uuid.uuid4().hex[:12]}@example.com", "password": "bench-password"}
+    status = post_json(f"{base}/api/v1/auth/register", credentials)
+    if status != 200:
+        raise SystemExit(f"Registration failed with HTTP {status}")
+
+    probe_latencies: list[float] = []
+    stop = threading.Event()
+
+    def probe():
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                urllib.request.urlopen(f"{base}/", timeout=60).read()
+            except urllib.error.URLError:
+                pass
+            probe_latencies.append(time.perf_counter() - start)
+            stop.wait(0.05)
+
+    def login(_):
+        start = time.perf_counter()
+        status = post_json(f"{base}/api/v1/auth/login", credentials)
+        return status, time.perf_counter() - start
+
+    prober = threading.Thread(target=probe, daemon=True)
+    prober.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(login, range(args.logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    prober.join()
+
+    latencies = [latency for status, latency in results if status == 200]
+    statuses: dict[int, int] = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+
+    print(f"{args.logins} logins, {args.concurrency} concurrent clients, {elapsed:.2f}s")
+    print(f"status codes: {statuses}")
+    print(f"throughput: {len(latencies) / elapsed:.1f} successful logins/s")
+    print(f"login latency: p50 {percentile(latencies, 0.5) * 1000:.0f} ms, "
+          f"p95 {percentile(latencies, 0.95) * 1000:.0f} ms, max {max(latencies, default=0) * 1000:.0f} ms")
+    print(f"GET / during the run: p50 {percentile(probe_latencies, 0.5) * 1000:.1f} ms, "
+          f"p95 {percentile(probe_latencies, 0.95) * 1000:.1f} ms ({len(probe_latencies)} probes)")
+
+
+if __name__ == "__main__":
+    main()
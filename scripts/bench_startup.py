@@ -0,0 +1,101 @@
+"""
+Measure what a uvicorn worker pays at startup to import the app.
+
+Usage (from the repo root, with the backend's settings in the environment or .env):
+    python scripts/bench_startup.py                    # import backend.main 5 times
+    python scripts/bench_startup.py --repeat 10 --top 30
+    python scripts/bench_startup.py --json > startup.json
+
+Each run imports the module in a fresh interpreter under `python -X importtime`
+and reports the import wall time, the peak RSS of the process after the import
+(the per-worker baseline), the slowest top-level packages by import time, and
+whether any of the heavy SDKs that should load lazily were imported.
+Standard library only.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ["openai", "google.generativeai", "pdfplumber", "docx", "PIL", "pptx"]
+
+CHILD = """
+import json, resource, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "import_seconds": elapsed,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "loaded": [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+
+def parse_importtime(stderr: str) -> dict[str, int]:
+    """Import time in microseconds per top-level package (summed self time of its modules)."""
+    packages: dict[str, int] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        top = name.strip().split(".")[0]
+        packages[top] = packages.get(top, 0) + int(self_us)
+    return packages
+
+
+def run_once(module: str) -> tuple[dict, dict[str, int]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD.format(module=module, heavy=HEAVY_MODULES)],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        tail = "\n".join(line for line in result.stderr.splitlines() if not line.startswith("import time:"))
+        sys.exit(f"Importing {module} failed:\n{tail}")
+    return json.loads(result.stdout.strip().splitlines()[-1]), parse_importtime(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="backend.main")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="print a machine-readable summary")
+    args = parser.parse_args()
+
+    runs = [run_once(args.module) for _ in range(args.repeat)]
+    import_seconds = [summary["import_seconds"] for summary, _ in runs]
+    rss = [summary["max_rss_mb"] for summary, _ in runs]
+    packages: dict[str, list[int]] = {}
+    for _, timings in runs:
+        for name, us in timings.items():
+            packages.setdefault(name, []).append(us)
+    slowest = sorted(((statistics.median(v) / 1000, k) for k, v in packages.items()), reverse=True)[:args.top]
+    loaded = runs[-1][0]["loaded"]
+
+    report = {
+        "module": args.module,
+        "runs": args.repeat,
+        "import_seconds_median": round(statistics.median(import_seconds), 3),
+        "import_seconds_min": round(min(import_seconds), 3),
+        "max_rss_mb_median": round(statistics.median(rss), 1),
+        "heavy_modules_loaded": loaded,
+        "slowest_packages_ms": {name: round(ms, 1) for ms, name in slowest},
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{args.module}: {args.repeat} cold imports")
+    print(f"  import time   median {report['import_seconds_median']:.3f}s  min {report['import_seconds_min']:.3f}s")
+    print(f"  worker RSS    median {report['max_rss_mb_median']:.1f} MB")
+    print(f"  heavy SDKs loaded at import: {', '.join(loaded) if loaded else 'none'}")
+    print("  slowest packages (median import time, submodules included):")
+    for ms, name in slowest:
+        print(f"    {ms:9.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
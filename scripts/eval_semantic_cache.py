@@ -0,0 +1,83 @@
+"""
+Measure semantic-cache hit precision/recall on labelled question pairs.
+
+Usage (from the repo root):
+    python scripts/eval_semantic_cache.py pairs.jsonl
+    python scripts/eval_semantic_cache.py            # built-in sample pairs
+
+Each line of pairs.jsonl is {"a": "...", "b": "...", "duplicate": true|false}, where
+"duplicate" means an answer to `a` is an acceptable answer to `b`. For each
+threshold the script reports how many pairs would have been served from the
+cache (predicted hits; like the cache, pairs where only one question is negated
+never hit), the precision of those hits and the recall of true duplicates, plus
+the embedding latency. Uses the offline hashing vectorizer,
+so no Redis, database or API keys are needed.
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.app.utils.question_text import embed_question, cosine_similarity, is_negated  # noqa: E402
+
+SAMPLE_PAIRS = [
+    {"a": "What is X?", "b": "what is x", "duplicate": True},
+    {"a": "What is gradient descent?", "b": "Explain gradient descent", "duplicate": True},
+    {"a": "Define entropy", "b": "What does entropy mean?", "duplicate": True},
+    {"a": "How do transformers use attention?", "b": "Explain attention in transformers", "duplicate": True},
+    {"a": "explain backpropagation", "b": "how does backprop work?", "duplicate": True},
+    {"a": "How does a convolutional layer work?", "b": "Explain convolutional layers", "duplicate": True},
+    {"a": "What are eigenvalues?", "b": "What is an eigenvalue?", "duplicate": True},
+    {"a": "Why do we normalize inputs?", "b": "Why normalize the inputs?", "duplicate": True},
+    {"a": "What is gradient descent?", "b": "What is a neural network?", "duplicate": False},
+    {"a": "What is overfitting?", "b": "What is underfitting?", "duplicate": False},
+    {"a": "What is the derivative of x^2?", "b": "What is the integral of x^2?", "duplicate": False},
+    {"a": "What is not a prime number?", "b": "What is a prime number?", "duplicate": False},
+    {"a": "Why isn't the model converging?", "b": "Why is the model converging?", "duplicate": False},
+    {"a": "What is photosynthesis?", "b": "What is a photograph?", "duplicate": False},
+    {"a": "What is supervised learning?", "b": "What is unsupervised learning?", "duplicate": False},
+    {"a": "What is the learning rate?", "b": "What is the learning curve?", "duplicate": False},
+    {"a": "Explain batch normalization", "b": "Explain layer normalization", "duplicate": False},
+]
+
+THRESHOLDS = [0.5, 0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95]
+
+
+def load_pairs(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    pairs = load_pairs(sys.argv[1]) if len(sys.argv) > 1 else SAMPLE_PAIRS
+
+    timings = []
+    scored = []
+    for pair in pairs:
+        start = time.perf_counter()
+        a = embed_question(pair["a"])
+        b = embed_question(pair["b"])
+        timings.append((time.perf_counter() - start) / 2)
+        similarity = cosine_similarity(a, b) if is_negated(pair["a"]) == is_negated(pair["b"]) else 0.0
+        scored.append((similarity, bool(pair["duplicate"])))
+
+    duplicates = sum(1 for _, dup in scored if dup)
+    print(f"{len(scored)} pairs, {duplicates} duplicates")
+    print(f"{'threshold':>9} {'hits':>5} {'precision':>9} {'recall':>7}")
+    for threshold in THRESHOLDS:
+        hits = [dup for similarity, dup in scored if similarity >= threshold]
+        true_hits = sum(hits)
+        precision = true_hits / len(hits) if hits else float("nan")
+        recall = true_hits / duplicates if duplicates else float("nan")
+        print(f"{threshold:>9.2f} {len(hits):>5} {precision:>9.3f} {recall:>7.3f}")
+
+    timings.sort()
+    p50 = timings[len(timings) // 2] * 1000
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000
+    print(f"embedding latency: p50 {p50:.3f} ms, p99 {p99:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()